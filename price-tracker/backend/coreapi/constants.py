@@ -10,24 +10,31 @@ CATEGORIES = {
 }
 
 # TODO ADD WEBSITES
-SCRAPING_URLS = {
+# Every site stays on the html listing for now: the json listings of ultrapc, nextlevelpc
+# (PrestaShop) and techspace (Shopify) are only checked against hand-written payloads in the
+# tests, never against live responses. Switch a site to "listing_mode": "json" once a recorded
+# response of it maps to the same product ids, prices and availability as its html pages.
+SCRAPING_URLS = { # "listing_mode": "json" reads the listings from the json of the platform (see json_listing.py), html by default
     "https://www.ultrapc.ma": {
         "categories": [
             {"url": "/39-cartes-graphiques", "type": CATEGORIES["GPU"]}
         ],
-        "scraper": "ultrapc"
+        "scraper": "ultrapc",
+        "rate_limit": {"requests_per_second": 0.5, "burst": 2}
     },
     "https://nextlevelpc.ma": {
         "categories": [
             {"url": "/144-carte-graphique-video-gpu", "type": CATEGORIES["GPU"]}
         ],
-        "scraper": "nextlevelpc"
+        "scraper": "nextlevelpc",
+        "rate_limit": {"requests_per_second": 0.25, "burst": 1} # behind cloudflare, keep it gentle
     },
     "https://techspace.ma": {
         "categories": [
             {"url": "/collections/carte-graphique", "type": CATEGORIES["GPU"]}
         ],
-        "scraper": "techspace"
+        "scraper": "techspace",
+        "rate_limit": {"requests_per_second": 1, "burst": 3}
     }
 }
 
@@ -36,9 +43,96 @@ SCRAPING_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
 }
  
-SCRAPING_WAIT = { # assuming they have bad servers
-    "min_seconds": 2,
-    "max_seconds": 6
+SCRAPING_RATE_LIMIT = { # default budget of a host, override it per site with "rate_limit" in SCRAPING_URLS
+    "requests_per_second": 0.25, # assuming they have bad servers
+    "burst": 1
+}
+
+SCRAPING_CONNECTIONS = { # pooled aiohttp connector of each host, kept for the whole run
+    "limit": 30,
+    "limit_per_host": 6,
+    "keepalive_timeout": 30,
+    "ttl_dns_cache": 300
+}
+
+SCRAPING_CLOUDSCRAPER = { # reused cloudscraper sessions, one challenge per session instead of per page
+    "sessions_per_host": 2,
+    "max_workers": 4
+}
+
+SCRAPING_CONCURRENCY = { # AIMD in-flight requests per host, override it per site with "concurrency" in SCRAPING_URLS
+    "initial": 1,
+    "min": 1,
+    "max": 6, # keep it under SCRAPING_CONNECTIONS["limit_per_host"]
+    "increase": 1, # added once a whole limit worth of requests succeeded
+    "decrease": 0.5, # factor applied on 429, 5xx and timeouts
+    "cooldown": 5, # seconds between two cuts
+    "latency_target": 3 # slower responses hold the limit instead of raising it
+}
+
+SCRAPING_PARSER = { # html parsing runs in worker processes, off the event loop
+    "workers": None, # None means one worker per core
+    "backends": ["lxml", "html.parser"], # first installed one is used
+    "parse_only": True # only build the product list and pagination subtrees
+}
+
+SCRAPING_HTTP_CACHE = { # pages revalidated with ETag / Last-Modified instead of downloaded again
+    "enabled": True,
+    "directory": None, # None means services/scraper/json/http_cache
+    "max_size_mb": 200 # least recently used pages are evicted past it
+}
+
+SCRAPING_TIMEOUTS = { # seconds
+    "request": 20, # whole request, cut down to what is left of the run
+    "connect": 10,
+    "run": None # whole scraping run, None means no deadline, the pages left are skipped past it
+}
+
+SCRAPING_CIRCUIT_BREAKER = { # per host, overridable per site with "circuit_breaker"
+    "failures": 5, # consecutive failed requests (errors, timeouts, 5xx) before the host is skipped
+    "reset_after": 120 # seconds before a trial request is let through
+}
+
+SCRAPING_PIPELINE = { # async runs ingest the products while the scraping goes on
+    "queue_size": 20, # scraped pages waiting for ingestion, the scraping waits past it
+    "batch_size": 200 # products written to the database per batch
+}
+
+SCRAPING_JOBS = { # distributed runs, scrape --method distributed seeds the jobs and scrape_worker processes take them
+    "pages_per_job": 5, # listing pages of one category per job
+    "max_attempts": 3, # a job failing more often is given up on, its category is reported as skipped
+    "lease": 600, # seconds before a job claimed by a dead worker is handed out again
+    "poll_interval": 2 # seconds between two looks at the queue
+}
+
+SCRAPING_SCHEDULE = { # scrape_scheduler, every (site, category) gets its own cadence, in seconds
+    "initial_interval": 6 * 3600,
+    "min_interval": 3600,
+    "max_interval": 48 * 3600,
+    "volatile": 0.3, # share of changed listing pages above which the interval shrinks
+    "stable": 0.05, # and below which it grows
+    "shrink": 0.5,
+    "grow": 1.5,
+    "smoothing": 0.5, # weight of the last run in the averaged change rate
+    "max_concurrent": 2, # categories scraped at the same time, across all sites
+    "poll_interval": 30
+}
+
+SCRAPING_METRICS = { # histogram buckets of the run metrics, scrape writes them to json/metrics.json
+    "latency_buckets": [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20], # seconds per request
+    "stage_buckets": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5], # seconds per page of parse, extract...
+    "products_buckets": [0, 5, 10, 20, 50, 100, 250]
+}
+
+SCRAPING_OUTPUT = { # scrape results, written page by page as json lines in services/scraper/json
+    "compress": False, # gzip the .ndjson files
+    "keep_runs": 5 # journals of unfinished runs kept in json/runs for scrape --resume, a finished run deletes its own
+}
+
+INGESTION = { # ProductProcessor, how the scraped products are written
+    "bulk": True, # a multi-row upsert per batch, False writes the products one transaction each
+    "upsert_batch_size": 1000, # rows per INSERT ... ON CONFLICT statement
+    "engine": "orm", # of the full loads (scrape --file, regroup_products), "copy" stages them with COPY, PostgreSQL only
 }
 
 IMAGE_PRIORITY_RETAILERS = [
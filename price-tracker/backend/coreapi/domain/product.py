@@ -1,6 +1,6 @@
 
 from dataclasses import dataclass
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List
 
 
 @dataclass
@@ -31,3 +31,12 @@ class scraped_product:
     availability: bool
     category: str
     website: str
+
+
+@dataclass
+class unchanged_page:
+    """Marker sent in place of the products of a listing page that didn't change since the last run"""
+    page_unchanged: bool
+    website: str
+    category: str
+    ids: List[str]
@@ -0,0 +1,62 @@
+from pathlib import Path
+from django.core.management.base import BaseCommand
+from bs4.builder import builder_registry
+import time
+from coreapi.constants import SCRAPING_URLS, SCRAPING_PARSER
+from coreapi.services.scraper.parsing import parse_listing
+import logging
+
+logger = logging.getLogger(__name__)
+
+# two synthetic listing pages per site, checked in so the benchmark runs as is. They are
+# written after the markup the site specs select, not captured from the stores, so their
+# timings only compare the backends with each other. Pass --pages with real captures for
+# figures that reflect the live sites.
+DEFAULT_PAGES = Path(__file__).resolve().parents[2] / "services" / "scraper" / "benchmark_pages"
+
+
+class Command(BaseCommand):
+    help = "Benchmark the html parser backends on recorded listing pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages',
+            type=str,
+            default=str(DEFAULT_PAGES),
+            help="Directory of recorded listing pages, one sub directory of .html files per scraper (e.g. pages/ultrapc/page-1.html), the synthetic services/scraper/benchmark_pages by default"
+        )
+        parser.add_argument('--rounds', type=int, default=5, help="Times every page is parsed per backend")
+
+    def handle(self, *args, **options):
+        pages_dir = Path(options['pages'])
+        if not pages_dir.is_dir():
+            logger.error(f"Directory not found: {pages_dir}")
+            return
+
+        base_urls = {site_info["scraper"]: base_url for base_url, site_info in SCRAPING_URLS.items()}
+        backends = [backend for backend in dict.fromkeys(SCRAPING_PARSER["backends"] + ["html.parser"]) if builder_registry.lookup(backend)]
+        rounds = options['rounds']
+        if pages_dir.resolve() == DEFAULT_PAGES:
+            self.stdout.write("Synthetic pages, not captured from the stores: compare the backends, not the sites")
+
+        for scraper, base_url in base_urls.items():
+            pages = [page.read_text(encoding="utf-8") for page in sorted((pages_dir / scraper).glob("*.html"))]
+            if not pages:
+                self.stdout.write(f"{scraper}: no recorded pages")
+                continue
+
+            self.stdout.write(f"{scraper} ({len(pages)} pages, {rounds} rounds)")
+            for backend in backends:
+                for parse_only in (False, True):
+                    products = sum(len(parse_listing(page, scraper, base_url, "gpu", backend, parse_only)["products"]) for page in pages)
+
+                    start = time.perf_counter()
+                    for _ in range(rounds):
+                        for page in pages:
+                            parse_listing(page, scraper, base_url, "gpu", backend, parse_only)
+                    elapsed = time.perf_counter() - start
+
+                    self.stdout.write(
+                        f"  {backend:<12} {'parse_only' if parse_only else 'full tree':<10} "
+                        f"{rounds * len(pages) / elapsed:8.1f} pages/s  {products} products"
+                    )
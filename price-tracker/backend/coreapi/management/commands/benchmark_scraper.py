@@ -0,0 +1,152 @@
+from django.core.management.base import BaseCommand
+import asyncio, tempfile, time, tracemalloc
+from pathlib import Path
+from urllib.parse import parse_qsl
+from coreapi.constants import SCRAPING_URLS
+from coreapi.services.scraper.main import scrape_category, scrape_category_async
+from coreapi.services.scraper.parsing import ParsePool, parse_listing
+from coreapi.services.scraper.json_listing import parse_json_listing
+from coreapi.services.scraper.sessions import SessionManager, get_host
+from coreapi.services.scraper.rate_limit import HostRateLimiter
+from coreapi.services.scraper.name_cache import ProductNameCache
+from coreapi.services.scraper.replay import ReplayServer, recording_path, traffic_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+UNLIMITED = {"requests_per_second": 1_000_000, "burst": 1_000_000}
+
+# query parameters of the html and json listing urls, see main.py and json_listing.json_listing_url
+LISTING_QUERY = {"page", "limit", "from-xhr"}
+
+
+def is_listing_page(key, category_key):
+    """Whether a recorded traffic key is a listing page of the category, html or json, not a product under its path"""
+    path, _, query = key.partition("?")
+    if path not in (category_key, category_key + "/products.json"):
+        return False
+    return all(name in LISTING_QUERY for name, _ in parse_qsl(query, keep_blank_values=True))
+
+
+class Command(BaseCommand):
+    help = "Benchmark the sync and async scraping of every site offline, on a run recorded with scrape --record"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recording', type=str, required=True, help="Name (json/recordings/NAME) or path of the recording to replay")
+        parser.add_argument('--methods', nargs='+', choices=['sync', 'async'], default=['sync', 'async'], help="Scraping paths to benchmark")
+        parser.add_argument('--sites', nargs='+', help="Only these scrapers (e.g. ultrapc)")
+        parser.add_argument('--rounds', type=int, default=3, help="Timed runs per site and method, the best one is reported")
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every replayed response")
+        parser.add_argument('--jitter', type=float, default=0.0, help="Random extra latency, up to that many seconds")
+        parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of the requests answered with 429")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Share of the requests answered with 503")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the injected faults")
+        parser.add_argument('--rate-limits', action='store_true', help="Keep the rate limits of the sites, by default only the scraper itself is measured")
+
+    def handle(self, *args, **options):
+        try:
+            server = ReplayServer(
+                recording_path(options['recording']),
+                latency=options['latency'],
+                jitter=options['jitter'],
+                throttle_rate=options['throttle_rate'],
+                error_rate=options['error_rate'],
+                seed=options['seed'],
+            )
+        except FileNotFoundError as e:
+            logger.error(str(e))
+            return
+
+        self.server = server
+        self.rate_limits = options['rate_limits']
+        self.replay = server.start()
+        # shared by the async runs, spawning the workers once is left out of the timings
+        self.parser = ParsePool()
+        try:
+            for base_url, site_info in SCRAPING_URLS.items():
+                scraper = site_info["scraper"]
+                if options['sites'] and scraper not in options['sites']:
+                    continue
+                listing_pages = self._listing_pages(base_url, site_info)
+                if not listing_pages:
+                    self.stdout.write(f"{scraper}: no recorded pages")
+                    continue
+
+                parse_time = self._parse_time(base_url, scraper, listing_pages)
+                self.stdout.write(f"{scraper} ({len(listing_pages)} listing pages, parse {parse_time * 1000:.1f} ms/page)")
+                for method in options['methods']:
+                    self._run(method, base_url, site_info) # warm up
+                    best = None
+                    for _ in range(options['rounds']):
+                        result = self._run(method, base_url, site_info)
+                        if best is None or result["elapsed"] < best["elapsed"]:
+                            best = result
+                    # traced apart, tracemalloc slows every allocation down
+                    tracemalloc.start()
+                    self._run(method, base_url, site_info)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                    self.stdout.write(
+                        f"  {method:<6} {best['pages'] / best['elapsed']:8.1f} pages/s  "
+                        f"{best['products'] / best['elapsed']:8.1f} products/s  {peak / 2**20:6.1f} MiB peak  "
+                        f"({best['pages']} pages, {best['products']} products, {best['elapsed']:.2f}s, "
+                        f"{best['throttled']} throttled, {best['errors']} errors)"
+                    )
+        finally:
+            self.parser.close()
+            server.stop()
+
+    def _listing_pages(self, base_url, site_info):
+        """(category, body) of the recorded listing pages of a site"""
+        pages = []
+        for category in site_info["categories"]:
+            category_key = traffic_key(base_url + category["url"])
+            for key in sorted(self.server.pages):
+                if is_listing_page(key, category_key):
+                    pages.append((category, self.server.body(key)))
+        return pages
+
+    def _parse_time(self, base_url, scraper, listing_pages):
+        """Seconds to parse one listing page, in process"""
+        start = time.perf_counter()
+        for category, body in listing_pages:
+            if body.lstrip()[:1] == "{":
+                parse_json_listing(body, scraper, base_url, category["url"], category["type"])
+            else:
+                parse_listing(body, scraper, base_url, category["type"])
+        return (time.perf_counter() - start) / len(listing_pages)
+
+    def _sessions(self, names_dir):
+        # an empty name cache, the product pages are fetched like on a first run
+        sessions = SessionManager(names=ProductNameCache(Path(names_dir) / "names.json"), use_cache=False, replay=self.replay)
+        if not self.rate_limits:
+            sessions.rate_limiter = HostRateLimiter({get_host(base_url): UNLIMITED for base_url in SCRAPING_URLS})
+        return sessions
+
+    def _run(self, method, base_url, site_info):
+        """Scrape every category of a site from the replay server"""
+        self.server.reset()
+        with tempfile.TemporaryDirectory() as names_dir:
+            start = time.perf_counter()
+            if method == "sync":
+                with self._sessions(names_dir) as sessions:
+                    products = scrape_category(base_url, site_info["categories"], site_info["scraper"], sessions)
+            else:
+                products = asyncio.run(self._scrape_async(base_url, site_info, names_dir))
+            elapsed = time.perf_counter() - start
+        return {
+            "elapsed": elapsed,
+            "pages": self.server.stats["served"],
+            "products": len(products),
+            "throttled": self.server.stats["throttled"],
+            "errors": self.server.stats["errors"],
+        }
+
+    async def _scrape_async(self, base_url, site_info, names_dir):
+        async with self._sessions(names_dir) as sessions:
+            categories = await asyncio.gather(*[
+                scrape_category_async(base_url, category, site_info["scraper"], sessions, self.parser)
+                for category in site_info["categories"]
+            ])
+        return [product for products in categories for product in products]
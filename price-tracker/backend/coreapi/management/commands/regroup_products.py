@@ -1,5 +1,6 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from coreapi.services.product_grouping.processor import ProductProcessor
+from coreapi.constants import INGESTION
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,13 +15,24 @@ class Command(BaseCommand):
             type=str, 
             help='Only regroup specific category (e.g., gpu)'
         )
+        parser.add_argument(
+            '--engine',
+            type=str,
+            choices=['orm', 'copy'],
+            default=INGESTION["engine"],
+            help='copy stages the products with COPY and regroups them with set-based SQL (PostgreSQL, for large catalogs)'
+        )
     
     def handle(self, *args, **options):
         processor = ProductProcessor()
         
         self.stdout.write("Re-grouping products...")
         
-        stats = processor.regroup_all(category=options.get('category'))
+        try:
+            stats = processor.regroup_all(category=options.get('category'), engine=options['engine'])
+        except RuntimeError as e:
+            # the copy engine on a database other than PostgreSQL
+            raise CommandError(str(e))
         
         self.stdout.write(
             self.style.SUCCESS(
@@ -31,3 +43,5 @@ class Command(BaseCommand):
                 f"  Errors: {stats['errors']}"
             )
         )
+        if stats.get('timings'):
+            self.stdout.write("  Phases: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in stats['timings'].items()))
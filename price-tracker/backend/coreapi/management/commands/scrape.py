@@ -1,8 +1,19 @@
 from pathlib import Path
-from django.core.management.base import BaseCommand
-import asyncio, time, json
-from coreapi.services.scraper.main import scrape_websites_async, scrape_websites
+from django.core.management.base import BaseCommand, CommandError
+import asyncio, time
+from coreapi.services.scraper.main import scrape_websites
+from coreapi.services.scraper.pipeline import scrape_and_ingest
+from coreapi.services.scraper.http_cache import HttpCache
+from coreapi.services.scraper.fingerprints import PageFingerprints
+from coreapi.services.scraper.output import iter_batches, iter_records
+from coreapi.services.scraper.journal import RunJournal
+from coreapi.services.scraper.jobs import new_run_id, scrape_with_workers
+from coreapi.services.scraper.replay import TrafficRecorder, recording_path
+from coreapi.services.scraper.metrics import MetricsCollector
+from coreapi.services.scraper.output import JSON_DIR
+from coreapi.constants import SCRAPING_PIPELINE, INGESTION
 from coreapi.services.product_grouping.processor import ProductProcessor
+from coreapi.services.product_grouping.staging import StagingIngestion
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,43 +22,98 @@ class Command(BaseCommand):
     help = "Scrape websites for products and group them"
     
     def add_arguments(self, parser):
-        parser.add_argument('--method', type=str, choices=['sync', 'async'], 
-                    default='async', help='Scraping method to use')
-        parser.add_argument('--file', type=str, help="Path to JSON file with scraped results (skip scraping)")
+        parser.add_argument('--method', type=str, choices=['sync', 'async', 'distributed'], 
+                    default='async', help='Scraping method to use, distributed only seeds jobs for scrape_worker processes and ingests their results')
+        parser.add_argument('--file', type=str, help="Path to the scraped results (.ndjson, .ndjson.gz or a legacy JSON array) to ingest instead of scraping")
+        parser.add_argument('--engine', type=str, choices=['orm', 'copy'], default=INGESTION["engine"],
+                    help="How --file is ingested, copy stages the whole file with COPY and applies it with set-based SQL (PostgreSQL, for 100k+ products)")
+        parser.add_argument('--no-cache', action='store_true', help="Download every page in full, without the http cache")
+        parser.add_argument('--clear-cache', action='store_true', help="Empty the http cache before scraping")
+        parser.add_argument('--reparse', action='store_true', help="Parse and ingest every listing page, even the ones unchanged since the last run")
+        parser.add_argument('--resume', type=str, metavar='RUN_ID', help="Continue an interrupted run from its journal (its jobs with --method distributed), the pages it completed aren't fetched again")
+        parser.add_argument('--record', type=str, metavar='NAME', help="Save every fetched page to json/recordings/NAME, to replay the run with benchmark_scraper (sync and async methods)")
+        parser.add_argument('--metrics', type=str, metavar='PATH', default=str(JSON_DIR / "metrics.json"), help="Where to write the json metrics report of the scraping (latency, bytes, statuses, waits, parse time...)")
+        parser.add_argument('--prometheus', type=str, metavar='PATH', help="Also write the metrics in the Prometheus text format, e.g. to the node_exporter textfile directory")
+        parser.add_argument('--deadline', type=float, metavar='SECONDS', help="Stop scraping after this many seconds and ingest what was scraped, the rest is reported as skipped")
     
     def handle(self, *args, **options):
         start_time = time.time()
         products = []
+        run_stats = {}
         
         file_path = options.get('file')
         
-        if not file_path:
-            if options['method'] == 'async':
-                logger.info("Starting asynchronous scraping...")
-                products = asyncio.run(scrape_websites_async())
-            else:
-                logger.info("Starting synchronous scraping...")
-                products = scrape_websites()
+        if options['clear_cache']:
+            HttpCache().clear()
+        use_cache = False if options['no_cache'] else None
+        fingerprints = PageFingerprints(force=options['reparse'])
+        processor = ProductProcessor()
+        stats = None
+        journal = None
+        
+        if not file_path and options['method'] == 'distributed':
+            logger.info("Starting distributed scraping, waiting for scrape_worker processes...")
+            stats = scrape_with_workers(processor, options['resume'] or new_run_id(), run_stats, options['deadline'])
+        elif not file_path:
+            try:
+                journal = RunJournal.open(options['resume']) if options['resume'] else RunJournal.create()
+            except FileNotFoundError as e:
+                logger.error(str(e))
+                return
+            recorder = TrafficRecorder(recording_path(options['record'])) if options['record'] else None
+            metrics = MetricsCollector()
+            try:
+                if options['method'] == 'async':
+                    # the products are ingested while the scraping goes on
+                    logger.info("Starting asynchronous scraping and ingestion...")
+                    stats = asyncio.run(scrape_and_ingest(processor, run_stats, use_cache, fingerprints, journal, options['deadline'], recorder, metrics))
+                else:
+                    logger.info("Starting synchronous scraping...")
+                    products = scrape_websites(run_stats, use_cache, fingerprints, journal, options['deadline'], recorder, metrics)
+            finally:
+                journal.close()
+                if recorder is not None:
+                    recorder.close()
+                # a failed run is the one whose metrics matter most
+                metrics.write_json(options['metrics'])
+                if options['prometheus']:
+                    metrics.write_prometheus(options['prometheus'])
         else:
             product_file = Path(file_path)
             if not product_file.exists():
                 logger.error(f"File not found: {file_path}")
                 return
             try:
-                logger.info(f"Loading scraped results from file: {file_path}")
-                with product_file.open('r',encoding='UTF-8') as f:
-                    products = json.load(f)
-                logger.info(f"Loaded {len(products) if isinstance(products, list) else 'unknown'} products from file")
+                # streamed in batches, the file is never loaded whole
+                logger.info(f"Streaming scraped results from file: {file_path}")
+                if options['engine'] == 'copy':
+                    try:
+                        stats = StagingIngestion(processor).load(iter_records(product_file))
+                    except RuntimeError as e:
+                        # not a PostgreSQL database
+                        raise CommandError(str(e))
+                else:
+                    stats = processor.begin_run()
+                    for batch in iter_batches(product_file, SCRAPING_PIPELINE["batch_size"]):
+                        processor.ingest_batch(batch, stats)
+                    processor.finish_run(stats)
+                logger.info(f"Loaded {stats['total']} products from file")
+            except CommandError:
+                raise
             except Exception as e:
-                logger.error(f"Failed to load JSON file: {e}")
+                logger.error(f"Failed to load scraped results file: {e}")
                 return
             
         scraping_elapsed_time = time.time() - start_time
         logger.info(f"Scraping completed in {scraping_elapsed_time:.2f} seconds")
         
-        logger.info("Processing and grouping products...")
-        processor = ProductProcessor()
-        stats = processor.ingest_and_group(products)
+        if stats is None:
+            logger.info("Processing and grouping products...")
+            stats = processor.ingest_and_group(products, run_stats.get("skipped"))
+        # only now are the products of the fingerprinted pages in the database
+        fingerprints.save(failed_ids=stats['failed_ids'])
+        if journal is not None:
+            journal.discard()
         
         process_time = time.time() - scraping_elapsed_time - start_time
         self.stdout.write(
@@ -55,11 +121,28 @@ class Command(BaseCommand):
                 f"✓ Processed in {process_time:.2f}s\n"
                 f"  Created: {stats['created']}\n"
                 f"  Updated: {stats['updated']}\n"
+                f"  Unchanged: {stats['unchanged']}\n"
                 f"  Groups created: {stats['groups_created']}\n"
                 f"  Grouped: {stats['grouped']}\n"
                 f"  Errors: {stats['errors']}"
             )
         )
+        for host, host_stats in run_stats.get("hosts", {}).items():
+            self.stdout.write(
+                f"  {host}: concurrency {host_stats['concurrency']} "
+                f"(peak {host_stats['peak_concurrency']}, throttled {host_stats['throttled']}/{host_stats['requests']})"
+            )
+        if run_stats.get("http_cache"):
+            self.stdout.write(f"  http cache: {run_stats['http_cache']['hits']} pages not modified")
+        if stats.get("timings"):
+            self.stdout.write("  Phases: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in stats["timings"].items()))
     
         
         
+        if run_stats.get("jobs"):
+            self.stdout.write("  Jobs: " + ", ".join(f"{count} {status}" for status, count in run_stats["jobs"].items()))
+        for host, breaker in run_stats.get("breakers", {}).items():
+            if breaker["trips"]:
+                self.stdout.write(self.style.WARNING(f"  {host}: circuit breaker tripped {breaker['trips']} times"))
+        for skipped in run_stats.get("skipped", []):
+            self.stdout.write(self.style.WARNING(f"  Skipped {skipped['website']} {skipped['url']}: {skipped['reason']}"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+import asyncio
+from coreapi.services.scraper.scheduler import ScrapeScheduler
+from coreapi.services.product_grouping.processor import ProductProcessor
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Keep scraping every site and category on its own cadence, volatile categories more often than stable ones"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--max-concurrent', type=int, help="Categories scraped at the same time, SCRAPING_SCHEDULE['max_concurrent'] by default")
+        parser.add_argument('--once', action='store_true', help="Scrape the categories due now and exit")
+        parser.add_argument('--no-cache', action='store_true', help="Download every page in full, without the http cache")
+    
+    def handle(self, *args, **options):
+        use_cache = False if options['no_cache'] else None
+        scheduler = ScrapeScheduler(ProductProcessor(), options['max_concurrent'], use_cache)
+        try:
+            asyncio.run(scheduler.run(once=options['once']))
+        except KeyboardInterrupt:
+            logger.info("Scrape scheduler stopped")
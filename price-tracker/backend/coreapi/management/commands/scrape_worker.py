@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+import asyncio
+from coreapi.services.scraper.jobs import run_worker
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Scrape the jobs queued by scrape --method distributed, start as many as needed on one or several machines"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--name', type=str, help="Worker name stored on the jobs it claims, hostname-pid by default")
+        parser.add_argument('--concurrency', type=int, default=1, help="Jobs scraped at the same time by this worker")
+        parser.add_argument('--burst', action='store_true', help="Stop once the queue is empty instead of waiting for new jobs")
+        parser.add_argument('--no-cache', action='store_true', help="Download every page in full, without the http cache")
+    
+    def handle(self, *args, **options):
+        use_cache = False if options['no_cache'] else None
+        try:
+            stats = asyncio.run(run_worker(options['name'], options['concurrency'], options['burst'], use_cache))
+        except KeyboardInterrupt:
+            logger.info("Scrape worker stopped")
+            return
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Worker done\n"
+                f"  Jobs done: {stats['done']}\n"
+                f"  Jobs failed: {stats['failed']}"
+            )
+        )
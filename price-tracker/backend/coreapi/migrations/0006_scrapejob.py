@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coreapi', '0005_remove_productgroup_attributes_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(max_length=40, verbose_name='Scraping run')),
+                ('website', models.CharField(max_length=50, verbose_name='Scraper name')),
+                ('base_url', models.URLField(verbose_name='Website URL')),
+                ('category_url', models.CharField(max_length=200, verbose_name='Category URL')),
+                ('category', models.CharField(choices=[('CPU', 'Cpu'), ('GPU', 'Gpu'), ('RAM', 'Ram'), ('STORAGE', 'Storage'), ('MOTHERBOARD', 'Motherboard'), ('PSU', 'Psu'), ('CASE', 'Case')], verbose_name='Product Category')),
+                ('first_page', models.PositiveIntegerField(verbose_name='First page')),
+                ('last_page', models.PositiveIntegerField(verbose_name='Last page')),
+                ('json_listing', models.BooleanField(blank=True, null=True, verbose_name='Read from the json listing')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Claimed by')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='Claimed at')),
+                ('page_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Category page count')),
+                ('results', models.JSONField(blank=True, default=list, verbose_name='Scraped records')),
+                ('error', models.TextField(blank=True, verbose_name='Last error')),
+                ('ingested', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last updated')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['run_id', 'status'], name='coreapi_scr_run_id_29fa96_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coreapi', '0006_scrapejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('website', models.CharField(max_length=50, verbose_name='Scraper name')),
+                ('category', models.CharField(choices=[('CPU', 'Cpu'), ('GPU', 'Gpu'), ('RAM', 'Ram'), ('STORAGE', 'Storage'), ('MOTHERBOARD', 'Motherboard'), ('PSU', 'Psu'), ('CASE', 'Case')], verbose_name='Product Category')),
+                ('interval', models.PositiveIntegerField(verbose_name='Seconds between two runs')),
+                ('change_rate', models.FloatField(blank=True, null=True, verbose_name='Share of changed listing pages, averaged over the recent runs')),
+                ('next_due', models.DateTimeField(db_index=True, verbose_name='Next run')),
+                ('last_run_at', models.DateTimeField(blank=True, null=True, verbose_name='Last run')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last error')),
+                ('runs', models.PositiveIntegerField(default=0, verbose_name='Runs')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('website', 'category'), name='unique_scrape_schedule')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coreapi', '0007_scrapeschedule'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='product',
+            name='seen',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='last_seen_run',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Last seen by the ingestion run'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['website', 'category', 'last_seen_run'], name='coreapi_pro_website_bca7df_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_groups(apps, schema_editor):
+    """Keep the oldest group of each (canonical_name, category) and move the products of the others to it"""
+    ProductGroup = apps.get_model('coreapi', 'ProductGroup')
+    Product = apps.get_model('coreapi', 'Product')
+    
+    duplicates = (
+        ProductGroup.objects.values('canonical_name', 'category')
+        .annotate(count=Count('id'), keep=Min('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        groups = list(ProductGroup.objects.filter(
+            canonical_name=duplicate['canonical_name'],
+            category=duplicate['category'],
+        ).order_by('id'))
+        keeper, others = groups[0], groups[1:]
+        
+        Product.objects.filter(canonical_group__in=others).update(canonical_group=keeper)
+        keeper.starting_price = min(group.starting_price for group in groups)
+        if not keeper.representative_image_url:
+            keeper.representative_image_url = next(
+                (group.representative_image_url for group in others if group.representative_image_url), None
+            )
+        keeper.save(update_fields=['starting_price', 'representative_image_url'])
+        ProductGroup.objects.filter(id__in=[group.id for group in others]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coreapi', '0008_product_last_seen_run'),
+    ]
+
+    # the unique constraint comes in the next migration, postgres won't alter a table
+    # with pending foreign key checks from the product updates of this transaction
+    operations = [
+        migrations.RunPython(merge_duplicate_groups, migrations.RunPython.noop),
+    ]
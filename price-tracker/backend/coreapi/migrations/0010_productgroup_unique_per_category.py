@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coreapi', '0009_merge_duplicate_productgroups'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='productgroup',
+            constraint=models.UniqueConstraint(fields=('canonical_name', 'category'), name='unique_productgroup_per_category'),
+        ),
+    ]
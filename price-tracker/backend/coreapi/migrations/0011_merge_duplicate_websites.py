@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_websites(apps, schema_editor):
+    """Keep the oldest website of each name and move the products of the others to it"""
+    Website = apps.get_model('coreapi', 'Website')
+    Product = apps.get_model('coreapi', 'Product')
+    
+    duplicates = (
+        Website.objects.values('name')
+        .annotate(count=Count('id'), keep=Min('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        others = Website.objects.filter(name=duplicate['name']).exclude(id=duplicate['keep'])
+        Product.objects.filter(website__in=others).update(website_id=duplicate['keep'])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coreapi', '0010_productgroup_unique_per_category'),
+    ]
+
+    # the unique constraint comes in the next migration, like 0009 / 0010
+    operations = [
+        migrations.RunPython(merge_duplicate_websites, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coreapi', '0011_merge_duplicate_websites'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='website',
+            constraint=models.UniqueConstraint(fields=('name',), name='unique_website_name'),
+        ),
+    ]
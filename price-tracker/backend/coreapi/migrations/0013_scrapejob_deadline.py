@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coreapi', '0012_website_unique_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapejob',
+            name='deadline',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Run deadline'),
+        ),
+    ]
@@ -10,6 +10,10 @@ class Website(models.Model):
     name = models.CharField(_("Website name"), max_length=50)
     created_at = models.DateTimeField(_("First added"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Last updated"), auto_now=True)
+    
+    class Meta:
+        # parallel ingestions create the website of a new site with get_or_create against it
+        constraints = [models.UniqueConstraint(fields=["name"], name="unique_website_name")]
 
 
 class Product(models.Model):
@@ -27,7 +31,11 @@ class Product(models.Model):
     
     created_at = models.DateTimeField(_("First scraped"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Last updated"), auto_now=True)
-    seen = models.BooleanField(default=False)
+    last_seen_run = models.PositiveBigIntegerField(_("Last seen by the ingestion run"), default=0)
+    
+    class Meta:
+        # availability of the products a run didn't see, per (website, category) scope
+        indexes = [models.Index(fields=["website", "category", "last_seen_run"])]
     
     
 class ProductGroup(models.Model):
@@ -39,3 +47,58 @@ class ProductGroup(models.Model):
     
     created_at = models.DateTimeField(_("First created"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Last updated"), auto_now=True)
+    
+    class Meta:
+        # parallel ingestions create groups with ON CONFLICT DO NOTHING against it
+        constraints = [
+            models.UniqueConstraint(fields=["canonical_name", "category"], name="unique_productgroup_per_category"),
+        ]
+
+
+class ScrapeJob(models.Model):
+    """A range of listing pages of one category, scraped by a scrape_worker process"""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(status, status.capitalize()) for status in (PENDING, RUNNING, DONE, FAILED)]
+    
+    run_id = models.CharField(_("Scraping run"), max_length=40)
+    website = models.CharField(_("Scraper name"), max_length=50)
+    base_url = models.URLField(_("Website URL"), max_length=200)
+    category_url = models.CharField(_("Category URL"), max_length=200)
+    category = models.CharField(_("Product Category"), choices=CATEGORY_CHOICES)
+    first_page = models.PositiveIntegerField(_("First page"))
+    last_page = models.PositiveIntegerField(_("Last page"))
+    json_listing = models.BooleanField(_("Read from the json listing"), null=True, blank=True)
+    deadline = models.DateTimeField(_("Run deadline"), null=True, blank=True)
+    
+    status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    worker = models.CharField(_("Claimed by"), max_length=100, blank=True)
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    claimed_at = models.DateTimeField(_("Claimed at"), null=True, blank=True)
+    page_count = models.PositiveIntegerField(_("Category page count"), null=True, blank=True)
+    results = models.JSONField(_("Scraped records"), default=list, blank=True)
+    error = models.TextField(_("Last error"), blank=True)
+    ingested = models.BooleanField(default=False)
+    
+    created_at = models.DateTimeField(_("Created"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("Last updated"), auto_now=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=["run_id", "status"])]
+
+
+class ScrapeSchedule(models.Model):
+    """When the scrape_scheduler scrapes one category of a website next, and how often"""
+    website = models.CharField(_("Scraper name"), max_length=50)
+    category = models.CharField(_("Product Category"), choices=CATEGORY_CHOICES)
+    interval = models.PositiveIntegerField(_("Seconds between two runs"))
+    change_rate = models.FloatField(_("Share of changed listing pages, averaged over the recent runs"), null=True, blank=True)
+    next_due = models.DateTimeField(_("Next run"), db_index=True)
+    last_run_at = models.DateTimeField(_("Last run"), null=True, blank=True)
+    last_error = models.TextField(_("Last error"), blank=True)
+    runs = models.PositiveIntegerField(_("Runs"), default=0)
+    
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["website", "category"], name="unique_scrape_schedule")]
@@ -13,7 +13,7 @@ class ProductSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Product
-        exclude = ['seen', 'created_at', 'updated_at']
+        exclude = ['last_seen_run', 'created_at', 'updated_at']
 
 class ProductGroupSerializer(serializers.ModelSerializer):
     class Meta:
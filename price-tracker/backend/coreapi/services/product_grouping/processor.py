@@ -1,53 +1,384 @@
 from coreapi.services.product_grouping.normalizers import gpu
-from django.db import transaction
-from typing import List, Dict
-from django.db.models import Min, F
+from django.db import connection, transaction
+from django.utils import timezone
+from typing import List, Dict, Optional, Tuple
+from django.db.models import Exists, Min, OuterRef, Q, Subquery
 from coreapi.models import Product, ProductGroup, Website
-from coreapi.domain.product import scraped_product
-from coreapi.constants import IMAGE_PRIORITY_RETAILERS
+from coreapi.domain.product import ProductSpecs, scraped_product, unchanged_page
+from coreapi.constants import IMAGE_PRIORITY_RETAILERS, INGESTION
+from .staging import StagingIngestion
 import logging
+import time
 
 logger = logging.getLogger("backend.services")
 
 
-class ProductProcessor:
+# fields a scraped product can't be ingested without
+REQUIRED_FIELDS = ["id", "name", "url", "price", "availability", "category", "website"]
+
+# columns written when a group is created, (canonical_name, category) is unique
+GROUP_INSERT_FIELDS = [
+    "canonical_name", "category", "brand", "starting_price", "representative_image_url", "created_at", "updated_at",
+]
+
+# columns rewritten when a scraped product is already in the database
+PRODUCT_UPSERT_FIELDS = [
+    "name", "short_description", "url", "image_url", "price", "availability",
+    "website", "category", "canonical_group", "last_seen_run", "updated_at",
+]
+
+
+def new_generation() -> int:
+    """Generation of an ingestion run, microseconds since the epoch, so later runs get higher ones"""
+    return time.time_ns() // 1000
+
+
+class IdentityMap:
+    """Websites and groups of an ingestion run, resolved in memory instead of one query per product.
+
+    Warmed with one query per model when the run ingests its first batch, the rows
+    created during the run are added once their transaction commits, so a rolled
+    back product doesn't leave a group that isn't in the database.
+    """
+    
     def __init__(self):
+        self.websites: Dict[str, Website] = {website.name: website for website in Website.objects.all()}
+        self.groups: Dict[tuple, ProductGroup] = {
+            (group.canonical_name, group.category): group for group in ProductGroup.objects.all()
+        }
+        self.image_retailers: Dict[int, Optional[str]] = {} # group id -> retailer of its image, filled as groups come up
+    
+    
+    def website(self, name: str) -> Website:
+        website = self.websites.get(name)
+        if website is None:
+            # another ingestion may create the site meanwhile, get_or_create reads it back on the unique name
+            website, _ = Website.objects.get_or_create(name=name)
+            transaction.on_commit(lambda: self.websites.setdefault(name, website))
+        return website
+    
+    
+    def add_groups(self, groups: List[ProductGroup]) -> Tuple[Dict[tuple, ProductGroup], int]:
+        """
+        Create new groups with INSERT ... ON CONFLICT (canonical_name, category) DO NOTHING,
+        a group another ingestion created in the meantime is read back instead of
+        raising or duplicating, so parallel runs never wait on each other for long
+        
+        Returns:
+            tuple: (canonical_name, category) -> group, number of groups actually created
+        """
+        table = ProductGroup._meta.db_table
+        fields = [ProductGroup._meta.get_field(name) for name in GROUP_INSERT_FIELDS]
+        now = timezone.now()
+        resolved: Dict[tuple, ProductGroup] = {}
+        size = INGESTION["upsert_batch_size"]
+        with connection.cursor() as cursor:
+            for start in range(0, len(groups), size):
+                chunk = groups[start:start + size]
+                params = []
+                for group in chunk:
+                    group.created_at = group.updated_at = now
+                    params.extend(field.get_db_prep_save(getattr(group, field.attname), connection) for field in fields)
+                placeholders = ", ".join(["(" + ", ".join(["%s"] * len(fields)) + ")"] * len(chunk))
+                cursor.execute(
+                    f"INSERT INTO {table} ({', '.join(field.column for field in fields)}) VALUES {placeholders} "
+                    f"ON CONFLICT (canonical_name, category) DO NOTHING RETURNING id, canonical_name, category",
+                    params,
+                )
+                inserted = {(name, category): group_id for group_id, name, category in cursor.fetchall()}
+                for group in chunk:
+                    key = (group.canonical_name, group.category)
+                    if key in inserted:
+                        group.id = inserted[key]
+                        group._state.adding = False
+                        group._state.db = connection.alias
+                        resolved[key] = group
+        created = len(resolved)
+        
+        lost = [group for group in groups if (group.canonical_name, group.category) not in resolved]
+        if lost:
+            for group in ProductGroup.objects.filter(
+                canonical_name__in={group.canonical_name for group in lost},
+                category__in={group.category for group in lost},
+            ):
+                resolved.setdefault((group.canonical_name, group.category), group)
+        
+        def remember():
+            for key, group in resolved.items():
+                self.groups.setdefault(key, group)
+        transaction.on_commit(remember)
+        return resolved, created
+
+
+class ProductProcessor:
+    def __init__(self, bulk: Optional[bool] = None):
+        """
+        Args:
+            bulk: write each batch with multi-row upserts, None follows INGESTION["bulk"]
+        """
         self.normalizers = {
             "gpu": gpu.GPUNormalizer("gpu.json")
         }
+        self.bulk = INGESTION["bulk"] if bulk is None else bulk
     
     
-    def ingest_and_group(self, products: List[scraped_product]) -> Dict:
+    def ingest_and_group(self, products: List[scraped_product], skipped: Optional[List[Dict]] = None, scopes: Optional[List[Dict]] = None) -> Dict:
         """
         Ingest scraped products and assign to groups
         
         Args:
-            products: List of dicts with scraped product data
+            products: List of dicts with scraped product data, unchanged page markers
+                only mark the products they hold as seen
+            skipped: categories the run gave up on, see finish_run
+            scopes: categories covered by the products, see begin_run
             
         Returns:
             dict: Statistics about ingestion/grouping
         """
-        stats = {
-            'total': len(products),
+        stats = self.begin_run(scopes)
+        self.ingest_batch(products, stats)
+        return self.finish_run(stats, skipped, scopes)
+    
+    
+    def begin_run(self, scopes: Optional[List[Dict]] = None) -> Dict:
+        """
+        Start an ingestion run, the products are then sent in batches with ingest_batch
+        while the scraping goes on, and finish_run closes the run
+        
+        Args:
+            scopes: only these categories ({"website", "category"}) are scraped by the run,
+                the products of the others are left alone, None means the categories the
+                records of the run turn out to cover
+        
+        Returns:
+            dict: Statistics of the run, updated by every batch, "run" is the generation
+                stamped on the products the run sees
+        """
+        # nothing is rewritten up front, the products the run sees get its generation
+        # and finish_run looks for the older ones
+        return {
+            'run': new_generation(),
+            'covered': set(), # (website, category) of the records ingested so far
+            'identity': None, # IdentityMap of the run, warmed by the first batch
+            'total': 0,
             'created': 0,
             'updated': 0,
+            'unchanged': 0,
             'groups_created': 0,
             'grouped': 0,
-            'errors': 0
+            'errors': 0,
+            'failed_ids': set() # ids of the products rejected as errors, their pages aren't fingerprinted
         }
+    
+    
+    def ingest_batch(self, products: List[scraped_product], stats: Dict) -> Dict:
+        """
+        Ingest one batch of scraped products and unchanged page markers
+        
+        Args:
+            products: List of dicts with scraped product data, unchanged page markers
+                only mark the products they hold as seen by the run
+            stats: Statistics of the run returned by begin_run
+        """
+        unchanged_pages: List[unchanged_page] = [record for record in products if record.get("page_unchanged")]
+        products = [record for record in products if not record.get("page_unchanged")]
+        stats['total'] += len(products)
+        stats['covered'].update((record.get("website"), record.get("category")) for record in unchanged_pages + products)
         
-        # Mark existing products as unseen
-        Product.objects.all().update(seen=False)
+        # products of unchanged pages are still listed in stock, nothing else to rewrite
+        for page in unchanged_pages:
+            stats['unchanged'] += Product.objects.filter(id__in=page["ids"]).update(last_seen_run=stats['run'], availability=True)
         
+        if self.bulk:
+            self._ingest_bulk(products, stats)
+        else:
+            self._ingest_one_by_one(products, stats)
+        
+        return stats
+    
+    
+    def _ingest_one_by_one(self, products: List[scraped_product], stats: Dict):
         for product_data in products:
+            if not self._is_valid(product_data, stats):
+                continue
             try:
                 self._process_single_product(product_data, stats)
             except Exception as e:
                 stats['errors'] += 1
+                stats['failed_ids'].add(product_data["id"])
                 logger.error(f"Error processing {product_data.get('name')}: {e}")
-            
-        # Mark unseen product as unavailable
-        Product.objects.filter(seen=False).update(availability=False)
+    
+    
+    def _ingest_bulk(self, products: List[scraped_product], stats: Dict):
+        """
+        Write a batch with a few set-based queries: the websites and groups of the whole
+        batch are resolved at once, then the products go in with multi-row upserts
+        (INSERT ... ON CONFLICT (id) DO UPDATE). If the upsert fails, the batch is
+        ingested one product at a time so only the faulty products are lost
+        """
+        records = products
+        # a row can only be upserted once per statement, the last record of a product wins
+        unique = {product["id"]: product for product in products if product.get("id")}
+        missing_id = len(products) - sum(1 for product in products if product.get("id"))
+        stats['errors'] += missing_id
+        duplicates = len(products) - missing_id - len(unique)
+        
+        rows: Dict[str, Product] = {}
+        website_names = set()
+        for product in unique.values():
+            if not self._is_valid(product, stats):
+                continue
+            try:
+                website_names.add(product["website"])
+                rows[product["id"]] = Product(
+                    id=product["id"],
+                    name=product["name"],
+                    short_description=product.get("short_description", ""),
+                    url=product["url"],
+                    image_url=product.get("image_url") or "",
+                    price=product["price"],
+                    availability=product["availability"],
+                    category=product["category"],
+                    last_seen_run=stats['run'],
+                )
+            except Exception as e:
+                stats['errors'] += 1
+                stats['failed_ids'].add(product["id"])
+                logger.error(f"Error processing {product.get('name')}: {e}")
+        products = [unique[product_id] for product_id in rows]
+        if not products:
+            return
+        
+        try:
+            identity = self._identity(stats)
+            websites = {name: identity.website(name) for name in website_names}
+            groups = self._resolve_groups(products, stats)
+            existing = set(Product.objects.filter(id__in=list(rows)).values_list("id", flat=True))
+        except Exception as e:
+            logger.warning(f"Resolving the websites and groups of {len(products)} products failed, ingesting them one by one: {e}")
+            self._ingest_one_by_one(products, stats)
+            return
+        for product in products:
+            row = rows[product["id"]]
+            row.website = websites[product["website"]]
+            row.canonical_group = groups.get(product["id"])
+        rows = list(rows.values())
+        
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(
+                    rows,
+                    batch_size=INGESTION["upsert_batch_size"],
+                    update_conflicts=True,
+                    unique_fields=["id"],
+                    update_fields=PRODUCT_UPSERT_FIELDS,
+                )
+        except Exception as e:
+            logger.warning(f"Bulk upsert of {len(rows)} products failed, ingesting them one by one: {e}")
+            self._ingest_one_by_one(products, stats)
+            return
+        
+        created = sum(1 for row in rows if row.id not in existing)
+        stats['created'] += created
+        stats['updated'] += len(rows) - created + duplicates
+        stats['grouped'] += sum(1 for product in records if product.get("id") in groups)
+    
+    
+    def missing_fields(self, product: scraped_product) -> List[str]:
+        """Required fields a scraped product lacks or holds no usable value in, empty when it can be ingested"""
+        missing = [field for field in REQUIRED_FIELDS if product.get(field) in (None, "")]
+        if "price" not in missing:
+            try:
+                float(product["price"])
+            except (TypeError, ValueError):
+                missing.append("price")
+        return missing
+    
+    
+    def _is_valid(self, product: scraped_product, stats: Dict) -> bool:
+        missing = self.missing_fields(product)
+        if missing:
+            stats['errors'] += 1
+            if product.get("id"):
+                stats['failed_ids'].add(product["id"])
+            logger.error(f"Error processing {product.get('name')}: missing or invalid {', '.join(missing)}")
+        return not missing
+    
+    
+    def _identity(self, stats: Dict) -> IdentityMap:
+        if stats['identity'] is None:
+            stats['identity'] = IdentityMap()
+        return stats['identity']
+    
+    
+    def _resolve_groups(self, products: List[scraped_product], stats: Dict) -> Dict[str, ProductGroup]:
+        """
+        Normalize a batch and find the group of each product, the missing groups are created
+        
+        Returns:
+            dict: product id -> group, the products that couldn't be normalized are left out
+        """
+        members: Dict[tuple, List[scraped_product]] = {} # (canonical_name, category) -> products
+        brands: Dict[tuple, str] = {}
+        for product in products:
+            canonical_product = self.normalize(product)
+            if canonical_product is not None:
+                key = (canonical_product.model, product["category"])
+                members.setdefault(key, []).append(product)
+                brands.setdefault(key, canonical_product.brand)
+        if not members:
+            return {}
+        
+        identity = self._identity(stats)
+        missing = [key for key in members if key not in identity.groups]
+        groups, created = identity.add_groups([
+            ProductGroup(
+                canonical_name=key[0],
+                category=key[1],
+                brand=brands[key],
+                starting_price=min(product["price"] for product in members[key]),
+                representative_image_url=members[key][0].get("image_url") or "",
+            )
+            for key in missing
+        ]) if missing else ({}, 0)
+        stats['groups_created'] += created
+        
+        by_product = {}
+        for key, group_products in members.items():
+            group = groups.get(key)
+            if group is None:
+                group = identity.groups[key]
+                self._maybe_update_image(group, self._best_image_product(group_products), identity.image_retailers)
+            for product in group_products:
+                by_product[product["id"]] = group
+        return by_product
+    
+    
+    def _best_image_product(self, products: List[scraped_product]) -> scraped_product:
+        """Product of the most prioritized retailer, for the group image"""
+        def rank(product):
+            retailer = product.get("website", "")
+            if not product.get("image_url"):
+                return len(IMAGE_PRIORITY_RETAILERS) + 1
+            return IMAGE_PRIORITY_RETAILERS.index(retailer) if retailer in IMAGE_PRIORITY_RETAILERS else len(IMAGE_PRIORITY_RETAILERS)
+        return min(products, key=rank)
+    
+    
+    def finish_run(self, stats: Dict, skipped: Optional[List[Dict]] = None, scopes: Optional[List[Dict]] = None) -> Dict:
+        """
+        Mark the products no batch has seen as unavailable and update the group prices
+        
+        Args:
+            stats: Statistics of the run returned by begin_run
+            skipped: categories the run gave up on ({"website", "category"}, e.g. circuit
+                breaker open or deadline hit), their unseen products keep their availability
+            scopes: categories of the run, as given to begin_run, None means the ones
+                the ingested records covered, a site that gave nothing keeps its products
+        """
+        stats.pop('identity', None)
+        scopes = self.run_scopes(stats, scopes)
+        Website.objects.filter(name__in={scope["website"] for scope in scopes}).update(updated_at=timezone.now())
+        self.mark_unavailable(stats['run'], skipped, scopes)
         
         # updating setting the group price
         self._update_group_pricing()
@@ -55,14 +386,44 @@ class ProductProcessor:
         return stats
     
     
+    def mark_unavailable(self, run: int, skipped: Optional[List[Dict]] = None, scopes: Optional[List[Dict]] = None) -> int:
+        """Mark the available products of the scopes the run didn't see as unavailable, only those rows are rewritten"""
+        unseen = self._in_scopes(Product.objects.filter(last_seen_run__lt=run, availability=True), scopes)
+        if skipped:
+            unseen = unseen.exclude(self._scopes_condition(skipped))
+        return unseen.update(availability=False)
+    
+    
+    def run_scopes(self, stats: Dict, scopes: Optional[List[Dict]]) -> List[Dict]:
+        """Categories a run covers: the given scopes, or those its ingested records came from"""
+        if scopes is not None:
+            return scopes
+        return [{"website": website, "category": category} for website, category in stats['covered']]
+    
+    
+    def _in_scopes(self, queryset, scopes: Optional[List[Dict]]):
+        if scopes is None:
+            return queryset
+        return queryset.filter(self._scopes_condition(scopes))
+    
+    
+    def _scopes_condition(self, scopes: List[Dict]) -> Q:
+        """(website, category) scopes as a condition on the indexed columns, the website names are looked up once"""
+        website_ids: Dict[str, List[int]] = {}
+        for website_id, name in Website.objects.filter(name__in={scope["website"] for scope in scopes}).values_list("id", "name"):
+            website_ids.setdefault(name, []).append(website_id)
+        condition = Q(pk__in=[])
+        for scope in scopes:
+            condition |= Q(website_id__in=website_ids.get(scope["website"], []), category=scope["category"])
+        return condition
+    
+    
     @transaction.atomic
     def _process_single_product(self, product: scraped_product, stats: Dict):
         """Process a single product"""
-        website_obj, _ = Website.objects.update_or_create(
-            name = product["website"]
-        )
+        website_obj = self._identity(stats).website(product["website"])
         
-        group_obj = self._get_or_create_group(product)
+        group_obj = self._get_or_create_group(product, stats)
         if group_obj:
             stats['grouped'] += 1
         
@@ -73,80 +434,108 @@ class ProductProcessor:
                 "name": product["name"],
                 "short_description": product.get("short_description", ""),
                 "url": product["url"],
-                "image_url": product["image_url"],
+                "image_url": product.get("image_url") or "",
                 "price": product["price"],
                 "availability": product["availability"],
                 "website": website_obj,
                 "category": product["category"],
                 "canonical_group": group_obj,
-                "seen": True,
+                "last_seen_run": stats['run'],
             }
         )
         
         stats['created' if created else 'updated'] += 1
         
     
-    def _get_or_create_group(self, product_data: scraped_product):
-        """Get or create product group for a product"""
+    def normalize(self, product_data: scraped_product) -> Optional[ProductSpecs]:
+        """Canonical specs of a product, None when it can't be normalized"""
         category = product_data["category"]
         if category not in self.normalizers:
             logger.error(f"No normalizer for category {category}")
             return None
         
         try:
-            canonical_product = self.normalizers[category].normalize(product_data['name'])
+            return self.normalizers[category].normalize(product_data['name'])
+        except Exception as e:
+            logger.warning(f"Could not normalize '{product_data['name']}': {e}")
+            return None
+    
+    
+    def _get_or_create_group(self, product_data: scraped_product, stats: Optional[Dict] = None):
+        """Get or create product group for a product"""
+        canonical_product = self.normalize(product_data)
+        if canonical_product is None:
+            return None
+        
+        key = (canonical_product.model, product_data["category"])
+        identity = self._identity(stats) if stats is not None else None
+        group = identity.groups.get(key) if identity is not None else None
+        created = False
+        if group is None and identity is not None:
+            groups, created = identity.add_groups([ProductGroup(
+                canonical_name= canonical_product.model,
+                category=product_data["category"],
+                brand=canonical_product.brand,
+                starting_price=product_data["price"],
+                representative_image_url=product_data.get("image_url") or "",
+            )])
+            group = groups[key]
+        elif group is None:
             group, created = ProductGroup.objects.get_or_create(
                 canonical_name= canonical_product.model,
-                category=category,
+                category=product_data["category"],
                 defaults={
                     'brand': canonical_product.brand,
                     'starting_price': product_data["price"],
-                    'representative_image_url': product_data["image_url"], 
-                    'attributes': {
-                        'chipset': canonical_product.key_specs['chipset'],
-                        'model_number': canonical_product.key_specs['model_number'],
-                        'model_variant': canonical_product.key_specs.get('model_variant'),
-                        'vram': canonical_product.key_specs.get('vram'),
-                        'board_partner': canonical_product.key_specs['board_partner'],
-                    }
+                    'representative_image_url': product_data.get("image_url") or "", 
                 }
             )
-            if not created and product_data.get("image_url"):
-                self._
-                
-            return group
-        except Exception as e:
-            logger.warning(f"Could not normalize '{product_data['name']}': {e}")
-            return None
+        if created and stats is not None:
+            stats['groups_created'] += 1
+        if not created and product_data.get("image_url"):
+            self._maybe_update_image(group, product_data, identity.image_retailers if identity is not None else None)
+            
+        return group
     
 
     def _update_group_pricing(self):
-        """Update starting_price for all groups"""
-        groups = ProductGroup.objects.all()
-        updated = 0
-        
-        for group in groups:
-            min_price = group.products.filter(availability=True).aggregate(
-                min_price=Min('price')
-            )['min_price']
-            
-            if min_price and group.starting_price != min_price:
-                group.starting_price = min_price
-                group.save()
-                updated += 1
-        return updated
+        """Set the starting_price of every group to its cheapest available product, in one UPDATE"""
+        cheapest = (
+            Product.objects.filter(canonical_group=OuterRef('pk'), availability=True)
+            .order_by()
+            .values('canonical_group')
+            .annotate(min_price=Min('price'))
+            .values('min_price')
+        )
+        return (
+            ProductGroup.objects.filter(Exists(cheapest))
+            .exclude(starting_price=Subquery(cheapest))
+            .update(starting_price=Subquery(cheapest), updated_at=timezone.now())
+        )
     
     
-    def regroup_all(self, category: str = None):
-        """Re-group all existing products (useful for rule updates)"""
+    def regroup_all(self, category: str = None, engine: Optional[str] = None):
+        """
+        Re-group all existing products (useful for rule updates)
+        
+        Args:
+            category: only regroup this category, the availability of the others is left alone
+            engine: "orm" or "copy" (StagingIngestion), None follows INGESTION["engine"]
+        """
         filters = {}
         if category:
             filters['category'] = category
         
         # Get products as list of dicts
         products_qs = Product.objects.filter(**filters).select_related('website')
+        scopes = None
+        if category:
+            scopes = [
+                {"website": website, "category": category}
+                for website in products_qs.values_list("website__name", flat=True).distinct()
+            ]
         
-        products_data = [
+        products_data = (
             {
                 'id': p.id,
                 'name': p.name,
@@ -158,11 +547,15 @@ class ProductProcessor:
                 'category': p.category,
                 'website': p.website.name,
             }
-            for p in products_qs
-        ]
+            for p in products_qs.iterator(chunk_size=INGESTION["upsert_batch_size"])
+        )
+        
+        if (engine or INGESTION["engine"]) == "copy":
+            # streamed straight from the query into the staging table
+            return StagingIngestion(self).load(products_data, scopes=scopes)
         
         # Process like normal ingestion
-        stats = self.ingest_and_group(products_data)
+        stats = self.ingest_and_group(list(products_data), scopes=scopes)
         
         return stats
         
@@ -189,28 +582,46 @@ class ProductProcessor:
         return product.image_url if product else ''
 
 
-    def _maybe_update_image(self, group: ProductGroup, product_data: scraped_product):
-        """Update group image if new product has better image"""
+    def _maybe_update_image(self, group: ProductGroup, product_data: scraped_product, retailers: Optional[Dict[int, Optional[str]]] = None):
+        """
+        Update group image if new product has better image
+        
+        Args:
+            retailers: group id -> retailer of its current image, remembered across
+                calls so the image's product is looked up once per group
+        """
+        if not product_data.get("image_url") or product_data["image_url"] == group.representative_image_url:
+            return
+        
+        retailer = product_data.get("website", "")
         if not group.representative_image_url:
             group.representative_image_url = product_data["image_url"]
             group.save(update_fields=['representative_image_url'])
+            if retailers is not None:
+                retailers[group.id] = retailer
             return
         
         # if the product is from a prioritized retailer use it's image
-        retailer = product_data.get("website", "")
         if retailer in IMAGE_PRIORITY_RETAILERS:
             # Check if current image is from lower priority retailer
-            current_product = group.products.filter(
-                image_url=group.representative_image_url
-            ).first()
+            if retailers is not None and group.id in retailers:
+                current_retailer = retailers[group.id]
+            else:
+                current_product = group.products.filter(
+                    image_url=group.representative_image_url
+                ).select_related('website').first()
+                current_retailer = current_product.website.name if current_product else None
+                if retailers is not None:
+                    retailers[group.id] = current_retailer
             
-            if current_product:
-                current_retailer = current_product.website.name
+            if current_retailer:
                 if current_retailer not in IMAGE_PRIORITY_RETAILERS or \
                    IMAGE_PRIORITY_RETAILERS.index(retailer) < \
                    IMAGE_PRIORITY_RETAILERS.index(current_retailer):
                     group.representative_image_url = product_data["image_url"]
                     group.save(update_fields=['representative_image_url'])
+                    if retailers is not None:
+                        retailers[group.id] = retailer
 
             
     def update_group_pricing(self):
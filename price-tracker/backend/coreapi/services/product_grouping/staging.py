@@ -0,0 +1,292 @@
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+from django.db import connection, transaction
+from coreapi.models import Product, ProductGroup, Website
+import logging
+
+logger = logging.getLogger("backend.services")
+
+# columns of the staging table filled by COPY, in the csv order
+STAGING_COLUMNS = [
+    "id", "name", "short_description", "url", "image_url", "price", "availability",
+    "category", "website", "canonical_name", "brand", "unchanged",
+]
+
+
+def _csv_field(value) -> str:
+    """One COPY csv field: None is an unquoted empty field (NULL), strings are always
+    quoted so an empty one stays an empty string"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+class _CsvStream:
+    """File-like object COPY reads its csv from, the rows are only produced as it asks for them"""
+
+    def __init__(self, rows: Iterator[list]):
+        self._rows = rows
+        self._chunks: List[str] = []
+        self._size = 0
+
+    def _fill(self) -> bool:
+        row = next(self._rows, None)
+        if row is None:
+            return False
+        chunk = ",".join(_csv_field(value) for value in row) + "\n"
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while (size < 0 or self._size < size) and self._fill():
+            pass
+        data = "".join(self._chunks)
+        rest = ""
+        if 0 <= size < len(data):
+            data, rest = data[:size], data[size:]
+        self._chunks = [rest] if rest else []
+        self._size = len(rest)
+        return data
+
+
+class StagingIngestion:
+    """Ingestion engine for full catalog loads (scrape --file, regroup_products --engine copy).
+
+    The records are normalized in python and streamed with COPY into an unlogged
+    staging table, then applied with a handful of set-based statements, one per
+    phase: upsert websites, upsert groups, upsert products, set availability and
+    recompute the group prices. Nothing goes through the ORM
+    row by row, so 100k+ products load in one go. PostgreSQL only.
+
+    Usage:
+        stats = StagingIngestion(ProductProcessor()).load(iter_records(path))
+        stats["timings"] # seconds per phase
+    """
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.table = f"coreapi_product_staging_{uuid.uuid4().hex[:12]}"
+
+    def load(self, records: Iterable[Dict], skipped: Optional[List[Dict]] = None, scopes: Optional[List[Dict]] = None) -> Dict:
+        """
+        Ingest scraped products (and unchanged page markers) in one run
+
+        Args:
+            records: scraped products, read once as COPY consumes them
+            skipped: categories the run gave up on, see ProductProcessor.finish_run
+            scopes: categories covered by the run, see ProductProcessor.begin_run
+
+        Returns:
+            dict: the stats of ProductProcessor.ingest_and_group, plus "timings"
+
+        Raises:
+            RuntimeError: the database isn't PostgreSQL
+        """
+        if connection.vendor != "postgresql":
+            raise RuntimeError(f"The copy ingestion engine needs PostgreSQL, not {connection.vendor}")
+
+        stats = self.processor.begin_run(scopes)
+        # the groups and websites are resolved in SQL, not in memory
+        stats.pop('identity', None)
+        stats['timings'] = {}
+        try:
+            with self._phase(stats, "copy"):
+                self._create_table()
+                self._copy(records, stats)
+            with transaction.atomic():
+                with self._phase(stats, "websites"):
+                    self._upsert_websites()
+                with self._phase(stats, "groups"):
+                    stats['groups_created'] = self._upsert_groups()
+                with self._phase(stats, "products"):
+                    self._upsert_products(stats)
+                with self._phase(stats, "availability"):
+                    self.processor.mark_unavailable(stats['run'], skipped, self.processor.run_scopes(stats, scopes))
+                with self._phase(stats, "prices"):
+                    self._update_group_prices()
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+        timings = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in stats['timings'].items())
+        logger.info(f"Staged ingestion of {stats['total']} products: {timings}")
+        return stats
+
+    @contextmanager
+    def _phase(self, stats: Dict, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats['timings'][name] = round(time.perf_counter() - started, 3)
+
+    def _create_table(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE UNLOGGED TABLE {self.table} (
+                    seq bigserial,
+                    id varchar(100) NOT NULL,
+                    name varchar(200),
+                    short_description text,
+                    url varchar(200),
+                    image_url varchar(200),
+                    price numeric(10, 2),
+                    availability boolean,
+                    category varchar,
+                    website varchar(50),
+                    canonical_name varchar(100),
+                    brand varchar(100),
+                    unchanged boolean NOT NULL
+                )
+            """)
+
+    def _rows(self, records: Iterable[Dict], stats: Dict) -> Iterator[list]:
+        """csv rows of the records, normalized, the invalid ones are counted as errors"""
+        specs = {} # (category, name) -> canonical specs, listings repeat the same titles
+        for record in records:
+            stats['covered'].add((record.get("website"), record.get("category")))
+            if record.get("page_unchanged"):
+                for product_id in record["ids"]:
+                    yield [product_id] + [None] * (len(STAGING_COLUMNS) - 2) + [True]
+                continue
+
+            stats['total'] += 1
+            missing = self.processor.missing_fields(record)
+            if missing:
+                stats['errors'] += 1
+                logger.error(f"Error processing {record.get('name')}: missing or invalid {', '.join(missing)}")
+                continue
+            key = (record["category"], record["name"])
+            if key not in specs:
+                specs[key] = self.processor.normalize(record)
+            canonical_product = specs[key]
+            yield [
+                record["id"],
+                record["name"],
+                record.get("short_description") or "",
+                record["url"],
+                record.get("image_url") or "",
+                record["price"],
+                bool(record["availability"]),
+                record["category"],
+                record["website"],
+                (canonical_product.model or None) if canonical_product else None,
+                canonical_product.brand if canonical_product else None,
+                False,
+            ]
+
+    def _copy(self, records: Iterable[Dict], stats: Dict) -> None:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {self.table} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                _CsvStream(self._rows(records, stats)),
+            )
+            cursor.execute(f"CREATE INDEX ON {self.table} (id)")
+            cursor.execute(f"ANALYZE {self.table}")
+
+    def _upsert_websites(self) -> None:
+        website = Website._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {website} (name, created_at, updated_at)
+                SELECT DISTINCT website, now(), now() FROM {self.table} WHERE NOT unchanged
+                ON CONFLICT (name) DO UPDATE SET updated_at = EXCLUDED.updated_at
+            """)
+
+    def _upsert_groups(self) -> int:
+        """Create the missing groups, from the cheapest product of each, and give an image to the groups without one"""
+        group = ProductGroup._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {group} (canonical_name, category, brand, starting_price, representative_image_url, created_at, updated_at)
+                SELECT DISTINCT ON (s.canonical_name, s.category)
+                    s.canonical_name, s.category, s.brand, s.price, s.image_url, now(), now()
+                FROM {self.table} s
+                WHERE s.canonical_name IS NOT NULL
+                ORDER BY s.canonical_name, s.category, s.price
+                ON CONFLICT (canonical_name, category) DO NOTHING
+            """)
+            created = cursor.rowcount
+            cursor.execute(f"""
+                UPDATE {group} g SET representative_image_url = s.image_url, updated_at = now()
+                FROM (
+                    SELECT DISTINCT ON (canonical_name, category) canonical_name, category, image_url
+                    FROM {self.table}
+                    WHERE canonical_name IS NOT NULL AND image_url <> ''
+                    ORDER BY canonical_name, category, seq
+                ) s
+                WHERE g.canonical_name = s.canonical_name AND g.category = s.category
+                    AND coalesce(g.representative_image_url, '') = ''
+            """)
+        return created
+
+    def _upsert_products(self, stats: Dict) -> None:
+        product = Product._meta.db_table
+        website = Website._meta.db_table
+        group = ProductGroup._meta.db_table
+        with connection.cursor() as cursor:
+            # products of unchanged pages are still listed in stock, nothing else to rewrite
+            cursor.execute(f"""
+                UPDATE {product} p SET last_seen_run = %s, availability = true
+                FROM {self.table} s WHERE s.unchanged AND p.id = s.id
+            """, [stats['run']])
+            stats['unchanged'] = cursor.rowcount
+
+            cursor.execute(f"""
+                SELECT count(DISTINCT s.id), count(DISTINCT p.id), count(*) FILTER (WHERE s.canonical_name IS NOT NULL)
+                FROM {self.table} s LEFT JOIN {product} p ON p.id = s.id
+                WHERE NOT s.unchanged
+            """)
+            distinct, existing, grouped = cursor.fetchone()
+            # the last record of a product wins, a row can only be upserted once per statement
+            cursor.execute(f"""
+                INSERT INTO {product} (
+                    id, name, short_description, url, image_url, price, availability,
+                    category, website_id, canonical_group_id, last_seen_run, created_at, updated_at
+                )
+                SELECT DISTINCT ON (s.id)
+                    s.id, s.name, s.short_description, s.url, s.image_url, s.price, s.availability,
+                    s.category, w.id, g.id, %s, now(), now()
+                FROM {self.table} s
+                JOIN {website} w ON w.name = s.website
+                LEFT JOIN {group} g ON g.canonical_name = s.canonical_name AND g.category = s.category
+                WHERE NOT s.unchanged
+                ORDER BY s.id, s.seq DESC
+                ON CONFLICT (id) DO UPDATE SET
+                    name = EXCLUDED.name,
+                    short_description = EXCLUDED.short_description,
+                    url = EXCLUDED.url,
+                    image_url = EXCLUDED.image_url,
+                    price = EXCLUDED.price,
+                    availability = EXCLUDED.availability,
+                    category = EXCLUDED.category,
+                    website_id = EXCLUDED.website_id,
+                    canonical_group_id = EXCLUDED.canonical_group_id,
+                    last_seen_run = EXCLUDED.last_seen_run,
+                    updated_at = EXCLUDED.updated_at
+            """, [stats['run']])
+        stats['created'] = distinct - existing
+        # like the row by row ingestion, a product scraped twice counts as updated the second time
+        stats['updated'] = stats['total'] - stats['errors'] - stats['created']
+        stats['grouped'] = grouped
+
+    def _update_group_prices(self) -> None:
+        product = Product._meta.db_table
+        group = ProductGroup._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {group} g SET starting_price = m.price, updated_at = now()
+                FROM (
+                    SELECT canonical_group_id, min(price) AS price FROM {product}
+                    WHERE availability AND canonical_group_id IS NOT NULL
+                    GROUP BY canonical_group_id
+                ) m
+                WHERE g.id = m.canonical_group_id AND g.starting_price <> m.price
+            """)
@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Dict, Optional
+from coreapi.constants import SCRAPING_CIRCUIT_BREAKER
+import logging
+
+logger = logging.getLogger("backend.services")
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker of the host is open, the request isn't even sent"""
+
+
+class RunDeadlineExceeded(Exception):
+    """The scraping run went past its deadline, the remaining pages are skipped"""
+
+
+class HostCircuitBreaker:
+    """Stops sending requests to a host after `failures` consecutive failed requests.
+
+    Connection errors, timeouts and 5xx count as failures, any other answer resets
+    the count (429 is throttling, left to the concurrency controller). Once open, the
+    breaker lets a single trial request through after `reset_after` seconds, a
+    success closes it again and a failure keeps it open for another period.
+    """
+
+    def __init__(self, host: str, settings: Dict):
+        self.host = host
+        self.settings = settings
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def check(self) -> None:
+        """Raise CircuitOpenError unless the host may be requested
+
+        Raises:
+            CircuitOpenError: the breaker is open and no trial request is due
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if not self._trial and time.monotonic() - self.opened_at >= self.settings["reset_after"]:
+                self._trial = True # half open, this request is the trial
+                return
+            raise CircuitOpenError(f"Circuit breaker open for {self.host} after {self.consecutive_failures} consecutive failures")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit breaker closed for {self.host}")
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._trial or (self.opened_at is None and self.consecutive_failures >= self.settings["failures"]):
+                if self.opened_at is None:
+                    self.trips += 1
+                    logger.warning(f"Circuit breaker opened for {self.host} after {self.consecutive_failures} consecutive failures")
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+    def stats(self) -> Dict:
+        return {"open": self.is_open, "trips": self.trips, "consecutive_failures": self.consecutive_failures}
+
+
+class CircuitBreakers:
+    """Per-host circuit breakers of a scraping run.
+
+    Args:
+        overrides (dict): host -> partial SCRAPING_CIRCUIT_BREAKER settings
+    """
+
+    def __init__(self, overrides: Optional[Dict[str, Dict]] = None):
+        self.overrides = overrides or {}
+        self._hosts: Dict[str, HostCircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def host(self, host: str) -> HostCircuitBreaker:
+        with self._lock:
+            if host not in self._hosts:
+                settings = {**SCRAPING_CIRCUIT_BREAKER, **(self.overrides.get(host) or {})}
+                self._hosts[host] = HostCircuitBreaker(host, settings)
+            return self._hosts[host]
+
+    def stats(self) -> Dict[str, Dict]:
+        return {host: breaker.stats() for host, breaker in self._hosts.items()}
+
+
+class RunDeadline:
+    """Wall clock budget of a whole scraping run, None means no deadline"""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self) -> None:
+        """
+        Raises:
+            RunDeadlineExceeded: the run is out of time
+        """
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            raise RunDeadlineExceeded(f"Scraping run deadline of {self.seconds:.0f}s exceeded")
+
+    def timeout(self, request_timeout: float) -> float:
+        """Request timeout cut down to what is left of the run"""
+        remaining = self.remaining()
+        return request_timeout if remaining is None else max(0.1, min(request_timeout, remaining))
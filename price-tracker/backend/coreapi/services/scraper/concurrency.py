@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from coreapi.constants import SCRAPING_CONCURRENCY
+import logging
+
+logger = logging.getLogger("backend.services")
+
+
+class HostConcurrency:
+    """AIMD limit of the in-flight requests to one host.
+
+    Healthy responses (fast and not an error) raise the limit additively, by about
+    `increase` per limit-worth of requests. 429, 5xx and timeouts cut it
+    multiplicatively by `decrease`, at most once per `cooldown` so one burst of
+    failures only counts once. A Retry-After holds every new request of the host
+    until it expires.
+    """
+
+    def __init__(self, host: str, settings: Dict):
+        self.host = host
+        self.settings = settings
+        self.limit = float(settings["initial"])
+        self.in_flight = 0
+        self.peak = self.limit
+        self.requests = 0
+        self.throttled = 0
+        self.resume_at = 0.0
+        self._last_cut = 0.0
+        self._lock = threading.Lock()
+        self._slot_freed: Optional[asyncio.Condition] = None
+
+    @property
+    def _condition(self) -> asyncio.Condition:
+        if self._slot_freed is None:
+            self._slot_freed = asyncio.Condition()
+        return self._slot_freed
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def wait_until_resumed(self) -> None:
+        """Sync callers only honour Retry-After, they never run more than one request"""
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, latency: float, status: Optional[int] = None, timeout: bool = False, retry_after: Optional[float] = None) -> None:
+        """Feed the outcome of one request back into the limit"""
+        with self._lock:
+            now = time.monotonic()
+            self.requests += 1
+            overloaded = timeout or status == 429 or (status is not None and status >= 500)
+
+            if overloaded:
+                self.throttled += 1
+                if retry_after:
+                    self.resume_at = max(self.resume_at, now + retry_after)
+                if now - self._last_cut >= self.settings["cooldown"]:
+                    self._last_cut = now
+                    self.limit = max(self.settings["min"], self.limit * self.settings["decrease"])
+                    logger.warning(f"{self.host} is pushing back ({'timeout' if timeout else status}), concurrency cut to {self.limit:.2f}")
+            elif latency <= self.settings["latency_target"]:
+                self.limit = min(self.settings["max"], self.limit + self.settings["increase"] / self.limit)
+                self.peak = max(self.peak, self.limit)
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency": int(self.limit),
+            "peak_concurrency": int(self.peak),
+            "requests": self.requests,
+            "throttled": self.throttled,
+        }
+
+
+class AdaptiveConcurrency:
+    """Per-host AIMD concurrency controllers of a scraping run.
+
+    Args:
+        overrides (dict): host -> partial SCRAPING_CONCURRENCY settings
+    """
+
+    def __init__(self, overrides: Optional[Dict[str, Dict]] = None):
+        self.overrides = overrides or {}
+        self._hosts: Dict[str, HostConcurrency] = {}
+        self._lock = threading.Lock()
+
+    def host(self, host: str) -> HostConcurrency:
+        with self._lock:
+            if host not in self._hosts:
+                settings = {**SCRAPING_CONCURRENCY, **(self.overrides.get(host) or {})}
+                self._hosts[host] = HostConcurrency(host, settings)
+            return self._hosts[host]
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        """Hold one of the in-flight slots of the host for the duration of a request"""
+        controller = self.host(host)
+        await controller.acquire()
+        try:
+            yield controller
+        finally:
+            await controller.release()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Chosen concurrency and throttling counts of every host seen in the run"""
+        return {host: controller.stats() for host, controller in self._hosts.items()}
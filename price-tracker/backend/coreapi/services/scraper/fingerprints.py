@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger("backend.services")
+
+DEFAULT_FINGERPRINTS = Path(__file__).parent / "json" / "page_fingerprints.json"
+
+# markup that changes on every request without the products changing
+VOLATILE_MARKUP = [
+    re.compile(r"<script\b.*?</script>", re.S | re.I), # tokens, nonces, tracking ids
+    re.compile(r"<!--.*?-->", re.S),
+    re.compile(r"<input\b[^>]*type=[\"']hidden[\"'][^>]*>", re.I), # csrf / form tokens
+    re.compile(r"\s(?:nonce|data-token|data-csrf|csrf[\w-]*)=(?:\"[^\"]*\"|'[^']*')", re.I),
+    re.compile(r"\"(?:static_token|token|csrf_token|nonce)\"\s*:\s*\"[^\"]*\""), # json listings
+    re.compile(r"([?&](?:v|ver|version|_|t|timestamp)=)\d+"), # cache busters
+    re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), # timestamps
+]
+
+
+def fingerprint(content: str) -> str:
+    """Hash of a fetched listing page once its volatile markup is stripped"""
+    for pattern in VOLATILE_MARKUP:
+        content = pattern.sub(lambda match: match.group(1) if pattern.groups else "", content)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def unchanged_page_marker(website: str, category: str, ids: List[str]) -> Dict:
+    """Record sent instead of the products of an unchanged page, see domain.product.unchanged_page"""
+    return {"page_unchanged": True, "website": website, "category": category, "ids": ids}
+
+
+def is_unchanged_page(record: Dict) -> bool:
+    return bool(record.get("page_unchanged"))
+
+
+class PageFingerprints:
+    """Fingerprint of every listing page per (site, category, page), with the product
+    ids and page count read from it.
+
+    A page whose fingerprint matches the last run isn't parsed again, the scraper
+    sends an unchanged page marker with the stored ids instead and the processor
+    only marks them as seen. New fingerprints are held back per (site, category url)
+    until the caller saves them once the products are ingested, so a failed
+    ingestion doesn't leave pages marked as done.
+
+    Args:
+        force (bool): never report a page as unchanged, the pages are parsed and
+            their fingerprints refreshed
+    """
+
+    def __init__(self, path: Optional[Path] = None, force: bool = False):
+        self.path = Path(path or DEFAULT_FINGERPRINTS)
+        self.force = force
+        self._pages: Optional[Dict[str, Dict]] = None
+        # (site, category url) -> page key -> entry, not saved yet
+        self._pending: Dict[Tuple[str, str], Dict[str, Dict]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.unchanged = 0
+
+    def _key(self, website: str, category_url: str, page: int) -> str:
+        return f"{website}|{category_url}|{page}"
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._pages is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._pages = json.load(f)
+            except FileNotFoundError:
+                self._pages = {}
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable page fingerprints {self.path}: {e}")
+                self._pages = {}
+        return self._pages
+
+    def unchanged_page(self, website: str, category_url: str, page: int, page_hash: str) -> Optional[Dict]:
+        """Stored entry ({"hash", "ids", "page_count"}) of the page if its fingerprint didn't change"""
+        if self.force:
+            return None
+        with self._lock:
+            entry = self._load().get(self._key(website, category_url, page))
+            if entry is None or entry["hash"] != page_hash:
+                return None
+            self.unchanged += 1
+            return entry
+
+    def update(self, website: str, category_url: str, page: int, page_hash: str, ids: List[str], page_count: Optional[int]) -> None:
+        with self._lock:
+            self._pending.setdefault((website, category_url), {})[self._key(website, category_url, page)] = {
+                "hash": page_hash, "ids": ids, "page_count": page_count,
+            }
+
+    def discard(self, categories: Iterable[Tuple[str, str]]) -> None:
+        """Drop the unsaved fingerprints of (site, category url) pairs whose products weren't ingested"""
+        with self._lock:
+            for category in categories:
+                self._pending.pop(category, None)
+
+    def save(self, categories: Optional[Iterable[Tuple[str, str]]] = None, failed_ids: Iterable[str] = ()) -> None:
+        """Write the fingerprints, with the new ones of the given (site, category url) pairs or of every category
+
+        Args:
+            categories: only these categories are ingested, the new fingerprints of the others stay pending
+            failed_ids: products the ingestion rejected, the pages listing one of them
+                aren't fingerprinted so the next run parses them again
+        """
+        failed_ids = set(failed_ids)
+        with self._lock:
+            for category in list(self._pending) if categories is None else categories:
+                pages = self._pending.pop(category, None)
+                if pages and failed_ids:
+                    pages = {key: entry for key, entry in pages.items() if failed_ids.isdisjoint(entry["ids"])}
+                if pages:
+                    self._load().update(pages)
+                    self._dirty = True
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._pages, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
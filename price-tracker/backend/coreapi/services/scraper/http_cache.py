@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+from coreapi.constants import SCRAPING_HTTP_CACHE
+import logging
+
+logger = logging.getLogger("backend.services")
+
+DEFAULT_HTTP_CACHE = Path(__file__).parent / "json" / "http_cache"
+
+
+class HttpCache:
+    """On-disk cache of the fetched pages with their ETag / Last-Modified validators.
+
+    Most listing pages don't change between two runs a few hours apart. The
+    validators of a cached page are sent back as If-None-Match / If-Modified-Since
+    and a 304 answer is served from the cached body, so an unchanged page costs
+    a tiny round trip instead of a full download. Pages without validators
+    aren't stored since they can't be revalidated. The cache is bounded in
+    size, the least recently used pages are evicted first.
+
+    Usage:
+        cache = HttpCache()
+        headers = {**headers, **cache.validators(url)}
+        ... a 304 -> cache.get(url), a 200 -> cache.store(url, body, response.headers)
+    """
+
+    def __init__(self, directory: Optional[Path] = None, max_size_mb: Optional[float] = None):
+        self.directory = Path(directory or SCRAPING_HTTP_CACHE["directory"] or DEFAULT_HTTP_CACHE)
+        self.max_bytes = int((max_size_mb or SCRAPING_HTTP_CACHE["max_size_mb"]) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._entries: Optional["OrderedDict[str, int]"] = None # key -> size on disk, least recently used first
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _meta_path(self, key: str) -> Path:
+        return self.directory / f"{key}.meta"
+
+    def _body_path(self, key: str) -> Path:
+        return self.directory / f"{key}.body"
+
+    def _index(self) -> "OrderedDict[str, int]":
+        # built once from the files left by the previous runs, oldest access first
+        if self._entries is None:
+            self._entries = OrderedDict()
+            self._size = 0
+            if self.directory.is_dir():
+                files = []
+                for meta_path in self.directory.glob("*.meta"):
+                    try:
+                        files.append((meta_path.stat().st_mtime, meta_path.stem, meta_path.stat().st_size + self._body_path(meta_path.stem).stat().st_size))
+                    except OSError:
+                        continue
+                for _, key, size in sorted(files):
+                    self._entries[key] = size
+                    self._size += size
+        return self._entries
+
+    def _read_meta(self, url: str) -> Optional[Dict]:
+        # the validators live apart from the body, checking them doesn't read the page
+        key = self._key(url)
+        if key not in self._index():
+            return None
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self._remove(key)
+            return None
+        return meta if meta.get("url") == url else None
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """Conditional request headers for the cached copy of the url, empty when there is none"""
+        with self._lock:
+            entry = self._read_meta(url)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get(self, url: str) -> Optional[str]:
+        """Cached body of the url, after a 304"""
+        with self._lock:
+            key = self._key(url)
+            try:
+                if self._read_meta(url) is None:
+                    raise FileNotFoundError(url)
+                body = self._body_path(key).read_text(encoding="utf-8")
+                os.utime(self._meta_path(key))
+            except OSError:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def store(self, url: str, body: str, response_headers: Mapping[str, str]) -> None:
+        """Keep the body of a 200 along with its validators"""
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        meta = json.dumps({"url": url, "etag": etag, "last_modified": last_modified}).encode("utf-8")
+        data = body.encode("utf-8")
+        size = len(meta) + len(data)
+        if size > self.max_bytes:
+            return
+
+        key = self._key(url)
+        with self._lock:
+            entries = self._index()
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                # body first, the meta file is what makes the entry visible
+                self._write(self._body_path(key), data)
+                self._write(self._meta_path(key), meta)
+            except OSError as e:
+                logger.warning(f"Could not cache {url}: {e}")
+                return
+            self._size += size - entries.pop(key, 0)
+            entries[key] = size
+            self._evict()
+
+    def _write(self, path: Path, data: bytes) -> None:
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        self._size -= self._entries.pop(key, 0)
+        for path in (self._meta_path(key), self._body_path(key)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        """Drop every cached page"""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._entries = None
+            self._size = 0
+        logger.info(f"Cleared the http cache at {self.directory}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._index()
+            return {"hits": self.hits, "misses": self.misses, "pages": len(self._entries), "size": self._size}
@@ -0,0 +1,321 @@
+import asyncio
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from coreapi.models import ScrapeJob
+from coreapi.constants import SCRAPING_URLS, SCRAPING_JOBS, SCRAPING_TIMEOUTS
+from .main import scrape_page_async
+from .parsing import ParsePool
+from .sessions import SessionManager
+from .circuit_breaker import CircuitOpenError, RunDeadline, RunDeadlineExceeded
+from .json_listing import uses_json_listing
+from .output import NDJSONWriter, output_path
+import logging
+
+logger = logging.getLogger("backend.services")
+
+
+def new_run_id() -> str:
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def seed_jobs(run_id: str, deadline: Optional[datetime] = None) -> int:
+    """Queue the first page range of every category of SCRAPING_URLS
+
+    The worker scraping a first range learns the page count of the category and
+    queues the other ranges. A run that already has jobs isn't seeded again, so
+    an interrupted coordinator can be restarted on the same run id, its unfinished
+    jobs get the new deadline.
+
+    Args:
+        run_id (str): id of the run
+        deadline (datetime): end of the run, carried by its jobs to the workers
+
+    Returns:
+        int: number of jobs queued
+    """
+    jobs = ScrapeJob.objects.filter(run_id=run_id)
+    if jobs.exists():
+        jobs.filter(status__in=[ScrapeJob.PENDING, ScrapeJob.RUNNING]).update(deadline=deadline)
+        return 0
+    jobs = [
+        ScrapeJob(
+            run_id=run_id,
+            website=site_info["scraper"],
+            base_url=base_url,
+            category_url=category["url"],
+            category=category["type"],
+            first_page=1,
+            last_page=SCRAPING_JOBS["pages_per_job"],
+            deadline=deadline,
+        )
+        for base_url, site_info in SCRAPING_URLS.items()
+        for category in site_info["categories"]
+    ]
+    ScrapeJob.objects.bulk_create(jobs)
+    return len(jobs)
+
+
+@transaction.atomic
+def claim_job(worker: str) -> Optional[ScrapeJob]:
+    """Take the oldest job nobody works on, None when the queue is empty
+
+    The row is locked with SKIP LOCKED, concurrent workers skip it instead of
+    waiting on it, so they never block each other nor take the same job. Jobs
+    whose worker didn't report back within the lease are handed out again.
+    """
+    expired = timezone.now() - timedelta(seconds=SCRAPING_JOBS["lease"])
+    job = (
+        ScrapeJob.objects.select_for_update(skip_locked=True)
+        .filter(
+            Q(status=ScrapeJob.PENDING)
+            | Q(status=ScrapeJob.RUNNING, claimed_at__lt=expired, attempts__lt=SCRAPING_JOBS["max_attempts"])
+        )
+        .order_by("id")
+        .first()
+    )
+    if job is None:
+        return None
+    job.status = ScrapeJob.RUNNING
+    job.worker = worker
+    job.attempts += 1
+    job.claimed_at = timezone.now()
+    job.save(update_fields=["status", "worker", "attempts", "claimed_at", "updated_at"])
+    return job
+
+
+def _claimed(job: ScrapeJob):
+    # a job handed out again after its lease expired belongs to the new worker
+    return ScrapeJob.objects.filter(id=job.id, worker=job.worker, attempts=job.attempts, status=ScrapeJob.RUNNING)
+
+
+@transaction.atomic
+def complete_job(job: ScrapeJob, records: List[dict], page_count: Optional[int], json_listing: bool, follow_ups: List[Tuple[int, int]]) -> None:
+    """Write the records of a job back and queue the page ranges it found after its own"""
+    updated = _claimed(job).update(
+        status=ScrapeJob.DONE,
+        results=records,
+        page_count=page_count,
+        json_listing=json_listing,
+        error="",
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        logger.warning(f"Job {job.id} was handed to another worker, its results are dropped")
+        return
+    ScrapeJob.objects.bulk_create([
+        ScrapeJob(
+            run_id=job.run_id,
+            website=job.website,
+            base_url=job.base_url,
+            category_url=job.category_url,
+            category=job.category,
+            first_page=first_page,
+            last_page=last_page,
+            json_listing=json_listing,
+            deadline=job.deadline,
+        )
+        for first_page, last_page in follow_ups
+    ])
+
+
+def fail_job(job: ScrapeJob, error: str) -> None:
+    """Put a failed job back in the queue, or give up on it after SCRAPING_JOBS["max_attempts"]"""
+    status = ScrapeJob.FAILED if job.attempts >= SCRAPING_JOBS["max_attempts"] else ScrapeJob.PENDING
+    _claimed(job).update(status=status, error=error, updated_at=timezone.now())
+
+
+async def scrape_job(job: ScrapeJob, sessions: SessionManager, parser: Optional[ParsePool] = None) -> Tuple[List[dict], Optional[int], bool, bool]:
+    """Scrape the listing pages of a job, the same way scrape_category_async does for a whole category
+
+    Raises:
+        Exception: the first range of a category gave no product at all, anything
+            raised by the page scraping
+
+    Returns:
+        tuple: records, page count of the category (None without pagination info),
+        whether the json listing was used and whether an empty page ended the range
+    """
+    category = {"url": job.category_url, "type": job.category}
+    first = None
+    json_listing = job.json_listing
+    if json_listing is None:
+        # only first ranges have to find out, the ones they queue inherit it
+        json_listing = uses_json_listing(job.base_url, job.website)
+        if json_listing:
+            try:
+                first = await scrape_page_async(job.base_url, category, job.website, job.first_page, sessions, parser, True)
+            except (CircuitOpenError, RunDeadlineExceeded):
+                raise
+            except Exception as e:
+                logger.warning(f"No json listing for {job.base_url + job.category_url}, using the html pages: {e}")
+                json_listing = False
+    if first is None:
+        first = await scrape_page_async(job.base_url, category, job.website, job.first_page, sessions, parser, json_listing)
+    first_products, page_count = first
+    if not first_products and job.first_page == 1:
+        raise Exception("No products were scrapped from the whole category")
+
+    records = list(first_products)
+    exhausted = not first_products
+    if first_products and page_count is not None:
+        pages = range(job.first_page + 1, min(job.last_page, page_count) + 1)
+        for page_products, _ in await asyncio.gather(*[
+            scrape_page_async(job.base_url, category, job.website, page, sessions, parser, json_listing) for page in pages
+        ]):
+            records.extend(page_products)
+    elif first_products:
+        for page in range(job.first_page + 1, job.last_page + 1):
+            page_products, _ = await scrape_page_async(job.base_url, category, job.website, page, sessions, parser, json_listing)
+            if not page_products:
+                exhausted = True
+                break
+            records.extend(page_products)
+    return records, page_count, json_listing, exhausted
+
+
+def _time_left(job: ScrapeJob) -> Optional[float]:
+    """Seconds left before the deadline of the job run, None when it has none
+
+    Raises:
+        RunDeadlineExceeded: the run is already past its deadline
+    """
+    if job.deadline is None:
+        return None
+    left = (job.deadline - timezone.now()).total_seconds()
+    if left <= 0:
+        raise RunDeadlineExceeded(f"Scraping run {job.run_id} went past its deadline")
+    return left
+
+
+def _follow_up_ranges(job: ScrapeJob, page_count: Optional[int], exhausted: bool) -> List[Tuple[int, int]]:
+    """Page ranges to queue after a job"""
+    size = SCRAPING_JOBS["pages_per_job"]
+    if page_count is not None:
+        # the first range queues all the others at once
+        if job.first_page != 1:
+            return []
+        start, end = job.last_page + 1, page_count
+    elif not exhausted:
+        # without pagination info the ranges are chained until an empty page
+        start, end = job.last_page + 1, job.last_page + size
+    else:
+        return []
+    return [(first_page, min(first_page + size - 1, end)) for first_page in range(start, end + 1, size)]
+
+
+async def run_worker(name: Optional[str] = None, concurrency: int = 1, burst: bool = False, use_cache: Optional[bool] = None) -> Dict:
+    """Take jobs off the queue and scrape them until stopped
+
+    Any number of workers can run, on one machine or several, they share nothing
+    but the database. Each keeps its own sessions, parse workers and http cache
+    for as long as it runs, the host rate limits of SCRAPING_URLS apply per worker.
+    A job is scraped within what is left of the deadline of its run.
+
+    Args:
+        name (str): worker name stored on the claimed jobs, hostname-pid by default
+        concurrency (int): jobs scraped at the same time by this worker
+        burst (bool): stop once the queue is empty instead of waiting for new jobs
+        use_cache (bool): revalidate pages with the http cache, None follows SCRAPING_HTTP_CACHE
+
+    Returns:
+        dict: number of jobs done and failed by this worker
+    """
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    stats = {"done": 0, "failed": 0}
+    loop = asyncio.get_running_loop()
+    # the ORM is sync only, every query goes through this thread
+    database = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs")
+    try:
+        with ParsePool() as parser:
+            async with SessionManager(use_cache=use_cache) as sessions:
+                async def work():
+                    while True:
+                        job = await loop.run_in_executor(database, claim_job, name)
+                        if job is None:
+                            if burst:
+                                return
+                            await asyncio.sleep(SCRAPING_JOBS["poll_interval"])
+                            continue
+                        logger.info(f"Job {job.id}: {job.website} {job.category_url} pages {job.first_page}-{job.last_page} (attempt {job.attempts})")
+                        try:
+                            # the worker outlives the runs, each job gets the time left to its own
+                            records, page_count, json_listing, exhausted = await scrape_job(job, sessions.for_run(_time_left(job)), parser)
+                        except Exception as e:
+                            logger.error(f"Job {job.id} failed: {e}")
+                            await loop.run_in_executor(database, fail_job, job, str(e))
+                            stats["failed"] += 1
+                            continue
+                        follow_ups = _follow_up_ranges(job, page_count, exhausted)
+                        await loop.run_in_executor(database, complete_job, job, records, page_count, json_listing, follow_ups)
+                        stats["done"] += 1
+
+                logger.info(f"Scrape worker {name} waiting for jobs")
+                await asyncio.gather(*[work() for _ in range(concurrency)])
+    finally:
+        await loop.run_in_executor(database, connections.close_all)
+        database.shutdown(wait=True)
+    return stats
+
+
+def scrape_with_workers(processor, run_id: str, run_stats: Optional[Dict] = None, deadline: Optional[float] = None) -> Dict:
+    """Seed the jobs of a run and ingest their results as the workers complete them
+
+    The coordinator doesn't scrape anything, it waits until no job of the run is
+    pending or running. The results are also appended to the ndjson output
+    (json/distributed_products.ndjson) and cleared from the jobs once ingested.
+    Categories with a failed job keep the availability of their unseen products.
+
+    Args:
+        processor (ProductProcessor): does the ingestion
+        run_id (str): id of the run, an existing one is resumed without seeding
+        run_stats (dict): filled with the job counts and the skipped categories when given
+        deadline (float): seconds the run may last, the jobs still pending past it
+            are given up on, None follows SCRAPING_TIMEOUTS["run"]
+
+    Returns:
+        dict: ingestion stats of the processor
+    """
+    run_deadline = RunDeadline(deadline if deadline is not None else SCRAPING_TIMEOUTS["run"])
+    expires_at = timezone.now() + timedelta(seconds=run_deadline.seconds) if run_deadline.seconds else None
+    seeded = seed_jobs(run_id, expires_at)
+    logger.info(f"Scraping run {run_id}: {seeded} jobs seeded, waiting for the scrape workers")
+    jobs = ScrapeJob.objects.filter(run_id=run_id)
+    stats = processor.begin_run()
+    with NDJSONWriter(output_path("distributed_products")) as writer:
+        while True:
+            # jobs of dead workers that are out of attempts won't be handed out again
+            expired = timezone.now() - timedelta(seconds=SCRAPING_JOBS["lease"])
+            jobs.filter(
+                status=ScrapeJob.RUNNING, claimed_at__lt=expired, attempts__gte=SCRAPING_JOBS["max_attempts"]
+            ).update(status=ScrapeJob.FAILED, error="Worker lease expired")
+            active = jobs.filter(status__in=[ScrapeJob.PENDING, ScrapeJob.RUNNING]).exists()
+
+            for job in jobs.filter(status=ScrapeJob.DONE, ingested=False).order_by("id"):
+                writer.write_page(job.results)
+                processor.ingest_batch(job.results, stats)
+                ScrapeJob.objects.filter(id=job.id).update(ingested=True, results=[])
+            if not active:
+                break
+
+            try:
+                run_deadline.check()
+            except RunDeadlineExceeded as e:
+                jobs.filter(status=ScrapeJob.PENDING).update(status=ScrapeJob.FAILED, error=str(e))
+            time.sleep(SCRAPING_JOBS["poll_interval"])
+
+    skipped = [
+        {"website": job.website, "category": job.category, "url": job.category_url, "reason": f"pages {job.first_page}-{job.last_page}: {job.error}"}
+        for job in jobs.filter(status=ScrapeJob.FAILED).order_by("id")
+    ]
+    processor.finish_run(stats, skipped)
+    if run_stats is not None:
+        run_stats["skipped"] = skipped
+        run_stats["jobs"] = {row["status"]: row["count"] for row in jobs.values("status").annotate(count=Count("id"))}
+    return stats
@@ -0,0 +1,118 @@
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from .output import JSON_DIR, NDJSONWriter, iter_records
+from coreapi.constants import SCRAPING_OUTPUT
+import logging
+
+logger = logging.getLogger("backend.services")
+
+RUNS_DIR = JSON_DIR / "runs"
+
+
+class RunJournal:
+    """Journal of the listing pages a scraping run completed, with the records each one gave.
+
+    Every completed (site, category, page) is appended to json/runs/<run_id>/journal.ndjson
+    as soon as it's scraped. A run resumed from its journal (scrape --resume <run-id>)
+    takes the completed pages from it instead of fetching them again and continues
+    from the first incomplete page, the sync fallback of a failed category does the
+    same instead of starting over from page 1.
+
+    The journal of a run is deleted once its products are ingested (discard), only
+    the SCRAPING_OUTPUT["keep_runs"] latest unfinished runs are kept to be resumed.
+
+    The journal also deduplicates the records handed to the output by product id,
+    a page scraped twice (fallback, retried category) doesn't give its products twice.
+
+    Usage:
+        journal = RunJournal.create() # or RunJournal.open(run_id)
+        entry = journal.page("ultrapc", "/39-cartes-graphiques", "html", 3)
+        journal.complete_page("ultrapc", "/39-cartes-graphiques", "html", 3, products, page_count)
+    """
+
+    def __init__(self, run_id: str, directory: Optional[Path] = None):
+        self.run_id = run_id
+        self.directory = Path(directory or RUNS_DIR) / run_id
+        self.path = self.directory / "journal.ndjson"
+        self._pages: Dict[str, Dict] = {}
+        self._emitted: Set[str] = set()
+        self._lock = threading.Lock()
+        if self.path.exists():
+            for entry in iter_records(self.path):
+                self._pages[entry["key"]] = entry
+        self._writer = NDJSONWriter(self.path, append=True)
+
+    @classmethod
+    def create(cls, directory: Optional[Path] = None) -> "RunJournal":
+        run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        cls.prune(SCRAPING_OUTPUT["keep_runs"], directory)
+        journal = cls(run_id, directory)
+        logger.info(f"Scraping run {run_id}, resume it with scrape --resume {run_id}")
+        return journal
+
+    @classmethod
+    def open(cls, run_id: str, directory: Optional[Path] = None) -> "RunJournal":
+        """Reopen the journal of an earlier run to resume it
+
+        Raises:
+            FileNotFoundError: no journal for this run id
+        """
+        if not (Path(directory or RUNS_DIR) / run_id / "journal.ndjson").exists():
+            raise FileNotFoundError(f"No journal for scraping run {run_id}")
+        journal = cls(run_id, directory)
+        logger.info(f"Resuming scraping run {run_id}, {len(journal._pages)} pages already done")
+        return journal
+
+    @staticmethod
+    def prune(keep: int, directory: Optional[Path] = None) -> None:
+        """Delete the journals of all but the keep latest runs, the run ids sort by date"""
+        runs_dir = Path(directory or RUNS_DIR)
+        if not runs_dir.is_dir():
+            return
+        runs = sorted(path for path in runs_dir.iterdir() if path.is_dir())
+        for path in runs[:max(len(runs) - keep, 0)]:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Deleted the journal of scraping run {path.name}")
+
+    def _key(self, scraper: str, category_url: str, listing_format: str, page: int) -> str:
+        # json and html listings aren't paginated the same way
+        return f"{scraper}|{category_url}|{listing_format}|{page}"
+
+    def page(self, scraper: str, category_url: str, listing_format: str, page: int) -> Optional[Dict]:
+        """Completed page entry ({"records", "page_count"}), None when the page still has to be scraped"""
+        with self._lock:
+            return self._pages.get(self._key(scraper, category_url, listing_format, page))
+
+    def complete_page(self, scraper: str, category_url: str, listing_format: str, page: int, records: List[Dict], page_count: Optional[int]) -> None:
+        entry = {
+            "key": self._key(scraper, category_url, listing_format, page),
+            "records": records,
+            "page_count": page_count,
+        }
+        with self._lock:
+            self._pages[entry["key"]] = entry
+            self._writer.write_page([entry])
+
+    def new_records(self, records: List[Dict]) -> List[Dict]:
+        """Records whose product id wasn't handed out yet during this process, markers always pass"""
+        with self._lock:
+            fresh = []
+            for record in records:
+                product_id = record.get("id")
+                if product_id is not None:
+                    if product_id in self._emitted:
+                        continue
+                    self._emitted.add(product_id)
+                fresh.append(record)
+            return fresh
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def discard(self) -> None:
+        """Delete the journal once the run is ingested, there is nothing left to resume"""
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,121 @@
+import json
+import re
+from html import unescape
+from typing import Dict, List, Optional
+from .sites import get_site
+from .utils import generate_product_id
+from coreapi.constants import SCRAPING_URLS
+import logging
+
+logger = logging.getLogger("backend.services")
+
+# PrestaShop answers its own listing AJAX calls with the product search variables as json
+JSON_LISTING_HEADERS = {
+    "Accept": "application/json, text/javascript, */*; q=0.01",
+    "X-Requested-With": "XMLHttpRequest",
+}
+
+SHOPIFY_PAGE_SIZE = 250 # maximum allowed by products.json
+
+
+def uses_json_listing(url: str, scraper: str) -> bool:
+    """JSON listings are opt-in, used only for the sites set to "listing_mode": "json"
+    in SCRAPING_URLS whose platform serves them, the others keep the html listing"""
+    site_info = SCRAPING_URLS.get(url, {})
+    return get_site(scraper).json_listing is not None and site_info.get("listing_mode", "html") == "json"
+
+
+def json_listing_url(url: str, scraper: str, category_url: str, page: int) -> str:
+    platform = get_site(scraper).json_listing
+    if platform == "shopify":
+        return f"{url}{category_url}/products.json?limit={SHOPIFY_PAGE_SIZE}&page={page}"
+    if platform == "prestashop":
+        return f"{url}{category_url}?page={page}&from-xhr"
+    raise ValueError(f"{scraper} has no json listing")
+
+
+def parse_json_listing(body: str, scraper: str, url: str, category_url: str, category_type: str) -> Dict:
+    """Map a platform listing payload straight to scraped products
+
+    Returns:
+        dict: {"products": [...], "page_count": int or None}, same shape as parse_listing
+
+    Raises:
+        ValueError: the body isn't the expected payload (blocked, html error page...),
+            the caller falls back to the html listing
+    """
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"not a json listing: {e}")
+    if not isinstance(payload, dict) or "products" not in payload:
+        raise ValueError("json listing has no products")
+
+    platform = get_site(scraper).json_listing
+    if platform == "shopify":
+        products = [_shopify_product(item, scraper, url, category_url, category_type) for item in payload["products"]]
+        page_count = None # products.json has no pagination, walk until an empty page
+    else:
+        products = [_prestashop_product(item, scraper, category_type) for item in payload["products"]]
+        page_count = (payload.get("pagination") or {}).get("pages_count")
+
+    return {
+        "products": [product for product in products if product],
+        "page_count": page_count,
+    }
+
+
+def _html_to_text(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    text = unescape(re.sub(r"<[^>]+>", " ", value))
+    text = re.sub(r"\s+", " ", text).lower().strip()
+    return text or None
+
+
+def _prestashop_product(item: Dict, scraper: str, category_type: str) -> Optional[Dict]:
+    availability = (item.get("availability_message") or "").lower()
+    if "en stock" not in availability and not (not availability and item.get("availability") == "available"):
+        return None
+
+    product_url = item.get("url")
+    product_name = (item.get("name") or "").lower().strip()
+    if not product_url or not product_name:
+        return None
+
+    cover = item.get("cover") or {}
+    image = (cover.get("bySize") or {}).get("home_default") or cover.get("large") or {}
+    price = item.get("price_amount")
+    return {
+        "id": generate_product_id(scraper, product_url),
+        "name": product_name,
+        "url": product_url,
+        "short_description": _html_to_text(item.get("description_short")),
+        "image_url": image.get("url"),
+        "price": float(price) if price is not None else None,
+        "availability": True,
+        "category": category_type,
+        "website": scraper
+    }
+
+
+def _shopify_product(item: Dict, scraper: str, url: str, category_url: str, category_type: str) -> Optional[Dict]:
+    variants: List[Dict] = item.get("variants") or []
+    available = [variant for variant in variants if variant.get("available")]
+    if not available or not item.get("handle") or not item.get("title"):
+        return None
+
+    # same link the collection page renders, so the product id doesn't change with the listing mode
+    product_url = f"{url}{category_url}/products/{item['handle']}"
+    images = item.get("images") or []
+    return {
+        "id": generate_product_id(scraper, product_url),
+        "name": item["title"].lower().strip(),
+        "url": product_url,
+        "short_description": None,
+        "image_url": images[0].get("src") if images else None,
+        "price": min(float(variant["price"]) for variant in available),
+        "availability": True,
+        "category": category_type,
+        "website": scraper
+    }
@@ -1,110 +1,238 @@
 import asyncio
-import json
-import random
 import time
-from typing import Dict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 import aiohttp
-from bs4 import BeautifulSoup
-from pathlib import Path
-from .scapers import extract_ultrapc_products, extract_nextlevelpc_products, extract_techspace_products, get_content_from_page
-from .utils import fetch_async, respect_rate_limits, get_page_with_retry
-from coreapi.constants import SCRAPING_URLS, SCRAPING_HEADERS, SCRAPING_WAIT
+from .scapers import get_content_from_page, get_content_from_page_sync, resolve_product_names, resolve_product_names_sync
+from .parsing import ParsePool, parse_listing
+from .json_listing import JSON_LISTING_HEADERS, json_listing_url, parse_json_listing, uses_json_listing
+from .fingerprints import PageFingerprints, fingerprint, unchanged_page_marker
+from .sessions import SessionManager, get_host
+from .circuit_breaker import CircuitOpenError, RunDeadlineExceeded
+from .output import NDJSONWriter, output_path
+from .journal import RunJournal
+from .replay import TrafficRecorder
+from .metrics import MetricsCollector
+from coreapi.constants import SCRAPING_URLS
 import logging
 
 logger = logging.getLogger("backend.services")
 
 
 
-def scrape_websites():
+def scrape_websites(run_stats: Optional[Dict] = None, use_cache: Optional[bool] = None, fingerprints: Optional[PageFingerprints] = None, journal: Optional[RunJournal] = None, deadline: Optional[float] = None, recorder: Optional[TrafficRecorder] = None, metrics: Optional[MetricsCollector] = None):
+    """Scrape all websites one page after the other
+
+    Args:
+        run_stats (dict): filled with the per-host stats of the run when given
+        use_cache (bool): revalidate pages with the http cache, None follows SCRAPING_HTTP_CACHE
+        fingerprints (PageFingerprints): saved by the caller once the products are ingested,
+            when not given the run uses its own and saves it with the json output
+        journal (RunJournal): completed pages of the run, a resumed run skips them
+        deadline (float): seconds the run may last, the pages left are skipped past it,
+            None follows SCRAPING_TIMEOUTS["run"]
+        recorder (TrafficRecorder): saves every fetched page, to replay the run offline
+        metrics (MetricsCollector): collects the performance metrics of the run, the
+            caller writes the report
+    """
     products = []
+    owns_fingerprints = fingerprints is None
+    fingerprints = fingerprints or PageFingerprints()
     # we check all urls in our dict then we call the concerned function
-    for base_url, site_info in SCRAPING_URLS.items():
-        logger.info(f"Scraping {site_info['scraper']}...")
-        category_products = scrape_category(base_url, site_info["categories"], site_info['scraper'])
-        products.extend(category_products)
+    with SessionManager(use_cache=use_cache, fingerprints=fingerprints, journal=journal, deadline=deadline, recorder=recorder, metrics=metrics) as sessions, NDJSONWriter(output_path("products")) as writer:
+        for base_url, site_info in SCRAPING_URLS.items():
+            logger.info(f"Scraping {site_info['scraper']}...")
+            # written page by page, a crash keeps the pages already scraped
+            products.extend(scrape_category(base_url, site_info["categories"], site_info['scraper'], sessions, writer.write_page))
+        _collect_run_stats(sessions, run_stats)
         
     logger.info(f"Scraped {len(products)} total products across {len(SCRAPING_URLS)} sites.")
-    
-    json_dir = Path(__file__).parent / "json"
-    json_dir.mkdir(parents=True, exist_ok=True)
-    output_file = json_dir / "products.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(products, f, ensure_ascii=False, indent=4)
+    if owns_fingerprints:
+        fingerprints.save()
          
     return products
 
-async def scrape_websites_async():
-    """Main async function to scrape all websites."""
-    tasks = []
-    for base_url, site_info in SCRAPING_URLS.items():
-        for category in site_info["categories"]:
-            task = scrape_category_async(base_url, category, site_info["scraper"])
-            tasks.append(task)
+async def scrape_websites_async(run_stats: Optional[Dict] = None, use_cache: Optional[bool] = None, fingerprints: Optional[PageFingerprints] = None, journal: Optional[RunJournal] = None, deadline: Optional[float] = None, recorder: Optional[TrafficRecorder] = None, metrics: Optional[MetricsCollector] = None):
+    """Main async function to scrape all websites.
+
+    Args:
+        run_stats (dict): filled with the per-host stats of the run when given
+        use_cache (bool): revalidate pages with the http cache, None follows SCRAPING_HTTP_CACHE
+        fingerprints (PageFingerprints): saved by the caller once the products are ingested,
+            when not given the run uses its own and saves it with the json output
+        journal (RunJournal): completed pages of the run, a resumed run skips them
+        deadline (float): seconds the run may last, the pages left are skipped past it,
+            None follows SCRAPING_TIMEOUTS["run"]
+        recorder (TrafficRecorder): saves every fetched page, to replay the run offline
+        metrics (MetricsCollector): collects the performance metrics of the run, the
+            caller writes the report
+    """
+    owns_fingerprints = fingerprints is None
+    fingerprints = fingerprints or PageFingerprints()
+    all_products = []
     
-    results = await asyncio.gather(*tasks)
-    all_products = [product for sublist in results for product in sublist]
+    # Save results to file as they come
+    with NDJSONWriter(output_path("async_products")) as writer:
+        async def collect(page_products: List[dict]):
+            writer.write_page(page_products)
+            all_products.extend(page_products)
+        
+        await stream_websites_async(collect, run_stats, use_cache, fingerprints, journal, deadline, recorder, metrics)
     logger.info(f"Scraped {len(all_products)} total products across {len(SCRAPING_URLS)} sites.")
-    # Save results to file
-    json_dir = Path(__file__).parent / "json"
-    json_dir.mkdir(parents=True, exist_ok=True)
-    output_file = json_dir / "async_products.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(all_products, f, ensure_ascii=False, indent=4)
+    if owns_fingerprints:
+        fingerprints.save()
         
     return all_products
+
+async def stream_websites_async(emit: Callable[[List[dict]], Awaitable[None]], run_stats: Optional[Dict] = None, use_cache: Optional[bool] = None, fingerprints: Optional[PageFingerprints] = None, journal: Optional[RunJournal] = None, deadline: Optional[float] = None, recorder: Optional[TrafficRecorder] = None, metrics: Optional[MetricsCollector] = None):
+    """Scrape all websites concurrently and hand the products of every page to emit as
+    soon as it's scraped, nothing is kept in memory
+
+    Args:
+        emit (coroutine function): receives the products of each page, a bounded
+            queue put slows the scraping down to the pace of its consumer
+        run_stats (dict): filled with the per-host stats of the run when given
+        use_cache (bool): revalidate pages with the http cache, None follows SCRAPING_HTTP_CACHE
+        fingerprints (PageFingerprints): spots the unchanged pages, saving it is left to the caller
+        journal (RunJournal): completed pages of the run, a resumed run skips them
+        deadline (float): seconds the run may last, the pages left are skipped past it,
+            None follows SCRAPING_TIMEOUTS["run"]
+        recorder (TrafficRecorder): saves every fetched page, to replay the run offline
+        metrics (MetricsCollector): collects the performance metrics of the run, the
+            caller writes the report
+    """
+    with ParsePool() as parser:
+        async with SessionManager(use_cache=use_cache, fingerprints=fingerprints, journal=journal, deadline=deadline, recorder=recorder, metrics=metrics) as sessions:
+            tasks = []
+            for base_url, site_info in SCRAPING_URLS.items():
+                for category in site_info["categories"]:
+                    task = scrape_category_async(base_url, category, site_info["scraper"], sessions, parser, emit)
+                    tasks.append(task)
+            
+            await asyncio.gather(*tasks)
+            _collect_run_stats(sessions, run_stats)
   
-def scrape_category(url, categories, scraper):
+def _collect_run_stats(sessions: SessionManager, run_stats: Optional[Dict]):
+    """Log the concurrency each host settled on, its latency, the http cache use and the breaker trips, and hand them to the caller"""
+    hosts = sessions.concurrency.stats()
+    for host, host_stats in hosts.items():
+        logger.info(
+            f"{host}: concurrency {host_stats['concurrency']} (peak {host_stats['peak_concurrency']}), "
+            f"{host_stats['requests']} requests, {host_stats['throttled']} throttled"
+        )
+    cache_stats = sessions.http_cache.stats() if sessions.http_cache is not None else None
+    if cache_stats is not None:
+        logger.info(f"http cache: {cache_stats['hits']} pages not modified, {cache_stats['pages']} pages cached")
+    unchanged_pages = sessions.fingerprints.unchanged if sessions.fingerprints is not None else 0
+    if unchanged_pages:
+        logger.info(f"{unchanged_pages} listing pages unchanged since the last run")
+    breakers = sessions.breakers.stats()
+    for host, breaker_stats in breakers.items():
+        if breaker_stats["trips"]:
+            logger.warning(f"{host}: circuit breaker tripped {breaker_stats['trips']} times")
+    report = sessions.metrics.report()
+    for host, host_metrics in report["hosts"].items():
+        latency = host_metrics["latency"]
+        if latency is not None:
+            logger.info(
+                f"{host}: latency p50 {latency['p50']}s p95 {latency['p95']}s, {host_metrics['bytes'] / 2**20:.1f} MiB, "
+                f"{host_metrics['retries']} retries, {host_metrics['rate_limit_wait']:.1f}s rate limited"
+            )
+    if run_stats is not None:
+        run_stats["hosts"] = hosts
+        run_stats["metrics"] = report
+        run_stats["breakers"] = breakers
+        run_stats["skipped"] = sessions.skipped
+        run_stats["http_cache"] = cache_stats
+        run_stats["unchanged_pages"] = unchanged_pages
+
+def scrape_category(url, categories, scraper, sessions: Optional[SessionManager] = None, emit: Optional[Callable[[List[dict]], None]] = None, done_pages: Optional[Dict[Tuple[str, int], Optional[int]]] = None):
     """scrape one ultrapc category 
 
     Args:
         url (string): url of the category to scrape
         category_type (array): array of the categories of the website we are scraping
         scraper (string): name of the scraper -- the website
+        sessions (SessionManager): pooled sessions of the run, reused across pages
+        emit (function): receives the products of every page as soon as it's scraped,
+            they are still returned
+        done_pages (dict): ("json" or "html", page) -> page count of the pages the async
+            path already handed out before falling back here, they are skipped
     """
+    done_pages = done_pages or {}
     all_category_products = []
     for category in categories:
         try:
             page = 1 
+            page_count = None
             category_products = []
             has_products = True
+            json_listing = uses_json_listing(url, scraper)
             
             # visiting each page of the category to scrape it
             while has_products:
-                page_url = f"{url + category['url']}?page={page}"
-                logger.info(f"Scraping: {page_url}")
-                
-                # Respect rate limits
-                respect_rate_limits()
-                
-                # Get page content based on scraper type
-                html_content = None
-                if scraper == "ultrapc":
-                    html_content = get_page_with_retry(page_url, SCRAPING_HEADERS, scraper_type="requests")
-                else:
-                    html_content = get_page_with_retry(page_url, SCRAPING_HEADERS, scraper_type="cloudscraper")
-                
-                if not html_content:
-                    raise Exception(f"Failed to fetch page: {page_url}")
+                listing = "json" if json_listing else "html"
+                if (listing, page) in done_pages:
+                    if page == 1:
+                        page_count = done_pages[(listing, page)]
+                    has_products = page_count is None or page < page_count
+                    page += 1
+                    continue
+                # pages completed before a crash or by the async path come from the journal
+                parsed_page = _journaled_page(sessions, scraper, category, page, json_listing)
+                if parsed_page is None and json_listing:
+                    try:
+                        parsed_page = _scrape_json_page_sync(url, category, scraper, page, sessions)
+                    except (CircuitOpenError, RunDeadlineExceeded):
+                        raise
+                    except Exception as e:
+                        # json and html pages aren't the same size, only switch before the first page
+                        if page > 1:
+                            raise
+                        logger.warning(f"No json listing for {url + category['url']}, using the html pages: {e}")
+                        json_listing = False
 
-                
-                soup = BeautifulSoup(html_content, "html.parser")
-                page_products = []
-
-                # Extract products based on site type
-                if scraper == "ultrapc":
-                    page_products = extract_ultrapc_products(soup, category["type"])
-                elif scraper == "nextlevelpc":
-                    page_products = extract_nextlevelpc_products(soup, category["type"])
-                elif scraper == "techspace":
-                    page_products = extract_techspace_products(url, soup, category["type"])
+                if parsed_page is None:
+                    page_url = f"{url + category['url']}?page={page}"
+                    logger.info(f"Scraping: {page_url}")
+                    
+                    # Get page content with the transport of the site
+                    html_content = get_content_from_page_sync(page_url, scraper, sessions)
+                    
+                    if not html_content:
+                        raise Exception(f"Failed to fetch page: {page_url}")
+
+                    page_hash, parsed_page = _check_fingerprint(sessions, scraper, category, page, html_content)
+                    if parsed_page is None:
+                        # Extract products with the site spec
+                        started = time.perf_counter()
+                        parsed_page = parse_listing(html_content, scraper, url, category["type"])
+                        _observe(sessions, "parse", scraper, started)
+                        parsed_page["hash"] = page_hash
+
+                if parsed_page.get("resolved"):
+                    page_products = parsed_page["products"]
+                else:
+                    started = time.perf_counter()
+                    page_products = resolve_product_names_sync(parsed_page["products"], scraper, sessions)
+                    _observe(sessions, "extract", scraper, started, len(page_products))
+                    _remember_fingerprint(sessions, scraper, category, page, parsed_page["hash"], page_products, parsed_page["page_count"])
+                if not parsed_page.get("journaled"):
+                    _journal_page(sessions, scraper, category, page, json_listing, page_products, parsed_page["page_count"])
+                if page == 1:
+                    page_count = parsed_page["page_count"]
                 
                     
                 if not page_products:
                     has_products = False
                     logger.info(f"No more products found at page {page} for {url + category['url']}")
                 else:
-                    category_products.extend(page_products)
+                    new_products = _new_records(sessions, page_products)
+                    category_products.extend(new_products)
+                    if emit is not None and new_products:
+                        emit(new_products)
                     logger.info(f"Found {len(page_products)} products on page {page}")
+                    # no need to request the empty page after the last one when the pagination told us
+                    has_products = page_count is None or page < page_count
                     page += 1
                     
             all_category_products.extend(category_products)
@@ -112,50 +240,229 @@ def scrape_category(url, categories, scraper):
             
         except Exception as e:
             logger.error(f"Failed to scrape data from {url} category {category['url']}: {e}")  
+            # the pages scraped before the failure are still good
+            all_category_products.extend(category_products)
+            if sessions is not None:
+                sessions.skip(scraper, category, str(e))
             continue
     return all_category_products
+
+def _scrape_json_page_sync(url: str, category: Dict[str, str], scraper: str, page: int, sessions: Optional[SessionManager] = None) -> Dict:
+    """Fetch and map one page of the json listing of a category"""
+    page_url = json_listing_url(url, scraper, category["url"], page)
+    logger.info(f"Scraping: {page_url}")
+    body = get_content_from_page_sync(page_url, scraper, sessions, JSON_LISTING_HEADERS)
+    if not body:
+        raise Exception(f"Failed to fetch page: {page_url}")
+    page_hash, parsed_page = _check_fingerprint(sessions, scraper, category, page, body)
+    if parsed_page is None:
+        started = time.perf_counter()
+        parsed_page = parse_json_listing(body, scraper, url, category["url"], category["type"])
+        _observe(sessions, "parse", scraper, started)
+        parsed_page["hash"] = page_hash
+    return parsed_page
+
+def _observe(sessions: Optional[SessionManager], stage: str, scraper: str, started: float, products: Optional[int] = None):
+    """Record the time of a stage of one page in the metrics of the run, and its product count once extracted"""
+    if sessions is None:
+        return
+    sessions.metrics.stage(stage, scraper, time.perf_counter() - started)
+    if products is not None:
+        sessions.metrics.page(scraper, products)
+
+def _check_fingerprint(sessions: Optional[SessionManager], scraper: str, category: Dict[str, str], page: int, content: str):
+    """Fingerprint a fetched listing page and look it up in the fingerprints of the run
+
+    Returns:
+        tuple: the page hash (None without fingerprints) and, when the page didn't change
+        since the last run, its result holding an unchanged page marker instead of products
+    """
+    if sessions is None or sessions.fingerprints is None:
+        return None, None
+    page_hash = fingerprint(content)
+    entry = sessions.fingerprints.unchanged_page(scraper, category["url"], page, page_hash)
+    if entry is None:
+        return page_hash, None
+    logger.info(f"Page {page} of {category['url']} unchanged, {len(entry['ids'])} products not parsed again")
+    return page_hash, {
+        "products": [unchanged_page_marker(scraper, category["type"], entry["ids"])] if entry["ids"] else [],
+        "page_count": entry["page_count"],
+        "resolved": True,
+    }
+
+def _remember_fingerprint(sessions: Optional[SessionManager], scraper: str, category: Dict[str, str], page: int, page_hash: Optional[str], page_products, page_count: Optional[int]):
+    if page_hash is not None:
+        sessions.fingerprints.update(scraper, category["url"], page, page_hash, [product["id"] for product in page_products], page_count)
+
+def _journaled_page(sessions: Optional[SessionManager], scraper: str, category: Dict[str, str], page: int, json_listing: bool) -> Optional[Dict]:
+    """Result of a page the run journal already completed, None when it has to be scraped"""
+    if sessions is None or sessions.journal is None:
+        return None
+    entry = sessions.journal.page(scraper, category["url"], "json" if json_listing else "html", page)
+    if entry is None:
+        return None
+    logger.info(f"Page {page} of {category['url']} already done in run {sessions.journal.run_id}")
+    return {"products": entry["records"], "page_count": entry["page_count"], "resolved": True, "journaled": True}
+
+def _journal_page(sessions: Optional[SessionManager], scraper: str, category: Dict[str, str], page: int, json_listing: bool, page_products: List[dict], page_count: Optional[int]):
+    if sessions is not None and sessions.journal is not None:
+        sessions.journal.complete_page(scraper, category["url"], "json" if json_listing else "html", page, page_products, page_count)
+
+def _new_records(sessions: Optional[SessionManager], page_products: List[dict]) -> List[dict]:
+    """Drop the products the run already handed out, pages scraped twice don't duplicate them"""
+    if sessions is None or sessions.journal is None:
+        return page_products
+    return sessions.journal.new_records(page_products)
  
-async def scrape_category_async(url: str, category: Dict[str, str], scraper: str):
-    """Scrape a category asynchronously"""
+async def scrape_page_async(url: str, category: Dict[str, str], scraper: str, page: int, sessions: Optional[SessionManager] = None, parser: Optional[ParsePool] = None, json_listing: bool = False):
+    """Scrape one listing page of a category, pages the run journal already completed aren't fetched again
+
+    Args:
+        json_listing (bool): read the page from the json listing of the platform instead of the html
+
+    Returns:
+        tuple: products of the page and the page count read from its pagination (None if absent),
+        a page that didn't change since the last run gives an unchanged page marker instead of products
+    """
+    journaled = _journaled_page(sessions, scraper, category, page, json_listing)
+    if journaled is not None:
+        return journaled["products"], journaled["page_count"]
+
+    page_products, page_count = await _scrape_page_async(url, category, scraper, page, sessions, parser, json_listing)
+    _journal_page(sessions, scraper, category, page, json_listing, page_products, page_count)
+    return page_products, page_count
+
+
+async def _scrape_page_async(url: str, category: Dict[str, str], scraper: str, page: int, sessions: Optional[SessionManager] = None, parser: Optional[ParsePool] = None, json_listing: bool = False):
+    if json_listing:
+        page_url = json_listing_url(url, scraper, category["url"], page)
+        logger.info(f"Async scraping: {page_url}")
+        body = await get_content_from_page(page_url, scraper, sessions, JSON_LISTING_HEADERS)
+        page_hash, unchanged = _check_fingerprint(sessions, scraper, category, page, body)
+        if unchanged is not None:
+            return unchanged["products"], unchanged["page_count"]
+        # no soup to build, mapping the payload is cheap enough for the event loop
+        started = time.perf_counter()
+        parsed_page = parse_json_listing(body, scraper, url, category["url"], category["type"])
+        _observe(sessions, "parse", scraper, started)
+    else:
+        page_url = f"{url + category['url']}?page={page}"
+        logger.info(f"Async scraping: {page_url}")
+
+        # the host rate limiter of the run paces the request
+        html_content = await get_content_from_page(page_url, scraper, sessions)
+        page_hash, unchanged = _check_fingerprint(sessions, scraper, category, page, html_content)
+        if unchanged is not None:
+            return unchanged["products"], unchanged["page_count"]
+        started = time.perf_counter()
+        if parser is not None:
+            parsed_page = await parser.listing(html_content, scraper, url, category["type"])
+        else:
+            parsed_page = parse_listing(html_content, scraper, url, category["type"])
+        _observe(sessions, "parse", scraper, started)
+
+    started = time.perf_counter()
+    page_products = await resolve_product_names(parsed_page["products"], scraper, sessions, parser)
+    _observe(sessions, "extract", scraper, started, len(page_products))
+    _remember_fingerprint(sessions, scraper, category, page, page_hash, page_products, parsed_page["page_count"])
+    return page_products, parsed_page["page_count"]
+
+
+async def scrape_category_async(url: str, category: Dict[str, str], scraper: str, sessions: Optional[SessionManager] = None, parser: Optional[ParsePool] = None, emit: Optional[Callable[[List[dict]], Awaitable[None]]] = None):
+    """Scrape a category asynchronously, reusing the pooled sessions and parse workers of the run
+
+    The first page tells how many pages the category has and the remaining ones are
+    fetched concurrently, still paced by the host rate limiter and concurrency slots.
+    Without pagination info the pages are walked one by one until an empty one.
+    Sites serving a json listing are read from it, the html pages are only used
+    when the first json page can't be had.
+
+    Args:
+        emit (coroutine function): receives the products of every page as soon as it's
+            scraped, nothing is kept and an empty list is returned when given
+    """
+    collected = []
+    found = 0
+    # pages handed out so far, the sync fallback doesn't hand them out again
+    done_pages: Dict[Tuple[str, int], Optional[int]] = {}
+
+    async def take(page: int, page_products: List[dict], page_count: Optional[int]):
+        nonlocal found
+        found += len(page_products)
+        new_products = _new_records(sessions, page_products)
+        if emit is not None:
+            await emit(new_products)
+        else:
+            collected.extend(new_products)
+        if page_products:
+            done_pages[("json" if json_listing else "html", page)] = page_count
+
+    async def take_page(page: int):
+        page_products, _ = await scrape_page_async(url, category, scraper, page, sessions, parser, json_listing)
+        await take(page, page_products, page_count)
+
     try:
-        page = 1
-        category_products = []
-        has_products = True
-        
-        while has_products:
-            page_url = f"{url + category['url']}?page={page}"
-            logger.info(f"Async scraping: {page_url}")
-            
-            # Add delay for rate limiting
-            await asyncio.sleep(random.uniform(SCRAPING_WAIT["min_seconds"], SCRAPING_WAIT["max_seconds"]))
-            soup = await get_content_from_page(page_url, scraper)
-            page_products = []
-            
-            if scraper == "ultrapc":
-                page_products = await extract_ultrapc_products(soup, category["type"])
-            elif scraper == "nextlevelpc":
-                page_products = await extract_nextlevelpc_products(soup, category["type"])
-            elif scraper == "techspace":
-                page_products = await extract_techspace_products(url, soup, category["type"])
-            
-            if not page_products:
-                has_products = False
-            else:
-                category_products.extend(page_products)
+        json_listing = uses_json_listing(url, scraper)
+        if json_listing:
+            try:
+                first_products, page_count = await scrape_page_async(url, category, scraper, 1, sessions, parser, json_listing)
+            except (CircuitOpenError, RunDeadlineExceeded):
+                raise
+            except Exception as e:
+                logger.warning(f"No json listing for {url + category['url']}, using the html pages: {e}")
+                json_listing = False
+        if not json_listing:
+            first_products, page_count = await scrape_page_async(url, category, scraper, 1, sessions, parser)
+        await take(1, first_products, page_count)
+
+        if first_products and page_count is not None:
+            if page_count > 1:
+                logger.info(f"{url + category['url']} has {page_count} pages, fetching them concurrently")
+            tasks = [asyncio.create_task(take_page(page)) for page in range(2, page_count + 1)]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # a failed page leaves its siblings running, they must not emit during the fallback
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        elif first_products:
+            page = 2
+            while True:
+                page_products, _ = await scrape_page_async(url, category, scraper, page, sessions, parser, json_listing)
+                if not page_products:
+                    break
+                await take(page, page_products, None)
                 page += 1
-        
-        if category_products == []:
-            raise Exception(f"No products were scrapped from the whole category")
-        return category_products
+
+        if found == 0:
+            raise Exception("No products were scrapped from the whole category")
+        return collected
+    except (CircuitOpenError, RunDeadlineExceeded) as e:
+        # no sync fallback, it would only hit the same wall
+        if sessions is not None:
+            sessions.skip(scraper, category, str(e))
+        return collected
     except aiohttp.ClientError as e:
         logger.error(f"Network error while scraping {url}: {e}")
-        logger.warning(f"Falling back to sync may cause partial duplication in {category['url']}")
-        return scrape_category(url, [category], scraper)
+        if sessions is not None and sessions.breakers.host(get_host(url)).is_open:
+            sessions.skip(scraper, category, f"circuit breaker open for {get_host(url)}")
+            return collected
+        logger.warning(f"Falling back to sync for {category['url']}")
+        # blocking requests and sleeps, kept off the event loop so the other categories go on
+        fallback_products = await asyncio.to_thread(scrape_category, url, [category], scraper, sessions, None, done_pages)
     except Exception as e:
         logger.error(f"Async scraping failed for {url + category['url']}: {str(e)}")
-        logger.warning(f"Falling back to sync may cause partial duplication in {category['url']}")
-        # Call sync version instead
-        return scrape_category(url, [category], scraper)
+        if sessions is not None and sessions.breakers.host(get_host(url)).is_open:
+            sessions.skip(scraper, category, f"circuit breaker open for {get_host(url)}")
+            return collected
+        logger.warning(f"Falling back to sync for {category['url']}")
+        # Call sync version instead, on a thread like above
+        fallback_products = await asyncio.to_thread(scrape_category, url, [category], scraper, sessions, None, done_pages)
+    if emit is not None:
+        await emit(fallback_products)
+        return []
+    return fallback_products
 
 if __name__ == "__main__":
     import argparse
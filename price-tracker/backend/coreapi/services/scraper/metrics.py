@@ -0,0 +1,196 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+from coreapi.constants import SCRAPING_METRICS
+import logging
+
+logger = logging.getLogger("backend.services")
+
+
+class Histogram:
+    """Cumulative bucket histogram, the Prometheus way: a count per upper bound plus sum and count"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q quantile, None when empty"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self) -> List[tuple]:
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def report(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): total for bound, total in self.cumulative()},
+        }
+
+
+class MetricsCollector:
+    """Performance metrics of a scraping run, fed by the fetch, parse and extract stages.
+
+    Per host: request latency histogram, response bytes, status counts, retries,
+    rate limiter and concurrency slot wait. Per site: parse and product name
+    extraction time per page and products per page. The run also records the
+    time the scraping waited on the ingestion queue and the ingestion time per batch.
+    Thread safe, the sync path and the cloudscraper threads feed it too.
+
+    Usage:
+        metrics = MetricsCollector()
+        async with SessionManager(metrics=metrics) as sessions: ...
+        metrics.write_json(path)
+        metrics.write_prometheus(path)
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._latency: Dict[str, Histogram] = {}
+        self._bytes: Dict[str, int] = defaultdict(int)
+        self._statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._retries: Dict[str, int] = defaultdict(int)
+        self._waits: Dict[tuple, float] = defaultdict(float) # (host, kind) -> seconds
+        self._stages: Dict[tuple, Histogram] = {} # (stage, site) -> seconds per page
+        self._products: Dict[str, Histogram] = {}
+
+    def _histogram(self, histograms: Dict, key, buckets: List[float]) -> Histogram:
+        if key not in histograms:
+            histograms[key] = Histogram(buckets)
+        return histograms[key]
+
+    def request(self, host: str, seconds: float, status, body: Optional[str] = None) -> None:
+        """One request attempt, status is the http status or "timeout" / "error" """
+        size = len(body.encode("utf-8")) if body else 0
+        with self._lock:
+            self._histogram(self._latency, host, SCRAPING_METRICS["latency_buckets"]).observe(seconds)
+            self._statuses[host][str(status)] += 1
+            self._bytes[host] += size
+
+    def retry(self, host: str) -> None:
+        with self._lock:
+            self._retries[host] += 1
+
+    def wait(self, host: str, kind: str, seconds: float) -> None:
+        """Time a request was held before being sent, kind is "rate_limit" or "slot" """
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._waits[(host, kind)] += seconds
+
+    def stage(self, stage: str, site: str, seconds: float) -> None:
+        """Time of a processing stage for one page ("parse", "extract", "queue", "ingest")"""
+        with self._lock:
+            self._histogram(self._stages, (stage, site), SCRAPING_METRICS["stage_buckets"]).observe(seconds)
+
+    def page(self, site: str, products: int) -> None:
+        with self._lock:
+            self._histogram(self._products, site, SCRAPING_METRICS["products_buckets"]).observe(products)
+
+    def report(self) -> Dict:
+        """Machine readable run report"""
+        with self._lock:
+            hosts = sorted(set(self._latency) | set(self._retries) | {host for host, _ in self._waits})
+            stages = defaultdict(dict)
+            for (stage, site), histogram in sorted(self._stages.items()):
+                stages[stage][site] = histogram.report()
+            return {
+                "started": self.started,
+                "duration": round(time.time() - self.started, 3),
+                "hosts": {
+                    host: {
+                        "latency": self._latency[host].report() if host in self._latency else None,
+                        "bytes": self._bytes[host],
+                        "statuses": dict(self._statuses[host]),
+                        "retries": self._retries[host],
+                        "rate_limit_wait": round(self._waits[(host, "rate_limit")], 3),
+                        "slot_wait": round(self._waits[(host, "slot")], 3),
+                    }
+                    for host in hosts
+                },
+                "stages": dict(stages),
+                "products_per_page": {site: histogram.report() for site, histogram in sorted(self._products.items())},
+            }
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def histogram(name: str, help_text: str, series: Dict[str, Histogram]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, values in series.items():
+                for bound, total in values.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {total}')
+                lines.append(f"{name}_sum{{{labels}}} {values.sum}")
+                lines.append(f"{name}_count{{{labels}}} {values.count}")
+
+        def counter(name: str, help_text: str, series: Dict[str, float]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{{{labels}}} {value}")
+
+        with self._lock:
+            histogram("scraper_request_duration_seconds", "Request latency per host",
+                      {f'host="{host}"': values for host, values in self._latency.items()})
+            counter("scraper_response_bytes_total", "Response bytes per host",
+                    {f'host="{host}"': size for host, size in self._bytes.items()})
+            counter("scraper_responses_total", "Responses per host and status",
+                    {f'host="{host}",status="{status}"': count for host, statuses in self._statuses.items() for status, count in statuses.items()})
+            counter("scraper_retries_total", "Retried requests per host",
+                    {f'host="{host}"': count for host, count in self._retries.items()})
+            counter("scraper_wait_seconds_total", "Time requests were held per host, by the rate limiter or for a concurrency slot",
+                    {f'host="{host}",kind="{kind}"': round(seconds, 6) for (host, kind), seconds in self._waits.items()})
+            histogram("scraper_stage_duration_seconds", "Time per page of each processing stage",
+                      {f'stage="{stage}",site="{site}"': values for (stage, site), values in self._stages.items()})
+            histogram("scraper_products_per_page", "Products found per listing page",
+                      {f'site="{site}"': values for site, values in self._products.items()})
+        return "\n".join(lines) + "\n"
+
+    def _write(self, path: Path, content: str) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def write_json(self, path: Path) -> None:
+        self._write(path, json.dumps(self.report(), indent=2))
+        logger.info(f"Scraping metrics written to {path}")
+
+    def write_prometheus(self, path: Path) -> None:
+        """Write the Prometheus text format, e.g. for the textfile collector of node_exporter"""
+        self._write(path, self.prometheus())
+        logger.info(f"Scraping metrics (Prometheus) written to {path}")
@@ -0,0 +1,62 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger("backend.services")
+
+DEFAULT_NAME_CACHE = Path(__file__).parent / "json" / "product_names.json"
+
+
+class ProductNameCache:
+    """Persistent product url -> full name map of the names truncated in the listings.
+
+    A product keeps its url and name, so once a truncated name has been resolved
+    from the product page every later run reads it from here instead of fetching
+    and parsing the page again. Loaded on first use, written back when the run
+    closes its SessionManager.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or DEFAULT_NAME_CACHE)
+        self._names: Optional[Dict[str, str]] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, str]:
+        if self._names is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._names = json.load(f)
+            except FileNotFoundError:
+                self._names = {}
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable product name cache {self.path}: {e}")
+                self._names = {}
+        return self._names
+
+    def get(self, product_url: str) -> Optional[str]:
+        with self._lock:
+            return self._load().get(product_url)
+
+    def set(self, product_url: str, product_name: str) -> None:
+        with self._lock:
+            names = self._load()
+            if names.get(product_url) != product_name:
+                names[product_url] = product_name
+                self._dirty = True
+
+    def save(self) -> None:
+        """Write the cache if new names were resolved, through a temp file so a crash can't truncate it"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._names, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            logger.debug(f"Saved {len(self._names)} product names to {self.path}")
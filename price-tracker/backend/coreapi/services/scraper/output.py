@@ -0,0 +1,133 @@
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from coreapi.constants import SCRAPING_OUTPUT
+import logging
+
+logger = logging.getLogger("backend.services")
+
+JSON_DIR = Path(__file__).parent / "json"
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def output_path(name: str, compress: Optional[bool] = None) -> Path:
+    """Path of a scrape output in the json dir, e.g. json/async_products.ndjson(.gz)"""
+    if compress is None:
+        compress = SCRAPING_OUTPUT["compress"]
+    return JSON_DIR / (f"{name}.ndjson.gz" if compress else f"{name}.ndjson")
+
+
+class NDJSONWriter:
+    """Append-only scrape output, one json record (product or unchanged page marker) per line.
+
+    Pages are written as they are scraped, so a crashed run keeps everything
+    scraped before it and nothing has to be held in memory. Paths ending with
+    .gz are gzip compressed, append keeps the records already in the file.
+
+    Usage:
+        with NDJSONWriter(output_path("async_products")) as writer:
+            writer.write_page(page_products)
+    """
+
+    def __init__(self, path: Path, append: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        mode = "at" if append else "wt"
+        if self.path.suffix == ".gz":
+            self._file = gzip.open(self.path, mode, encoding="utf-8")
+        else:
+            self._file = open(self.path, mode, encoding="utf-8")
+        self.records = 0
+
+    def write_page(self, records: List[Dict]) -> None:
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False))
+            self._file.write("\n")
+        self._file.flush()
+        self.records += len(records)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "NDJSONWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def iter_records(path: Path) -> Iterator[Dict]:
+    """Read a scrape output back record by record, in constant memory
+
+    Accepts the ndjson output, gzip compressed or not, and the legacy pretty-printed
+    json arrays of products.json / async_products.json.
+    """
+    with open(path, "rb") as raw:
+        compressed = raw.read(2) == GZIP_MAGIC
+    opener = gzip.open if compressed else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        first_char = _peek(f)
+        if first_char == "[":
+            yield from _iter_json_array(f)
+            return
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                # the last line of a crashed run can be cut short
+                logger.warning(f"Skipping unreadable line {line_number} of {path}: {e}")
+
+
+def iter_batches(path: Path, batch_size: int) -> Iterator[List[Dict]]:
+    """iter_records in lists of batch_size records"""
+    batch = []
+    for record in iter_records(path):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _peek(f: io.TextIOBase) -> str:
+    """First non blank character of the file, the file is rewound"""
+    position = f.tell()
+    while True:
+        char = f.read(1)
+        if not char or not char.isspace():
+            f.seek(position)
+            return char
+
+
+def _iter_json_array(f: io.TextIOBase, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """Decode the items of a top level json array one after the other, without loading it whole"""
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()[1:] # past the opening bracket
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                if buffer:
+                    raise
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+        if len(buffer) < chunk_size and not eof:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
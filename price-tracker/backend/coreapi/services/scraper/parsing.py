@@ -0,0 +1,69 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+from .scapers import extract_products, extract_page_count, parse_product_page, make_soup
+from .sites import get_site
+from coreapi.constants import SCRAPING_PARSER
+import logging
+
+logger = logging.getLogger("backend.services")
+
+
+def parse_listing(html_content: str, scraper: str, url: str, category_type: str, backend: Optional[str] = None, parse_only: Optional[bool] = None) -> Dict:
+    """Parse one listing page into plain product dicts, runs inside the parse workers
+
+    Returns:
+        dict: {"products": [...], "page_count": int or None}
+    """
+    soup = make_soup(html_content, get_site(scraper).listing_containers, backend, parse_only)
+    return {
+        "products": extract_products(soup, scraper, url, category_type),
+        "page_count": extract_page_count(soup, scraper),
+    }
+
+
+def parse_product_name(html_content: str, website: str) -> Optional[str]:
+    """Read the full name from a product page, runs inside the parse workers"""
+    return parse_product_page(html_content, website)
+
+
+class ParsePool:
+    """Worker processes doing the html parsing of a scraping run.
+
+    Parsing is pure CPU work, running it in the event loop blocks every other
+    in-flight fetch. The pool takes raw html and gives back plain dicts, so
+    fetching and parsing overlap and parsing scales across the cores.
+
+    Usage:
+        with ParsePool() as parser:
+            result = await parser.listing(html, "ultrapc", url, "gpu")
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or SCRAPING_PARSER["workers"] or os.cpu_count() or 1
+        # spawn: the run already has cloudscraper threads, forking them is unsafe
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def listing(self, html_content: str, scraper: str, url: str, category_type: str) -> Dict:
+        return await self._run(parse_listing, html_content, scraper, url, category_type)
+
+    async def product_name(self, html_content: str, website: str) -> Optional[str]:
+        return await self._run(parse_product_name, html_content, website)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from django.db import connections
+from .main import stream_websites_async
+from .fingerprints import PageFingerprints
+from .output import NDJSONWriter, output_path
+from .journal import RunJournal
+from .replay import TrafficRecorder
+from .metrics import MetricsCollector
+from coreapi.constants import SCRAPING_PIPELINE
+import logging
+
+logger = logging.getLogger("backend.services")
+
+
+async def scrape_and_ingest(processor, run_stats: Optional[Dict] = None, use_cache: Optional[bool] = None, fingerprints: Optional[PageFingerprints] = None, journal: Optional[RunJournal] = None, deadline: Optional[float] = None, recorder: Optional[TrafficRecorder] = None, metrics: Optional[MetricsCollector] = None) -> Dict:
+    """Scrape all websites and ingest the products while the scraping goes on
+
+    The scraped pages go through a bounded queue to an ingestion worker writing them
+    to the database in batches, so memory stays bounded, network and database time
+    overlap and a crash late in the run keeps what was ingested before it. The run
+    is only finished (unseen products marked unavailable, group prices updated)
+    when the whole scraping succeeded, the products of the categories skipped on
+    the way (circuit breaker, deadline) keep their availability. Every page is also appended to the ndjson
+    output (json/async_products.ndjson) so the run can be replayed with scrape --file.
+
+    Args:
+        processor (ProductProcessor): does the ingestion, its begin_run / ingest_batch /
+            finish_run run on a single thread since the ORM is sync only
+        run_stats (dict): filled with the per-host stats of the run when given
+        use_cache (bool): revalidate pages with the http cache, None follows SCRAPING_HTTP_CACHE
+        fingerprints (PageFingerprints): spots the unchanged pages, saving it is left to the caller
+        journal (RunJournal): completed pages of the run, a resumed run ingests them again
+            from the journal without fetching them
+        deadline (float): seconds the run may last, None follows SCRAPING_TIMEOUTS["run"]
+        recorder (TrafficRecorder): saves every fetched page, to replay the run offline
+        metrics (MetricsCollector): collects the performance metrics of the run, with the
+            time the scraping waited on the queue and the ingestion time per batch
+
+    Returns:
+        dict: ingestion stats of the processor
+    """
+    if run_stats is None:
+        run_stats = {}
+    if metrics is None:
+        metrics = MetricsCollector()
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SCRAPING_PIPELINE["queue_size"])
+    database = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+    try:
+        stats = await loop.run_in_executor(database, processor.begin_run)
+        worker = asyncio.create_task(_ingest_worker(queue, processor, stats, database, metrics))
+        try:
+            with NDJSONWriter(output_path("async_products")) as writer:
+                async def emit(page_products: List[dict]):
+                    writer.write_page(page_products)
+                    started = time.perf_counter()
+                    await queue.put(page_products)
+                    metrics.stage("queue", "pipeline", time.perf_counter() - started)
+                
+                await stream_websites_async(emit, run_stats, use_cache, fingerprints, journal, deadline, recorder, metrics)
+        finally:
+            await queue.put(None)
+            await worker
+        await loop.run_in_executor(database, processor.finish_run, stats, run_stats.get("skipped"))
+        return stats
+    finally:
+        await loop.run_in_executor(database, connections.close_all)
+        database.shutdown(wait=True)
+
+
+async def _ingest_worker(queue: asyncio.Queue, processor, stats: Dict, database: ThreadPoolExecutor, metrics: MetricsCollector) -> None:
+    """Take the scraped pages off the queue and ingest them in batches until the None sentinel
+
+    A failing batch doesn't stop the worker from draining the queue, otherwise the
+    scraping would wait forever on a full queue, the error is raised at the end.
+    """
+    loop = asyncio.get_running_loop()
+    batch: List[dict] = []
+    error: Optional[Exception] = None
+
+    async def flush():
+        nonlocal batch, error
+        products, batch = batch, []
+        if error is not None or not products:
+            return
+        try:
+            started = time.perf_counter()
+            await loop.run_in_executor(database, processor.ingest_batch, products, stats)
+            metrics.stage("ingest", "pipeline", time.perf_counter() - started)
+            logger.info(f"Ingested {stats['total']} products so far")
+        except Exception as e:
+            logger.error(f"Ingestion failed, the rest of the scraped products are dropped: {e}")
+            error = e
+
+    while True:
+        page_products = await queue.get()
+        if page_products is None:
+            break
+        batch.extend(page_products)
+        if len(batch) >= SCRAPING_PIPELINE["batch_size"]:
+            await flush()
+    await flush()
+
+    if error is not None:
+        raise error
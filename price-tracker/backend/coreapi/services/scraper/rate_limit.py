@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+from coreapi.constants import SCRAPING_RATE_LIMIT
+import logging
+
+logger = logging.getLogger("backend.services")
+
+
+class TokenBucket:
+    """Token bucket shared by sync and async callers.
+
+    Each request takes one token, tokens refill at `rate` per second up to `burst`.
+    A caller that finds the bucket empty reserves the next token and sleeps until
+    it is due, so waiting callers are served in order.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token and return how long the caller has to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """One token bucket per host, so every host keeps its own request budget
+    while different hosts run in parallel.
+
+    Args:
+        limits (dict): host -> {"requests_per_second": float, "burst": int}, hosts
+            missing from it use SCRAPING_RATE_LIMIT
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict]] = None):
+        self.limits = limits or {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self._buckets:
+                limit = {**SCRAPING_RATE_LIMIT, **(self.limits.get(host) or {})}
+                self._buckets[host] = TokenBucket(limit["requests_per_second"], limit["burst"])
+            return self._buckets[host]
+
+    def wait(self, host: str) -> float:
+        """Block until the host budget allows one more request, returns the time waited"""
+        waited = self.bucket(host).acquire()
+        if waited:
+            logger.debug(f"Rate limiter held {host} for {waited:.2f}s")
+        return waited
+
+    async def wait_async(self, host: str) -> float:
+        """Async version of wait, only the calling task is held"""
+        waited = await self.bucket(host).acquire_async()
+        if waited:
+            logger.debug(f"Rate limiter held {host} for {waited:.2f}s")
+        return waited
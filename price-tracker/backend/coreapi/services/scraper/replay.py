@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import random
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from aiohttp import web
+from .output import JSON_DIR, NDJSONWriter, iter_records
+import logging
+
+logger = logging.getLogger("backend.services")
+
+RECORDINGS_DIR = JSON_DIR / "recordings"
+
+
+def traffic_key(url: str) -> str:
+    """host/path?query of an url, what a recorded response is looked up by"""
+    parts = urlsplit(url)
+    return f"{parts.netloc.lower()}{parts.path or '/'}" + (f"?{parts.query}" if parts.query else "")
+
+
+def recording_path(name: str) -> Path:
+    """Directory of a recording, a bare name lives in json/recordings"""
+    path = Path(name)
+    return path if path.is_absolute() or len(path.parts) > 1 else RECORDINGS_DIR / name
+
+
+class TrafficRecorder:
+    """Saves the raw body of every page a run fetched, to replay the run offline.
+
+    The bodies go to <directory>/bodies and index.ndjson maps each url to its body,
+    a page fetched twice is recorded once.
+
+    Usage:
+        recorder = TrafficRecorder(recording_path("gpu-2025-11"))
+        async with SessionManager(recorder=recorder) as sessions: ...
+        recorder.close()
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        (self.directory / "bodies").mkdir(parents=True, exist_ok=True)
+        self._index = NDJSONWriter(self.directory / "index.ndjson")
+        self._keys = set()
+        self._lock = threading.Lock()
+
+    def record(self, url: str, body: str) -> None:
+        key = traffic_key(url)
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+            file_name = f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.body"
+            (self.directory / "bodies" / file_name).write_text(body, encoding="utf-8")
+            self._index.write_page([{"key": key, "url": url, "file": file_name}])
+
+    @property
+    def pages(self) -> int:
+        return len(self._keys)
+
+    def close(self) -> None:
+        self._index.close()
+        logger.info(f"Recorded {self.pages} pages to {self.directory}")
+
+
+class ReplayServer:
+    """Local stand-in for the recorded websites, serves a recording over http.
+
+    Every recorded host is served under its own path prefix, the SessionManager of
+    a replayed run routes http://<host>/<path> to <base_url>/<host>/<path>, so the
+    scraper code runs unchanged. Latency, 429 and 5xx answers can be injected to
+    see how the scraping copes with slow or struggling servers, unrecorded urls
+    get a 404. Runs its own event loop on a thread, sync and async runs can use it.
+
+    Args:
+        latency (float): seconds added to every response
+        jitter (float): random extra latency, up to that many seconds
+        throttle_rate (float): share of the requests answered with 429 and Retry-After: 1
+        error_rate (float): share of the requests answered with 503
+        seed (int): seed of the injected faults, a given seed replays the same faults
+
+    Usage:
+        server = ReplayServer(recording_path("gpu-2025-11"), latency=0.05)
+        base_url = server.start()
+        with SessionManager(replay=base_url) as sessions: ...
+        server.stop()
+    """
+
+    def __init__(self, directory: Path, latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.directory = Path(directory)
+        index_path = self.directory / "index.ndjson"
+        if not index_path.exists():
+            raise FileNotFoundError(f"No recording in {self.directory}")
+        self.pages: Dict[str, str] = {entry["key"]: entry["file"] for entry in iter_records(index_path)}
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.seed = seed
+        self._random = random.Random(seed)
+        self.stats = {}
+        self.reset()
+        self.base_url: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def reset(self) -> None:
+        """Clear the stats and reseed the faults, every run then gets the same ones"""
+        self._random = random.Random(self.seed)
+        self.stats = {"requests": 0, "served": 0, "throttled": 0, "errors": 0, "missing": 0}
+
+    def body(self, key: str) -> Optional[str]:
+        file_name = self.pages.get(key)
+        if file_name is None:
+            return None
+        return (self.directory / "bodies" / file_name).read_text(encoding="utf-8")
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.stats["requests"] += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        draw = self._random.random()
+        if draw < self.throttle_rate:
+            self.stats["throttled"] += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        if draw < self.throttle_rate + self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=503)
+
+        key = request.raw_path.lstrip("/")
+        body = self.body(key)
+        if body is None:
+            self.stats["missing"] += 1
+            return web.Response(status=404)
+        self.stats["served"] += 1
+        content_type = "application/json" if body.lstrip()[:1] in ("{", "[") else "text/html"
+        return web.Response(text=body, content_type=content_type)
+
+    async def _start(self) -> str:
+        app = web.Application()
+        app.router.add_route("GET", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """Start serving on a free local port
+
+        Returns:
+            str: base url to give to SessionManager(replay=...)
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="replay", daemon=True)
+        self._thread.start()
+        self.base_url = asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        logger.info(f"Replaying {len(self.pages)} recorded pages on {self.base_url}")
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
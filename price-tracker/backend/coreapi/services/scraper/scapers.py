@@ -1,206 +1,230 @@
-from bs4 import BeautifulSoup
-from .utils import fetch_async, normalize_spaces,extract_price, generate_product_id
-from coreapi.constants import SCRAPING_HEADERS
+import asyncio
+import re
+from functools import lru_cache, partial
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+from typing import List, Optional
+from .utils import fetch_async, get_page_with_retry, generate_product_id
+from .sessions import SessionManager
+from .sites import get_site
+from coreapi.constants import SCRAPING_HEADERS, SCRAPING_PARSER
 import logging
 
 logger = logging.getLogger("backend.services")
 
 
+@lru_cache(maxsize=None)
+def get_parser_backend() -> str:
+    """First installed backend of SCRAPING_PARSER["backends"], html.parser always works"""
+    for backend in SCRAPING_PARSER["backends"]:
+        if builder_registry.lookup(backend) is not None:
+            return backend
+    return "html.parser"
 
-async def get_content_from_page(page_url: str, scraper: str) -> BeautifulSoup:
-    if scraper == "nextlevelpc":
-        html_content = await fetch_async(page_url, SCRAPING_HEADERS, "cloudscraper")
-    else:
-        html_content = await fetch_async(page_url, SCRAPING_HEADERS)
+
+def _has_class(classes: List[str], value: Optional[str]) -> bool:
+    # the strainer sees the raw attribute, "a b" for multi-valued classes
+    if value is None:
+        return False
+    values = value.split() if isinstance(value, str) else value
+    return any(class_name in values for class_name in classes)
+
+
+def make_soup(html_content: str, containers: Optional[List[str]] = None, backend: Optional[str] = None, parse_only: Optional[bool] = None) -> BeautifulSoup:
+    """Build the soup of a page with the configured backend
+
+    Args:
+        containers (list): classes of the subtrees to keep, only they are built when parse_only is on
+        backend (string): overrides the configured backend
+        parse_only (bool): overrides SCRAPING_PARSER["parse_only"]
+    """
+    if parse_only is None:
+        parse_only = SCRAPING_PARSER["parse_only"]
+    strainer = None
+    if parse_only and containers:
+        strainer = SoupStrainer(attrs={"class": partial(_has_class, containers)})
+    return BeautifulSoup(html_content, backend or get_parser_backend(), parse_only=strainer)
+
+
+
+async def get_content_from_page(page_url: str, scraper: str, sessions: Optional[SessionManager] = None, headers: Optional[dict] = None) -> str:
+    """Fetch the raw html of a page with the transport of the site, parsing is left to the parse stage
+
+    Args:
+        headers (dict): added to SCRAPING_HEADERS, e.g. to ask for a json listing
+    """
+    transport = "cloudscraper" if get_site(scraper).transport == "cloudscraper" else "aiohttp"
+    html_content = await fetch_async(page_url, {**SCRAPING_HEADERS, **(headers or {})}, transport, sessions=sessions)
     
     if not html_content:
         raise Exception(f"Failed to get content for {page_url} (Async)")
     
-    soup = BeautifulSoup(html_content, "html.parser")
-    return soup
-
-
-async def get_product_name(product_url: str, website: str) -> str:
-    soup = await get_content_from_page(page_url=product_url, scraper=website)
-    if website == "ultrapc":
-        product_name_tag = soup.select_one("div.product-block-info h1.product-title")
-        return product_name_tag.text.lower().strip() if product_name_tag else None
-    elif website == "techspace":
-        product_name_tag = soup.select_one("div.product-meta h1.product-meta__title")
-        return product_name_tag.text.lower().strip() if product_name_tag else None
-    else:
-        return None
+    return html_content
 
-    
-# Ultra PC               
-async def extract_ultrapc_products(soup: BeautifulSoup, category_type: str):
-    """Extract from one page all the products then send them in a list
 
-    Args:
-        soup (array): bs4 soup
-        category_type (string): name of the category in english
+def get_content_from_page_sync(page_url: str, scraper: str, sessions: Optional[SessionManager] = None, headers: Optional[dict] = None) -> Optional[str]:
+    """Sync version of get_content_from_page, None when the page couldn't be fetched"""
+    transport = "cloudscraper" if get_site(scraper).transport == "cloudscraper" else "requests"
+    return get_page_with_retry(page_url, {**SCRAPING_HEADERS, **(headers or {})}, scraper_type=transport, sessions=sessions)
+
+
+def extract_page_count(soup: BeautifulSoup, scraper: str) -> Optional[int]:
+    """Read the number of pages of a category from the pagination of its first page
+
+    Returns:
+        int: last page number, 1 when the pagination has no page links, None when
+        the page has no pagination at all
     """
-    page_products = []
-    items = soup.select("div.product-block")
-    for item in items:
-        try:
-            name_and_url_tag = item.select_one(".product-title a") # href is the url and the text is the text
-            if not name_and_url_tag:
-                continue
-            short_description_tag = item.select_one("div.product-description-short") # text of the tag
-            image_tag = item.select_one("a.product-thumbnail.img-thumbnail img") # src of the image tag
-            price_tag = item.select_one("span.price") # content element of this tag is the price
-            availability_tag = item.select_one("div.product-availability") # text 
-            
-            if "en stock" not in  availability_tag.text.strip().lower():
-                continue
-            
-            product_url = name_and_url_tag["href"] if name_and_url_tag else None
-            product_name = name_and_url_tag.text.lower().strip() if name_and_url_tag else None
-            
-            if "..." in product_name and product_url:
-                product_name = await get_product_name(product_url, "ultrapc")
-            
-            if not product_name:
-                logger.error(f"Product name not found for product {product_url}")
-                raise Exception("Product name not found")
-                
-            product = {
-                "id": generate_product_id("ultrapc", product_url),
-                "name": product_name,
-                "url": product_url,
-                "short_description": short_description_tag.text.lower().strip() if short_description_tag else None,
-                "image_url": image_tag["src"] if image_tag else None,
-                "price": float(price_tag["content"].strip()) if price_tag else None,
-                "availability": True,
-                "category": category_type,
-                "website": "ultrapc"
-            }        
-            page_products.append(product)
-        except Exception as e:
-            logger.error(f"Error processing ultrapc product: {e}")
-            continue
-        
-    return page_products
+    pagination = get_site(scraper).compiled_pagination.select_one(soup)
+    if not pagination:
+        return None
+
+    pages = [1]
+    for link in pagination.select("a, span"):
+        page_match = re.search(r"[?&]page=(\d+)", link.get("href", ""))
+        if page_match:
+            pages.append(int(page_match.group(1)))
+        text = link.get_text(strip=True)
+        if text.isdigit():
+            pages.append(int(text))
+    return max(pages)
+
+
+def extract_product_name(soup: BeautifulSoup, website: str) -> Optional[str]:
+    """Read the full product name from a product page"""
+    site = get_site(website)
+    if site.compiled_product_name is None:
+        return None
+    product_name_tag = site.compiled_product_name.select_one(soup)
+    return product_name_tag.text.lower().strip() if product_name_tag else None
+
+
+def parse_product_page(html_content: str, website: str) -> Optional[str]:
+    """Build the product page soup and read the full product name from it"""
+    return extract_product_name(make_soup(html_content, get_site(website).product_page_containers), website)
+
+
+def has_truncated_name(product: dict) -> bool:
+    return "..." in product["name"] and get_site(product["website"]).product_name is not None
 
 
-# Next Level pc
-async def extract_nextlevelpc_products(soup, category_type):
-    """Extract from one page all the products then send them in a list
+async def get_product_name(product_url: str, website: str, sessions: Optional[SessionManager] = None, parser=None) -> Optional[str]:
+    """Fetch a product page and read its full name
 
     Args:
-        soup (array): bs4 soup
-        category_type (string): name of the category in english
+        parser (ParsePool): parses the page off the event loop when given
     """
-    page_products = []
-    
-    items = soup.select("div.products article.item")
-    for item in items:
-        try:
-            name_tag = item.select_one("div.product-title h3") # the text is the text
+    try:
+        html_content = await get_content_from_page(page_url=product_url, scraper=website, sessions=sessions)
+    except Exception as e:
+        logger.error(f"Could not fetch product page {product_url}: {e}")
+        return None
+    if parser is not None:
+        return await parser.product_name(html_content, website)
+    return parse_product_page(html_content, website)
 
-            url_tag = item.select_one("div.product-title a") #  href is the url
-            if not name_tag or not url_tag:
-                logger.warning("couldnt find name_tag or url_tag")
-                continue
-            image_tag = item.select_one("a.product-thumbnail img.tvproduct-defult-img") # src of the image tag
-            price_tag = item.select_one("span.price") # text of the tag
-            availability_tag = item.select_one("div.custom-product-badge span.badge-name-text") # text 
-            if "en stock" not in availability_tag.text.strip().lower():
+
+async def resolve_product_names(products: List[dict], website: str, sessions: Optional[SessionManager] = None, parser=None) -> List[dict]:
+    """Replace the names truncated with "..." by the full name from the product page,
+    products whose full name can't be found are dropped
+
+    Names already in the name cache of the run aren't fetched again, the other
+    product pages of the listing page are fetched concurrently, paced by the
+    host rate limiter and concurrency slots of the sessions.
+    """
+    names = _cached_names(products, sessions)
+    missing = list(dict.fromkeys(
+        product["url"] for product in products
+        if has_truncated_name(product) and product["url"] not in names
+    ))
+    if missing:
+        fetched = await asyncio.gather(*[get_product_name(product_url, website, sessions, parser) for product_url in missing])
+        names.update(_remember_names(zip(missing, fetched), sessions))
+    return _apply_names(products, names)
+
+
+def resolve_product_names_sync(products: List[dict], website: str, sessions: Optional[SessionManager] = None) -> List[dict]:
+    """Sync version of resolve_product_names"""
+    names = _cached_names(products, sessions)
+    for product in products:
+        if has_truncated_name(product) and product["url"] not in names:
+            html_content = get_content_from_page_sync(product["url"], website, sessions)
+            product_name = parse_product_page(html_content, website) if html_content else None
+            names.update(_remember_names([(product["url"], product_name)], sessions))
+    return _apply_names(products, names)
+
+
+def _cached_names(products: List[dict], sessions: Optional[SessionManager]) -> dict:
+    if sessions is None:
+        return {}
+    names = {}
+    for product in products:
+        if has_truncated_name(product):
+            product_name = sessions.names.get(product["url"])
+            if product_name:
+                names[product["url"]] = product_name
+    return names
+
+
+def _remember_names(resolved, sessions: Optional[SessionManager]) -> dict:
+    names = {}
+    for product_url, product_name in resolved:
+        if product_name:
+            names[product_url] = product_name
+            if sessions is not None:
+                sessions.names.set(product_url, product_name)
+    return names
+
+
+def _apply_names(products: List[dict], names: dict) -> List[dict]:
+    resolved = []
+    for product in products:
+        if has_truncated_name(product):
+            if product["url"] not in names:
+                logger.error(f"Product name not found for product {product['url']}")
                 continue
-            
-            features = item.select("div.product-features li")
-            short_description = " | ".join([f.get_text(strip=True) for f in features])
-            
-            cleaned_price = None
-            if price_tag:
-                cleaned_price = extract_price(price_tag.text.lower().strip())
-                
-            product_name = name_tag.text.lower().strip()
-            product_url = url_tag["href"]
-            
-            product = {
-                "id": generate_product_id("nextlevelpc", product_url),
-                "name": product_name,
-                "url": product_url,
-                "short_description": normalize_spaces(short_description.lower().strip()) if short_description else None,
-                "image_url": image_tag.get("data-cfsrc") or image_tag.get("src") if image_tag else None,
-                "price": cleaned_price,
-                "availability": True,
-                "category": category_type,
-                "website": "nextlevelpc"
-            }        
-            page_products.append(product)
-        except Exception as e:
-            logger.error(f"Error processing nextlevelpc product: {e}")
-            continue
-        
-    return page_products
+            product["name"] = names[product["url"]]
+        resolved.append(product)
+    return resolved
 
 
-# Techspace
-async def extract_techspace_products(url, soup, category_type):
-    """Extract from one page all the products then send them in a list
 
-    Args:
-        soup (string): this is the return of the BeautifySoup call
+def extract_products(soup: BeautifulSoup, scraper: str, url: str, category_type: str) -> List[dict]:
+    """Extract from one page all the products of a site then send them in a list,
+    names truncated with "..." are left to resolve_product_names
 
-    Returns:
+    Args:
+        soup (BeautifulSoup): listing page
+        scraper (string): name of the site spec
         url (string): the base url of the website we are scraping
-        soup (array): array of the products with details
         category_type (string): name of the category in english
     """
+    site = get_site(scraper)
     page_products = []
-    items = soup.select("div.product-list div.product-item")
-    for item in items:
+    for item in site.compiled_items.select(soup):
         try:
-            name_and_url_tag = item.select_one("div.product-item__title-info a.product-item__title") # href is the url and the text is the text
-            if not name_and_url_tag:
+            values = {name: product_field.extract(item) for name, product_field in site.fields.items()}
+            if not values["name"] or not values["url"]:
+                logger.warning(f"Couldn't find the name or url of a {site.name} product")
                 continue
-            image_tag = item.select_one("a.product-item__image-wrapper img.product-item__primary-image") # src of the image tag
-            price_tag = item.select_one("span.price") # content element of this tag is the price
-            availability_tag = item.select_one("span.product-item__inventory") # text 
-            
-            if "en stock" not in availability_tag.text.strip().lower():
+            if "en stock" not in (values["availability"] or ""):
                 continue
-            
-            image_url = None
-            if image_tag:
-                srcset = image_tag.get("data-srcset") or image_tag.get("srcset") or image_tag.get("data-src")
-                if srcset:
-                    # splitting into image URLs and pick the highest resolution
-                    images = [s.strip() for s in srcset.split(",")]
-                    last_image = images[-1].split(" ")[0]
-                    image_url = "https:" + last_image.replace("{width}", "800")
-            
-            cleaned_price = None
-            if price_tag:
-                cleaned_price = extract_price(price_tag.text.lower().strip()) 
-            
-            product_name = name_and_url_tag.text.lower().strip()
-            product_url = url + name_and_url_tag["href"]
-            
-            if "..." in product_name and product_url:
-                product_name = await get_product_name(product_url, "techspace")
-            
-            if not product_name:
-                logger.error(f"Product name not found for product {product_url}")
-                raise Exception("Product name not found")
-            
+
+            product_url = url + values["url"] if site.relative_urls else values["url"]
             product = {
-                "id": generate_product_id("techspace", product_url),
-                "name": product_name,
+                "id": generate_product_id(site.name, product_url),
+                "name": values["name"],
                 "url": product_url,
-                "short_description": None,
-                "image_url": image_url,
-                "price": cleaned_price,
+                "short_description": values.get("short_description"),
+                "image_url": values.get("image_url"),
+                "price": values.get("price"),
                 "availability": True,
                 "category": category_type,
-                "website": "techspace"
-            }        
+                "website": site.name
+            }
             page_products.append(product)
         except Exception as e:
-            logger.error(f"Error processing TechSpace product: {e}")
+            logger.error(f"Error processing {site.name} product: {e}")
             continue
-        
+
     return page_products
@@ -0,0 +1,183 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+from django.db import connections
+from django.utils import timezone
+from coreapi.models import ScrapeSchedule
+from coreapi.constants import SCRAPING_URLS, SCRAPING_SCHEDULE, SCRAPING_PIPELINE
+from .main import scrape_category_async
+from .parsing import ParsePool
+from .sessions import SessionManager
+from .fingerprints import PageFingerprints, is_unchanged_page
+import logging
+
+logger = logging.getLogger("backend.services")
+
+
+def next_interval(interval: float, change_rate: float) -> int:
+    """Interval after a run, shorter for the categories whose pages keep changing and longer for the stable ones"""
+    if change_rate > SCRAPING_SCHEDULE["volatile"]:
+        interval *= SCRAPING_SCHEDULE["shrink"]
+    elif change_rate < SCRAPING_SCHEDULE["stable"]:
+        interval *= SCRAPING_SCHEDULE["grow"]
+    return int(min(max(interval, SCRAPING_SCHEDULE["min_interval"]), SCRAPING_SCHEDULE["max_interval"]))
+
+
+def _sites() -> Dict[str, Tuple[str, Dict]]:
+    """scraper name -> (base url, site info) of SCRAPING_URLS"""
+    return {site_info["scraper"]: (base_url, site_info) for base_url, site_info in SCRAPING_URLS.items()}
+
+
+def sync_schedules() -> int:
+    """Create the missing schedule of every (site, category) of SCRAPING_URLS, due right away
+
+    Returns:
+        int: number of schedules created
+    """
+    created = 0
+    for scraper, (_, site_info) in _sites().items():
+        for category_type in sorted({category["type"] for category in site_info["categories"]}):
+            _, is_new = ScrapeSchedule.objects.get_or_create(
+                website=scraper,
+                category=category_type,
+                defaults={"interval": SCRAPING_SCHEDULE["initial_interval"], "next_due": timezone.now()},
+            )
+            created += is_new
+    return created
+
+
+class ScrapeScheduler:
+    """Long running scraper keeping a next due time per (site, category).
+
+    Each due category is scraped and ingested on its own, only the availability
+    of its products is updated. The share of its listing pages that changed since
+    the previous run (see PageFingerprints) is averaged over the recent runs and
+    sets the next interval, volatile categories are scraped more often and stable
+    ones less, within SCRAPING_SCHEDULE["min_interval"] and ["max_interval"].
+
+    The runs share the sessions, rate limiters and circuit breakers of the
+    scheduler, at most max_concurrent of them at a time. Each run has its own
+    deadline (SCRAPING_TIMEOUTS["run"]) and list of skipped categories.
+
+    Usage:
+        await ScrapeScheduler(ProductProcessor()).run()
+    """
+
+    def __init__(self, processor, max_concurrent: Optional[int] = None, use_cache: Optional[bool] = None, fingerprints: Optional[PageFingerprints] = None):
+        self.processor = processor
+        self.max_concurrent = max_concurrent or SCRAPING_SCHEDULE["max_concurrent"]
+        self.use_cache = use_cache
+        self.fingerprints = fingerprints or PageFingerprints()
+        self._running: Dict[int, asyncio.Task] = {}
+        self._sessions: Optional[SessionManager] = None
+        self._parser: Optional[ParsePool] = None
+        # the ORM is sync only, every query goes through this thread
+        self._database = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+    async def _db(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._database, func, *args)
+
+    async def run(self, once: bool = False) -> None:
+        """Scrape the categories as they come due, until cancelled
+
+        Args:
+            once (bool): stop once the categories due now are done
+        """
+        try:
+            with ParsePool() as parser:
+                async with SessionManager(use_cache=self.use_cache, fingerprints=self.fingerprints) as sessions:
+                    self._sessions, self._parser = sessions, parser
+                    created = await self._db(sync_schedules)
+                    if created:
+                        logger.info(f"{created} new categories scheduled")
+                    while True:
+                        free = self.max_concurrent - len(self._running)
+                        if free > 0:
+                            for schedule in await self._db(self._due, free, list(self._running)):
+                                self._running[schedule.id] = asyncio.create_task(self._run_category(schedule))
+                        if once and not self._running:
+                            break
+                        if self._running:
+                            await asyncio.wait(list(self._running.values()), timeout=SCRAPING_SCHEDULE["poll_interval"], return_when=asyncio.FIRST_COMPLETED)
+                        else:
+                            await asyncio.sleep(SCRAPING_SCHEDULE["poll_interval"])
+        finally:
+            for task in self._running.values():
+                task.cancel()
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+            await self._db(connections.close_all)
+            self._database.shutdown(wait=True)
+
+    def _due(self, limit: int, running: List[int]) -> List[ScrapeSchedule]:
+        return list(
+            ScrapeSchedule.objects.filter(next_due__lte=timezone.now(), website__in=list(_sites()))
+            .exclude(id__in=running)
+            .order_by("next_due")[:limit]
+        )
+
+    async def _run_category(self, schedule: ScrapeSchedule) -> None:
+        """Scrape and ingest one (site, category), then schedule its next run"""
+        base_url, site_info = _sites()[schedule.website]
+        scope = {"website": schedule.website, "category": schedule.category}
+        categories = [(schedule.website, category["url"]) for category in site_info["categories"] if category["type"] == schedule.category]
+        batch: List[dict] = []
+        pages = unchanged = 0
+        # the daemon outlives any deadline, each run gets its own along with its skipped categories
+        sessions = self._sessions.for_run()
+        logger.info(f"Scheduled run of {schedule.website} {schedule.category}")
+        try:
+            stats = await self._db(self.processor.begin_run, [scope])
+
+            async def emit(page_products: List[dict]):
+                nonlocal batch, pages, unchanged
+                if not page_products:
+                    return
+                pages += 1
+                unchanged += all(is_unchanged_page(record) for record in page_products)
+                batch.extend(page_products)
+                if len(batch) >= SCRAPING_PIPELINE["batch_size"]:
+                    products, batch = batch, []
+                    await self._db(self.processor.ingest_batch, products, stats)
+
+            for category in site_info["categories"]:
+                if category["type"] == schedule.category:
+                    await scrape_category_async(base_url, category, schedule.website, sessions, self._parser, emit)
+            if batch:
+                await self._db(self.processor.ingest_batch, batch, stats)
+            skipped = sessions.skipped
+            await self._db(self.processor.finish_run, stats, skipped, [scope])
+            # only now are the products of the fingerprinted pages in the database,
+            # the pages of the other categories in flight stay pending
+            await self._db(self.fingerprints.save, categories, stats["failed_ids"])
+            change_rate = (pages - unchanged) / pages if pages else None
+            error = "; ".join(entry["reason"] for entry in skipped)
+            await self._db(self._reschedule, schedule, change_rate, error)
+        except Exception as e:
+            logger.error(f"Scheduled run of {schedule.website} {schedule.category} failed: {e}")
+            self.fingerprints.discard(categories)
+            await self._db(self._reschedule, schedule, None, str(e))
+        finally:
+            self._running.pop(schedule.id, None)
+            # the daemon may run for days, don't wait for it to exit to keep the resolved names
+            await self._db(self._sessions.names.save)
+
+    def _reschedule(self, schedule: ScrapeSchedule, change_rate: Optional[float], error: str = "") -> None:
+        """Fold the change rate of the run into the schedule and set its next run, failed runs are retried after the minimum interval"""
+        now = timezone.now()
+        # every page is new to the fingerprints of a first run, it says nothing about the prices
+        if change_rate is not None and schedule.runs:
+            smoothing = SCRAPING_SCHEDULE["smoothing"]
+            if schedule.change_rate is not None:
+                change_rate = smoothing * change_rate + (1 - smoothing) * schedule.change_rate
+            schedule.change_rate = change_rate
+            schedule.interval = next_interval(schedule.interval, change_rate)
+        delay = SCRAPING_SCHEDULE["min_interval"] if error else schedule.interval
+        schedule.next_due = now + timedelta(seconds=delay)
+        schedule.last_run_at = now
+        schedule.last_error = error
+        schedule.runs += 1
+        schedule.save()
+        rate = f"{schedule.change_rate:.0%} changed" if schedule.change_rate is not None else "no change rate yet"
+        logger.info(f"{schedule.website} {schedule.category}: {rate}, next run in {delay / 3600:.1f}h")
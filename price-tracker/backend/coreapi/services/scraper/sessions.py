@@ -0,0 +1,248 @@
+import asyncio
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import aiohttp
+import cloudscraper
+import requests
+from coreapi.constants import SCRAPING_CONNECTIONS, SCRAPING_CLOUDSCRAPER, SCRAPING_URLS, SCRAPING_HTTP_CACHE, SCRAPING_TIMEOUTS
+from .rate_limit import HostRateLimiter
+from .concurrency import AdaptiveConcurrency
+from .name_cache import ProductNameCache
+from .http_cache import HttpCache
+from .fingerprints import PageFingerprints
+from .journal import RunJournal
+from .circuit_breaker import CircuitBreakers, RunDeadline
+from .replay import TrafficRecorder, traffic_key
+from .metrics import MetricsCollector
+import logging
+
+logger = logging.getLogger("backend.services")
+
+
+def get_host(url: str) -> str:
+    """Return the host part of an url, used as key for every per-host resource"""
+    return urlparse(url).netloc.lower()
+
+
+class CloudscraperPool:
+    """Keeps a small set of cloudscraper sessions per host and reuses them across pages.
+
+    A session solves the anti-bot challenge on its first request and keeps the
+    clearance cookies afterwards, so reusing it turns every later page into a
+    single round trip. Async callers run on a dedicated bounded thread pool
+    instead of the loop default executor.
+    """
+
+    def __init__(self, sessions_per_host: int = None, max_workers: int = None):
+        self.sessions_per_host = sessions_per_host or SCRAPING_CLOUDSCRAPER["sessions_per_host"]
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or SCRAPING_CLOUDSCRAPER["max_workers"],
+            thread_name_prefix="cloudscraper",
+        )
+        self._idle: Dict[str, List[requests.Session]] = {}
+        self._created: Dict[str, int] = {}
+        self._available = threading.Condition()
+
+    @contextmanager
+    def session(self, url: str):
+        """Borrow a session of the url host, waiting if all of them are busy"""
+        host = get_host(url)
+        with self._available:
+            while not self._idle.get(host) and self._created.get(host, 0) >= self.sessions_per_host:
+                self._available.wait()
+            if self._idle.get(host):
+                scraper = self._idle[host].pop()
+            else:
+                scraper = None
+                self._created[host] = self._created.get(host, 0) + 1
+
+        if scraper is None:
+            try:
+                scraper = cloudscraper.create_scraper()
+            except Exception:
+                with self._available:
+                    self._created[host] -= 1
+                    self._available.notify()
+                raise
+            logger.debug(f"Created cloudscraper session {self._created[host]} for {host}")
+
+        try:
+            yield scraper
+        finally:
+            with self._available:
+                self._idle.setdefault(host, []).append(scraper)
+                self._available.notify()
+
+    def get(self, url: str, headers: Optional[dict] = None, timeout: int = 10) -> requests.Response:
+        """Blocking GET through a pooled session"""
+        with self.session(url) as scraper:
+            return scraper.get(url, headers=headers, timeout=timeout)
+
+    async def get_async(self, url: str, headers: Optional[dict] = None, timeout: int = 10) -> requests.Response:
+        """GET through a pooled session on the dedicated thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: self.get(url, headers, timeout))
+
+    def close(self) -> None:
+        """Stop the worker threads and close every pooled session"""
+        self.executor.shutdown(wait=True)
+        with self._available:
+            idle, self._idle = self._idle, {}
+            self._created = {}
+        for scrapers in idle.values():
+            for scraper in scrapers:
+                scraper.close()
+
+
+class SessionManager:
+    """Owns the pooled HTTP sessions of a whole scraping run.
+
+    One connection-pooled aiohttp session per host, created lazily on the first
+    request to that host and kept open (keep-alive, DNS cache) until the run
+    closes the manager, plus a CloudscraperPool for the protected sites, and the
+    per-host rate limiter and adaptive concurrency shared by the sync and async paths.
+    The product name cache of the run is saved when the manager closes, the http
+    cache (None when disabled) revalidates the pages fetched by the previous runs
+    and the page fingerprints (None when not given) spot the unchanged listing pages.
+    The run journal (None when not given) keeps track of the completed pages.
+    Every request is bounded by SCRAPING_TIMEOUTS and the run deadline, the
+    per-host circuit breakers stop requesting a host that keeps failing and the
+    categories given up on are listed in `skipped`.
+    A recorder (None when not given) saves every fetched page, and a replay base
+    url sends every request to a ReplayServer instead of the live website.
+    Every request, parsed page and wait is recorded by the metrics collector.
+
+    Usage:
+        async with SessionManager() as sessions:
+            html = await fetch_async(url, headers, sessions=sessions)
+
+        with SessionManager() as sessions: # sync path, cloudscraper only
+            html = get_page_with_retry(url, headers, scraper_type="cloudscraper", sessions=sessions)
+    """
+
+    def __init__(self, connections: Optional[Dict] = None, names: Optional[ProductNameCache] = None, use_cache: Optional[bool] = None, fingerprints: Optional[PageFingerprints] = None, journal: Optional[RunJournal] = None, deadline: Optional[float] = None, recorder: Optional[TrafficRecorder] = None, replay: Optional[str] = None, metrics: Optional[MetricsCollector] = None):
+        self.connections = {**SCRAPING_CONNECTIONS, **(connections or {})}
+        self.names = names or ProductNameCache()
+        if use_cache is None:
+            use_cache = SCRAPING_HTTP_CACHE["enabled"]
+        self.http_cache = HttpCache() if use_cache else None
+        self.fingerprints = fingerprints
+        self.journal = journal
+        self.deadline = RunDeadline(deadline if deadline is not None else SCRAPING_TIMEOUTS["run"])
+        self.breakers = CircuitBreakers({
+            get_host(base_url): site_info.get("circuit_breaker")
+            for base_url, site_info in SCRAPING_URLS.items()
+        })
+        self.skipped: List[Dict] = []
+        self.recorder = recorder
+        self.metrics = metrics or MetricsCollector()
+        self.replay = replay.rstrip("/") if replay else None
+        self.cloudscraper = CloudscraperPool()
+        self.rate_limiter = HostRateLimiter({
+            get_host(base_url): site_info.get("rate_limit")
+            for base_url, site_info in SCRAPING_URLS.items()
+        })
+        self.concurrency = AdaptiveConcurrency({
+            get_host(base_url): site_info.get("concurrency")
+            for base_url, site_info in SCRAPING_URLS.items()
+        })
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._lock = asyncio.Lock()
+
+    async def get_session(self, url: str) -> aiohttp.ClientSession:
+        """Get the pooled session of the url host, creating it on first use"""
+        host = get_host(url)
+        session = self._sessions.get(host)
+        if session is not None and not session.closed:
+            return session
+
+        async with self._lock:
+            session = self._sessions.get(host)
+            if session is None or session.closed:
+                session = self._create_session()
+                self._sessions[host] = session
+                logger.debug(f"Opened pooled session for {host}")
+        return session
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.connections["limit"],
+            limit_per_host=self.connections["limit_per_host"],
+            keepalive_timeout=self.connections["keepalive_timeout"],
+            use_dns_cache=True,
+            ttl_dns_cache=self.connections["ttl_dns_cache"],
+        )
+        timeout = aiohttp.ClientTimeout(total=SCRAPING_TIMEOUTS["request"], connect=SCRAPING_TIMEOUTS["connect"])
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    def request_timeout(self) -> float:
+        """Timeout of the next request, never past the run deadline"""
+        return self.deadline.timeout(SCRAPING_TIMEOUTS["request"])
+
+    def before_request(self, url: str) -> None:
+        """
+        Raises:
+            RunDeadlineExceeded: the run is out of time
+            CircuitOpenError: the host breaker is open
+        """
+        self.deadline.check()
+        self.breakers.host(get_host(url)).check()
+
+    def route(self, url: str) -> str:
+        """Url the request for `url` is actually sent to, the replay server when replaying"""
+        if self.replay is None:
+            return url
+        return f"{self.replay}/{traffic_key(url)}"
+
+    def record(self, url: str, body: str) -> str:
+        """Hand a fetched page to the recorder of the run, returns the body"""
+        if self.recorder is not None:
+            self.recorder.record(url, body)
+        return body
+
+    def skip(self, scraper: str, category: Dict[str, str], reason: str) -> None:
+        """Note a category given up on, for the run report"""
+        logger.warning(f"Skipped {scraper} {category['url']}: {reason}")
+        self.skipped.append({"website": scraper, "category": category["type"], "url": category["url"], "reason": reason})
+
+    def for_run(self, deadline: Optional[float] = None) -> "SessionManager":
+        """Sessions of a single run on top of a long-lived manager (scheduler, scrape worker)
+
+        The run gets its own deadline and skipped categories, the pooled sessions,
+        rate limiters, concurrency, circuit breakers and caches stay shared. Only
+        the long-lived manager is closed.
+
+        Args:
+            deadline (float): seconds the run may last, None follows SCRAPING_TIMEOUTS["run"]
+        """
+        run = copy.copy(self)
+        run.deadline = RunDeadline(deadline if deadline is not None else SCRAPING_TIMEOUTS["run"])
+        run.skipped = []
+        return run
+
+    async def close(self) -> None:
+        """Close every pooled session"""
+        sessions, self._sessions = self._sessions, {}
+        for host, session in sessions.items():
+            if not session.closed:
+                await session.close()
+                logger.debug(f"Closed pooled session for {host}")
+        await asyncio.get_running_loop().run_in_executor(None, self.cloudscraper.close)
+        self.names.save()
+
+    async def __aenter__(self) -> "SessionManager":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    def __enter__(self) -> "SessionManager":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.cloudscraper.close()
+        self.names.save()
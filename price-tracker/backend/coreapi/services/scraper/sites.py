@@ -0,0 +1,168 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import soupsieve
+from .utils import normalize_spaces, extract_price
+
+
+def clean_text(value: str) -> str:
+    return value.lower().strip()
+
+
+def parse_price_attribute(value: str) -> float:
+    return float(value.strip())
+
+
+def parse_price_text(value: str) -> Optional[float]:
+    return extract_price(value.lower().strip())
+
+
+def parse_features(value: str) -> str:
+    return normalize_spaces(value.lower().strip())
+
+
+def largest_srcset_image(value: str) -> str:
+    """Pick the highest resolution of a shopify srcset, {width} templates included"""
+    images = [s.strip() for s in value.split(",")]
+    last_image = images[-1].split(" ")[0]
+    return "https:" + last_image.replace("{width}", "800")
+
+
+@dataclass(frozen=True)
+class Field:
+    """Where one product value lives inside a listing item
+
+    Args:
+        selector (string): css selector, relative to the item
+        attr (string or tuple): attribute to read, the first non empty one of a tuple wins,
+            None reads the text of the tag
+        many (bool): read every match and join their texts with " | "
+        parse (callable): turns the raw string into the product value
+    """
+    selector: str
+    attr: Union[None, str, Tuple[str, ...]] = None
+    many: bool = False
+    parse: Callable[[str], Any] = clean_text
+    compiled: Any = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # compiled once per process, reused for every item of every page
+        object.__setattr__(self, "compiled", soupsieve.compile(self.selector))
+
+    def extract(self, item) -> Any:
+        if self.many:
+            value = " | ".join(tag.get_text(strip=True) for tag in self.compiled.select(item))
+        else:
+            tag = self.compiled.select_one(item)
+            if tag is None:
+                return None
+            if self.attr is None:
+                value = tag.get_text()
+            else:
+                attrs = (self.attr,) if isinstance(self.attr, str) else self.attr
+                value = next((tag.get(attr) for attr in attrs if tag.get(attr)), None)
+        return self.parse(value) if value else None
+
+
+@dataclass(frozen=True)
+class SiteSpec:
+    """Declarative definition of a retailer, everything the scraper needs to know about it
+
+    Args:
+        name (string): key used in SCRAPING_URLS["scraper"] and stored as the product website
+        items (string): selector of one product of a listing page
+        fields (dict): product value -> Field, "name", "url" and "availability" are required
+        pagination (string): selector of the pagination block of a listing page
+        listing_containers (list): classes of the listing subtrees the fields read
+        transport (string): "http" (aiohttp / requests) or "cloudscraper" for protected sites
+        relative_urls (bool): product hrefs are relative to the site base url
+        product_name (string): selector of the full name on a product page, listing names
+            truncated with "..." are resolved with it, None keeps them as they are
+        product_page_containers (list): classes of the product page subtrees product_name reads
+        json_listing (string): "shopify" or "prestashop" when the platform serves its listings
+            as json (see json_listing.py), the html fields stay the fallback
+    """
+    name: str
+    items: str
+    fields: Dict[str, Field]
+    pagination: str
+    listing_containers: List[str]
+    transport: str = "http"
+    relative_urls: bool = False
+    product_name: Optional[str] = None
+    product_page_containers: List[str] = field(default_factory=list)
+    json_listing: Optional[str] = None
+    compiled_items: Any = field(init=False, repr=False, compare=False)
+    compiled_pagination: Any = field(init=False, repr=False, compare=False)
+    compiled_product_name: Any = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "compiled_items", soupsieve.compile(self.items))
+        object.__setattr__(self, "compiled_pagination", soupsieve.compile(self.pagination))
+        object.__setattr__(self, "compiled_product_name", soupsieve.compile(self.product_name) if self.product_name else None)
+
+
+ULTRAPC = SiteSpec(
+    name="ultrapc",
+    items="div.product-block",
+    fields={
+        "name": Field(".product-title a"),
+        "url": Field(".product-title a", attr="href", parse=str),
+        "short_description": Field("div.product-description-short"),
+        "image_url": Field("a.product-thumbnail.img-thumbnail img", attr="src", parse=str),
+        "price": Field("span.price", attr="content", parse=parse_price_attribute),
+        "availability": Field("div.product-availability"),
+    },
+    pagination="nav.pagination",
+    listing_containers=["product-block", "pagination"],
+    product_name="div.product-block-info h1.product-title",
+    product_page_containers=["product-block-info"],
+    json_listing="prestashop",
+)
+
+NEXTLEVELPC = SiteSpec(
+    name="nextlevelpc",
+    items="div.products article.item",
+    fields={
+        "name": Field("div.product-title h3"),
+        "url": Field("div.product-title a", attr="href", parse=str),
+        "short_description": Field("div.product-features li", many=True, parse=parse_features),
+        "image_url": Field("a.product-thumbnail img.tvproduct-defult-img", attr=("data-cfsrc", "src"), parse=str),
+        "price": Field("span.price", parse=parse_price_text),
+        "availability": Field("div.custom-product-badge span.badge-name-text"),
+    },
+    pagination="nav.pagination",
+    listing_containers=["products", "pagination"],
+    transport="cloudscraper",
+    json_listing="prestashop",
+)
+
+TECHSPACE = SiteSpec(
+    name="techspace",
+    items="div.product-list div.product-item",
+    fields={
+        "name": Field("div.product-item__title-info a.product-item__title"),
+        "url": Field("div.product-item__title-info a.product-item__title", attr="href", parse=str),
+        "image_url": Field(
+            "a.product-item__image-wrapper img.product-item__primary-image",
+            attr=("data-srcset", "srcset", "data-src"),
+            parse=largest_srcset_image,
+        ),
+        "price": Field("span.price", parse=parse_price_text),
+        "availability": Field("span.product-item__inventory"),
+    },
+    pagination="div.pagination",
+    listing_containers=["product-list", "pagination"],
+    relative_urls=True,
+    product_name="div.product-meta h1.product-meta__title",
+    product_page_containers=["product-meta"],
+    json_listing="shopify",
+)
+
+SITES: Dict[str, SiteSpec] = {site.name: site for site in (ULTRAPC, NEXTLEVELPC, TECHSPACE)}
+
+
+def get_site(name: str) -> SiteSpec:
+    """Registry lookup of the site spec named in SCRAPING_URLS"""
+    if name not in SITES:
+        raise KeyError(f"No site spec registered for scraper '{name}'")
+    return SITES[name]
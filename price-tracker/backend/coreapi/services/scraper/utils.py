@@ -1,23 +1,21 @@
 import asyncio
 import hashlib
 import time
-import random
 from typing import Optional
 import unicodedata
 import re
+from datetime import datetime
+from email.utils import parsedate_to_datetime
 import aiohttp
 import cloudscraper
 import requests
-from coreapi.constants import SCRAPING_WAIT
+from .sessions import SessionManager, get_host
+from coreapi.constants import SCRAPING_TIMEOUTS
 import logging
 
 logger = logging.getLogger("backend.services")
 
-def respect_rate_limits() -> None:
-    """Add a random delay between requests to avoid overwhelming servers."""
-    time.sleep(random.uniform(SCRAPING_WAIT["min_seconds"], SCRAPING_WAIT["max_seconds"]))
-    
-    
+
 def normalize_spaces(text):
     """Normalize spaces in text, including unicode spaces (html text code)"""
     return ''.join(' ' if unicodedata.category(c) == 'Zs' else c for c in text)
@@ -54,22 +52,94 @@ def generate_product_id(website: int, url: str) -> str:
     input_str = f"{website}|{url}".lower().strip("/")
     return hashlib.sha256(input_str.encode()).hexdigest()
 
-def get_page_with_retry(url:str, headers: dict, max_retries: int=3, scraper_type: str = "requests") -> Optional[str]:
-    """Fetch page content with retry mechanism for reliability."""
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header, given either in seconds or as an http date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+
+
+def get_page_with_retry(url:str, headers: dict, max_retries: int=3, scraper_type: str = "requests", sessions: Optional[SessionManager] = None) -> Optional[str]:
+    """Fetch page content with retry mechanism for reliability.
+
+    Cloudscraper requests reuse the pooled sessions of the run when a SessionManager is given,
+    every attempt waits for the host rate limiter of the run and its outcome feeds the
+    host concurrency controller, which also holds the next attempt for Retry-After.
+    Pages in the http cache of the run are revalidated, a 304 returns the cached body.
+    The pages are handed to the recorder of the run, replayed runs fetch from the replay server.
+    Latency, bytes, statuses, retries and rate limiter waits go to the metrics of the run.
+
+    Raises:
+        RunDeadlineExceeded: the run deadline of the sessions passed
+        CircuitOpenError: the host breaker of the sessions is open
+    """
+    host = get_host(url)
+    http_cache = sessions.http_cache if sessions is not None else None
+    timeout = SCRAPING_TIMEOUTS["request"]
     for attempt in range(max_retries):
+        request_headers = headers
+        request_url = url
+        if sessions is not None:
+            if attempt:
+                sessions.metrics.retry(host)
+            request_url = sessions.route(url)
+            sessions.before_request(url)
+            sessions.metrics.wait(host, "rate_limit", sessions.rate_limiter.wait(host))
+            sessions.concurrency.host(host).wait_until_resumed()
+            timeout = sessions.request_timeout()
+        if http_cache is not None:
+            request_headers = {**headers, **http_cache.validators(url)}
+        started = time.monotonic()
         try:
             if scraper_type == "requests":
-                response = requests.get(url, headers=headers, timeout=10)
-                if response.status_code == 429: # too many requests
-                    wait_time = int(response.headers.get('Retry-After', 60))
-                    logger.warning(f"Rate limited. Waiting {wait_time} seconds")
-                    time.sleep(wait_time)
-                    continue
-                return response.text
+                response = requests.get(request_url, headers=request_headers, timeout=timeout)
             elif scraper_type == "cloudscraper":
-                cloud = cloudscraper.create_scraper()
-                return cloud.get(url, timeout=10).text
+                if sessions is not None:
+                    response = sessions.cloudscraper.get(request_url, headers=request_headers, timeout=timeout)
+                else:
+                    response = cloudscraper.create_scraper().get(url, timeout=timeout)
+            else:
+                return None
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if response.status_code == 429 and retry_after is None:
+                retry_after = 60 # no Retry-After, back off by default
+            if sessions is not None:
+                sessions.metrics.request(host, time.monotonic() - started, response.status_code, response.text)
+                sessions.concurrency.host(host).record(time.monotonic() - started, status=response.status_code, retry_after=retry_after)
+                if response.status_code >= 500:
+                    sessions.breakers.host(host).record_failure()
+                else:
+                    sessions.breakers.host(host).record_success()
+            if response.status_code == 429: # too many requests
+                # with sessions the next attempt waits in wait_until_resumed, so does every other request to the host
+                logger.warning(f"Rate limited. Waiting {retry_after:.0f} seconds")
+                if sessions is None:
+                    time.sleep(retry_after)
+                continue
+            if response.status_code == 304 and http_cache is not None:
+                cached_body = http_cache.get(url)
+                if cached_body is not None:
+                    return sessions.record(url, cached_body)
+                continue # evicted meanwhile, the next attempt has no validators
+            if response.status_code == 200 and http_cache is not None:
+                http_cache.store(url, response.text, response.headers)
+            if sessions is not None and response.status_code == 200:
+                return sessions.record(url, response.text)
+            return response.text
         except requests.RequestException as e:
+            if sessions is not None:
+                sessions.metrics.request(host, time.monotonic() - started, "timeout" if isinstance(e, requests.Timeout) else "error")
+                sessions.concurrency.host(host).record(time.monotonic() - started, timeout=isinstance(e, requests.Timeout))
+                sessions.breakers.host(host).record_failure()
             logger.warning(f"Attempt {attempt+1} failed for {url}: {e}")
             if attempt < max_retries - 1:
                 # Exponential backoff
@@ -81,38 +151,127 @@ def get_page_with_retry(url:str, headers: dict, max_retries: int=3, scraper_type
     return None
 
 
-async def fetch_async(url, headers, scraper_type="aiohttp"):
+async def fetch_async(url, headers, scraper_type="aiohttp", sessions: Optional[SessionManager] = None, max_retries: int = 3):
+    """Fetch page content asynchronously.
+
+    When a SessionManager is given the pooled session (aiohttp or cloudscraper) of
+    the url host is reused, the request waits for the host rate limiter and runs
+    inside one of the adaptive concurrency slots of the host. 429, 5xx and
+    timeouts are retried after the controller backs off (and Retry-After expired).
+    Pages in the http cache of the run are revalidated, a 304 returns the cached body.
+    The pages are handed to the recorder of the run and requests go to the replay
+    server when the run replays a recording. Latency, bytes, statuses, retries and
+    waits go to the metrics of the run.
+    Every attempt is bounded by the request timeout, cut down to what is left of the
+    run, and feeds the circuit breaker of the host.
+    Otherwise a one-off session is opened for this request only.
+
+    Raises:
+        RunDeadlineExceeded: the run deadline of the sessions passed
+        CircuitOpenError: the host breaker of the sessions is open
+    """
+    if sessions is None:
+        return await _fetch_unpooled(url, headers, scraper_type)
+
+    host = get_host(url)
+    http_cache = sessions.http_cache
+    breaker = sessions.breakers.host(host)
+    metrics = sessions.metrics
+    for attempt in range(max_retries):
+        if attempt:
+            metrics.retry(host)
+        sessions.before_request(url)
+        metrics.wait(host, "rate_limit", await sessions.rate_limiter.wait_async(host))
+        request_headers = {**headers, **http_cache.validators(url)} if http_cache is not None else headers
+        queued = time.monotonic()
+        async with sessions.concurrency.slot(host) as controller:
+            metrics.wait(host, "slot", time.monotonic() - queued)
+            timeout = sessions.request_timeout()
+            started = time.monotonic()
+            try:
+                if scraper_type == "cloudscraper":
+                    # the worker thread can't be interrupted, only waited for, it may also queue for a free worker
+                    response = await asyncio.wait_for(sessions.cloudscraper.get_async(sessions.route(url), headers=request_headers, timeout=timeout), timeout * 2)
+                    status, body, response_headers = response.status_code, response.text, response.headers
+                else:
+                    session = await sessions.get_session(url)
+                    request_timeout = aiohttp.ClientTimeout(total=timeout, connect=SCRAPING_TIMEOUTS["connect"])
+                    async with session.get(sessions.route(url), headers=request_headers, timeout=request_timeout) as response:
+                        status, body, response_headers = response.status, await response.text(), response.headers
+            except (asyncio.TimeoutError, requests.Timeout):
+                metrics.request(host, time.monotonic() - started, "timeout")
+                controller.record(time.monotonic() - started, timeout=True)
+                breaker.record_failure()
+                logger.warning(f"Timeout while fetching {url} (attempt {attempt+1}/{max_retries})")
+                continue
+            except (aiohttp.ClientError, requests.RequestException) as e:
+                metrics.request(host, time.monotonic() - started, "error")
+                controller.record(time.monotonic() - started)
+                breaker.record_failure()
+                logger.warning(f"Attempt {attempt+1} failed for {url}: {e}")
+                continue
+            metrics.request(host, time.monotonic() - started, status, body)
+            controller.record(time.monotonic() - started, status=status, retry_after=parse_retry_after(response_headers.get("Retry-After")))
+            if status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+        if status == 304 and http_cache is not None:
+            cached_body = http_cache.get(url)
+            if cached_body is not None:
+                return sessions.record(url, cached_body)
+            continue # evicted meanwhile, the next attempt has no validators
+        if status == 200:
+            if http_cache is not None:
+                http_cache.store(url, body, response_headers)
+            return sessions.record(url, body)
+        if status == 429 or status >= 500:
+            logger.warning(f"Got {status} from {url} (attempt {attempt+1}/{max_retries})")
+            continue
+        logger.warning(f"Failed to fetch {url} - Status code: {status}")
+        return None
+
+    logger.error(f"Failed to fetch {url} after {max_retries} attempts")
+    return None
+
+
+async def _fetch_unpooled(url: str, headers: dict, scraper_type: str) -> Optional[str]:
     try:
         if scraper_type == "cloudscraper":
             loop = asyncio.get_event_loop()
             cloud = cloudscraper.create_scraper()
             return await loop.run_in_executor(
-                None, lambda: cloud.get(url, headers=headers).text
+                None, lambda: cloud.get(url, headers=headers, timeout=SCRAPING_TIMEOUTS["request"]).text
             )
         else:
             # Regular aiohttp fetch
-            async with aiohttp.ClientSession() as session:
-                try:
-                    async with session.get(url, headers=headers) as response:
-                        if response.status == 200:
-                            return await response.text()
-                        elif response.status == 429:
-                            logger.warning(f"Rate limited at {url}")
-                            raise aiohttp.ClientConnectionError(
-                                request_info=response.request_info,
-                                history=response.history,
-                                status=429
-                            )
-                        else:
-                            logger.warning(f"Failed to fetch {url} - Status code: {response.status}")
-                            return None
-                except aiohttp.ClientTimeout:
-                    logger.error(f"Timeout while fetching {url}")
-                    return None
-                except aiohttp.ClientConnectionError:
-                    logger.error(f"Connection error while fetching {url}")
-                    return None
+            timeout = aiohttp.ClientTimeout(total=SCRAPING_TIMEOUTS["request"], connect=SCRAPING_TIMEOUTS["connect"])
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                return await _fetch_with_session(session, url, headers)
     except Exception as e:
         logger.error(f"Unexpected error fetching {url}: {str(e)})")
         return None
-            
+
+
+async def _fetch_with_session(session: aiohttp.ClientSession, url: str, headers: dict) -> Optional[str]:
+    try:
+        async with session.get(url, headers=headers) as response:
+            if response.status == 200:
+                return await response.text()
+            elif response.status == 429:
+                logger.warning(f"Rate limited at {url}")
+                raise aiohttp.ClientResponseError(
+                    request_info=response.request_info,
+                    history=response.history,
+                    status=429
+                )
+            else:
+                logger.warning(f"Failed to fetch {url} - Status code: {response.status}")
+                return None
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout while fetching {url}")
+        return None
+    except aiohttp.ClientConnectionError:
+        logger.error(f"Connection error while fetching {url}")
+        return None
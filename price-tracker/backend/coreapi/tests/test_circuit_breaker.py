@@ -0,0 +1,91 @@
+from django.test import SimpleTestCase
+from coreapi.services.scraper.circuit_breaker import CircuitBreakers, CircuitOpenError, HostCircuitBreaker, RunDeadline, RunDeadlineExceeded
+from .test_rate_limit import frozen
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        patcher, self.clock = frozen("circuit_breaker")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = HostCircuitBreaker("shop.ma", {"failures": 3, "reset_after": 60})
+
+    def fail(self, times):
+        for _ in range(times):
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.breaker.check()
+        self.fail(1)
+
+        self.assertTrue(self.breaker.is_open)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.check()
+        self.assertEqual(self.breaker.stats(), {"open": True, "trips": 1, "consecutive_failures": 3})
+
+    def test_success_resets_the_count(self):
+        self.fail(2)
+        self.breaker.record_success()
+        self.fail(2)
+
+        self.assertFalse(self.breaker.is_open)
+
+    def test_half_open_lets_a_single_trial_through(self):
+        self.fail(3)
+        self.clock.now += 60
+
+        self.breaker.check() # the trial
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.check()
+
+        self.breaker.record_success()
+        self.assertFalse(self.breaker.is_open)
+        self.breaker.check()
+
+    def test_failed_trial_keeps_it_open_another_period(self):
+        self.fail(3)
+        self.clock.now += 60
+        self.breaker.check()
+        self.breaker.record_failure()
+
+        self.clock.now += 30
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.check()
+        self.clock.now += 30
+        self.breaker.check()
+        self.assertEqual(self.breaker.trips, 1)
+
+    def test_per_host_overrides(self):
+        breakers = CircuitBreakers({"shop.ma": {"failures": 1}})
+
+        breakers.host("shop.ma").record_failure()
+        breakers.host("other.ma").record_failure()
+
+        self.assertTrue(breakers.host("shop.ma").is_open)
+        self.assertFalse(breakers.host("other.ma").is_open)
+
+
+class RunDeadlineTests(SimpleTestCase):
+    def setUp(self):
+        patcher, self.clock = frozen("circuit_breaker")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_no_deadline(self):
+        deadline = RunDeadline(None)
+
+        deadline.check()
+        self.assertIsNone(deadline.remaining())
+        self.assertEqual(deadline.timeout(20), 20)
+
+    def test_request_timeouts_are_cut_to_the_deadline(self):
+        deadline = RunDeadline(30)
+        self.assertEqual(deadline.timeout(20), 20)
+
+        self.clock.now += 25
+        self.assertEqual(deadline.timeout(20), 5)
+
+        self.clock.now += 5
+        with self.assertRaises(RunDeadlineExceeded):
+            deadline.check()
@@ -0,0 +1,71 @@
+import asyncio
+from django.test import SimpleTestCase
+from coreapi.services.scraper.concurrency import AdaptiveConcurrency, HostConcurrency
+from .test_rate_limit import frozen
+
+
+SETTINGS = {"initial": 2, "min": 1, "max": 4, "increase": 1, "decrease": 0.5, "cooldown": 5, "latency_target": 3}
+
+
+class ConcurrencyTests(SimpleTestCase):
+    def setUp(self):
+        patcher, self.clock = frozen("concurrency")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.host = HostConcurrency("shop.ma", SETTINGS)
+
+    def test_fast_responses_raise_the_limit_up_to_the_max(self):
+        for _ in range(50):
+            self.host.record(0.2, status=200)
+
+        self.assertEqual(self.host.limit, 4)
+        self.assertEqual(self.host.stats()["peak_concurrency"], 4)
+
+    def test_slow_responses_hold_the_limit(self):
+        self.host.record(10, status=200)
+
+        self.assertEqual(self.host.limit, 2)
+
+    def test_pushback_cuts_the_limit_once_per_cooldown(self):
+        self.host.record(0.2, status=503)
+        self.host.record(0.2, timeout=True)
+        self.assertEqual(self.host.limit, 1)
+
+        self.host.limit = 4
+        self.host.record(0.2, status=429)
+        self.assertEqual(self.host.limit, 4)
+        self.clock.now += 5
+        self.host.record(0.2, status=429)
+        self.assertEqual(self.host.limit, 2)
+        self.assertEqual(self.host.stats()["throttled"], 4)
+
+    def test_retry_after_holds_the_host(self):
+        self.host.record(0.2, status=429, retry_after=30)
+
+        self.host.wait_until_resumed()
+        self.assertEqual(self.clock.slept, [30])
+        self.host.wait_until_resumed()
+        self.assertEqual(self.clock.slept, [30])
+
+    def test_async_slots(self):
+        host = HostConcurrency("shop.ma", {**SETTINGS, "initial": 1})
+        order = []
+
+        async def request(name):
+            await host.acquire()
+            order.append(f"{name} in")
+            await asyncio.sleep(0)
+            order.append(f"{name} out")
+            await host.release()
+
+        async def run():
+            await asyncio.gather(request("a"), request("b"))
+
+        asyncio.run(run())
+        self.assertEqual(order, ["a in", "a out", "b in", "b out"])
+
+    def test_per_host_overrides(self):
+        concurrency = AdaptiveConcurrency({"shop.ma": {"max": 2}})
+
+        self.assertEqual(concurrency.host("shop.ma").settings["max"], 2)
+        self.assertIs(concurrency.host("other.ma"), concurrency.host("other.ma"))
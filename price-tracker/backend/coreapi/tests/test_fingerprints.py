@@ -0,0 +1,51 @@
+import json
+from django.test import SimpleTestCase
+from coreapi.services.scraper.fingerprints import PageFingerprints, fingerprint
+from .test_name_cache import TemporaryDirectoryMixin
+
+
+class PageFingerprintsTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def fingerprints(self, **kwargs):
+        return PageFingerprints(self.directory / "page_fingerprints.json", **kwargs)
+
+    def test_volatile_markup_is_ignored(self):
+        page = '<div class="product">rtx 4070</div><input type="hidden" name="token" value="{}"><script>var nonce = "{}"</script>'
+
+        self.assertEqual(fingerprint(page.format("a1", "b1")), fingerprint(page.format("a2", "b2")))
+        self.assertNotEqual(fingerprint(page.format("a1", "b1")), fingerprint(page.replace("4070", "4080").format("a1", "b1")))
+
+    def test_unchanged_page_once_saved(self):
+        fingerprints = self.fingerprints()
+        fingerprints.update("ultrapc", "/gpu", 1, "hash", ["u1", "u2"], 3)
+        self.assertIsNone(fingerprints.unchanged_page("ultrapc", "/gpu", 1, "hash"))
+        fingerprints.save()
+
+        fingerprints = self.fingerprints()
+        self.assertEqual(fingerprints.unchanged_page("ultrapc", "/gpu", 1, "hash"), {"hash": "hash", "ids": ["u1", "u2"], "page_count": 3})
+        self.assertIsNone(fingerprints.unchanged_page("ultrapc", "/gpu", 1, "other"))
+        self.assertIsNone(self.fingerprints(force=True).unchanged_page("ultrapc", "/gpu", 1, "hash"))
+
+    def test_only_the_ingested_categories_are_saved(self):
+        fingerprints = self.fingerprints()
+        fingerprints.update("ultrapc", "/gpu", 1, "gpu", ["u1"], 1)
+        fingerprints.update("techspace", "/gpu", 1, "gpu", ["t1"], 1)
+
+        fingerprints.save([("ultrapc", "/gpu")])
+        with open(self.directory / "page_fingerprints.json", encoding="utf-8") as f:
+            self.assertEqual(list(json.load(f)), ["ultrapc|/gpu|1"])
+
+        # the techspace run failed, its pages are parsed again next time
+        fingerprints.discard([("techspace", "/gpu")])
+        fingerprints.save()
+        self.assertIsNone(self.fingerprints().unchanged_page("techspace", "/gpu", 1, "gpu"))
+
+    def test_pages_with_rejected_products_are_not_saved(self):
+        fingerprints = self.fingerprints()
+        fingerprints.update("ultrapc", "/gpu", 1, "page 1", ["u1", "u2"], 2)
+        fingerprints.update("ultrapc", "/gpu", 2, "page 2", ["u3"], 2)
+
+        fingerprints.save(failed_ids={"u2"})
+
+        # u2 isn't in the database, its page must be parsed again by the next run
+        self.assertIsNone(self.fingerprints().unchanged_page("ultrapc", "/gpu", 1, "page 1"))
+        self.assertIsNotNone(self.fingerprints().unchanged_page("ultrapc", "/gpu", 2, "page 2"))
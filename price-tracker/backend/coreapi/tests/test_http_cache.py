@@ -0,0 +1,50 @@
+from django.test import SimpleTestCase
+from coreapi.services.scraper.http_cache import HttpCache
+from .test_name_cache import TemporaryDirectoryMixin
+
+
+class HttpCacheTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def cache(self, **kwargs):
+        return HttpCache(self.directory / "http_cache", **kwargs)
+
+    def test_revalidates_with_the_stored_validators(self):
+        cache = self.cache()
+        cache.store("https://shop.ma/gpu", "<html>gpu</html>", {"ETag": '"v1"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"})
+
+        self.assertEqual(cache.validators("https://shop.ma/gpu"), {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+        })
+        self.assertEqual(cache.get("https://shop.ma/gpu"), "<html>gpu</html>")
+        self.assertEqual(cache.validators("https://shop.ma/cpu"), {})
+
+    def test_pages_without_validators_are_not_stored(self):
+        cache = self.cache()
+        cache.store("https://shop.ma/gpu", "<html>gpu</html>", {})
+
+        self.assertIsNone(cache.get("https://shop.ma/gpu"))
+        self.assertEqual(cache.stats()["pages"], 0)
+
+    def test_kept_across_runs(self):
+        self.cache().store("https://shop.ma/gpu", "<html>gpu</html>", {"ETag": '"v1"'})
+
+        cache = self.cache()
+        self.assertEqual(cache.get("https://shop.ma/gpu"), "<html>gpu</html>")
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_least_recently_used_pages_are_evicted(self):
+        cache = self.cache(max_size_mb=0.0015) # room for a single 1000 byte page
+        cache.store("https://shop.ma/1", "a" * 1000, {"ETag": '"1"'})
+        cache.store("https://shop.ma/2", "b" * 1000, {"ETag": '"2"'})
+
+        self.assertIsNone(cache.get("https://shop.ma/1"))
+        self.assertEqual(cache.get("https://shop.ma/2"), "b" * 1000)
+        self.assertEqual(cache.stats()["pages"], 1)
+
+    def test_clear(self):
+        cache = self.cache()
+        cache.store("https://shop.ma/gpu", "<html>gpu</html>", {"ETag": '"v1"'})
+        cache.clear()
+
+        self.assertEqual(cache.validators("https://shop.ma/gpu"), {})
+        self.assertFalse((self.directory / "http_cache").exists())
@@ -0,0 +1,55 @@
+from decimal import Decimal
+from django.test import TestCase
+from coreapi.models import ProductGroup, Website
+from coreapi.services.product_grouping.processor import IdentityMap
+
+
+class IdentityMapTests(TestCase):
+    def group(self, canonical_name, price="100.00"):
+        return ProductGroup(canonical_name=canonical_name, category="gpu", brand="NVIDIA", starting_price=Decimal(price))
+
+    def test_warmed_with_the_existing_rows(self):
+        website = Website.objects.create(name="ultrapc")
+        group = ProductGroup.objects.create(canonical_name="RTX 4070 12 GB - palit", category="gpu", brand="NVIDIA", starting_price=1)
+
+        identity = IdentityMap()
+
+        self.assertEqual(identity.website("ultrapc"), website)
+        self.assertEqual(identity.groups[("RTX 4070 12 GB - palit", "gpu")], group)
+
+    def test_add_groups_reads_back_the_existing_ones(self):
+        existing = ProductGroup.objects.create(canonical_name="RTX 4070 12 GB - palit", category="gpu", brand="NVIDIA", starting_price=1)
+        identity = IdentityMap()
+
+        groups, created = identity.add_groups([self.group("RTX 4070 12 GB - palit"), self.group("RTX 4060 8 GB - msi")])
+
+        self.assertEqual(created, 1)
+        self.assertEqual(groups[("RTX 4070 12 GB - palit", "gpu")].id, existing.id)
+        self.assertTrue(ProductGroup.objects.filter(id=groups[("RTX 4060 8 GB - msi", "gpu")].id).exists())
+        self.assertEqual(ProductGroup.objects.count(), 2)
+
+    def test_website_created_by_another_run_is_reused(self):
+        identity = IdentityMap()
+        website = Website.objects.create(name="techspace")
+
+        self.assertEqual(identity.website("techspace"), website)
+        self.assertEqual(Website.objects.count(), 1)
+
+    def test_rows_are_remembered_once_committed(self):
+        identity = IdentityMap()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            identity.add_groups([self.group("RTX 4060 8 GB - msi")])
+            website = identity.website("techspace")
+
+        self.assertIn(("RTX 4060 8 GB - msi", "gpu"), identity.groups)
+        self.assertEqual(identity.website("techspace"), website)
+        self.assertEqual(Website.objects.count(), 1)
+
+    def test_rolled_back_rows_are_forgotten(self):
+        identity = IdentityMap()
+
+        with self.captureOnCommitCallbacks(execute=False):
+            identity.add_groups([self.group("RTX 4060 8 GB - msi")])
+
+        self.assertNotIn(("RTX 4060 8 GB - msi", "gpu"), identity.groups)
@@ -0,0 +1,147 @@
+from decimal import Decimal
+from django.test import TransactionTestCase
+from coreapi.models import Product, ProductGroup, Website
+from coreapi.services.product_grouping.processor import ProductProcessor
+from coreapi.services.scraper.fingerprints import unchanged_page_marker
+from .test_jobs import scraped
+
+
+class IngestionTests(TransactionTestCase):
+    """Both ingestion paths, the bulk upserts and the product by product fallback, must agree.
+
+    The rows a run creates are only added to its identity map once committed,
+    so these tests commit for real instead of running in a rolled back transaction.
+    """
+
+    def each_mode(self):
+        """A processor per ingestion path, each one starting from an empty database"""
+        for bulk in (True, False):
+            Product.objects.all().delete()
+            ProductGroup.objects.all().delete()
+            Website.objects.all().delete()
+            yield bulk, ProductProcessor(bulk=bulk)
+
+    def test_new_products_are_created_and_grouped(self):
+        for bulk, processor in self.each_mode():
+            with self.subTest(bulk=bulk):
+                stats = processor.ingest_and_group([
+                    scraped("u1", price=7200.0),
+                    scraped("t1", name="msi geforce rtx 4070 super 12g ventus 2x oc", website="techspace", price=6900.0),
+                    scraped("u2", name="palit geforce rtx 4070 dual 12g"),
+                ])
+
+                self.assertEqual((stats["total"], stats["created"], stats["updated"], stats["errors"]), (3, 3, 0, 0))
+                self.assertEqual((stats["groups_created"], stats["grouped"]), (2, 3))
+                group = Product.objects.get(id="u1").canonical_group
+                self.assertEqual(Product.objects.get(id="t1").canonical_group, group)
+                self.assertEqual(group.starting_price, Decimal("6900.00"))
+                self.assertEqual(Website.objects.count(), 2)
+
+    def test_known_products_are_updated(self):
+        for bulk, processor in self.each_mode():
+            with self.subTest(bulk=bulk):
+                processor.ingest_and_group([scraped("u1", price=7200.0)])
+                stats = processor.ingest_and_group([scraped("u1", price=6500.0), scraped("u1", price=6400.0)])
+
+                self.assertEqual((stats["created"], stats["updated"], stats["groups_created"]), (0, 2, 0))
+                self.assertEqual(Product.objects.get(id="u1").price, Decimal("6400.00"))
+                self.assertEqual(ProductGroup.objects.get().starting_price, Decimal("6400.00"))
+
+    def test_invalid_products_are_errors_not_batch_failures(self):
+        # a product without a usable price used to abort the whole bulk batch
+        for bulk, processor in self.each_mode():
+            with self.subTest(bulk=bulk):
+                stats = processor.ingest_and_group([
+                    scraped("u1"),
+                    scraped("u2", price=None),
+                    scraped("u3", price="n/a"),
+                    scraped("u4", website=""),
+                    scraped(None),
+                ])
+
+                self.assertEqual((stats["total"], stats["created"], stats["errors"]), (5, 1, 4))
+                self.assertEqual(stats["failed_ids"], {"u2", "u3", "u4"})
+                self.assertEqual(list(Product.objects.values_list("id", flat=True)), ["u1"])
+
+    def test_batch_of_only_invalid_products(self):
+        for bulk, processor in self.each_mode():
+            with self.subTest(bulk=bulk):
+                stats = processor.ingest_and_group([scraped("u1", price=None)])
+
+                self.assertEqual((stats["created"], stats["errors"]), (0, 1))
+                self.assertFalse(Product.objects.exists())
+
+    def test_products_the_run_did_not_see_become_unavailable(self):
+        processor = ProductProcessor()
+        processor.ingest_and_group([
+            scraped("u1"),
+            scraped("u2", name="palit geforce rtx 4070 dual 12g"),
+            scraped("t1", website="techspace"),
+        ])
+
+        # techspace isn't part of this run, its products are left alone
+        stats = processor.ingest_and_group([scraped("u1")])
+
+        self.assertEqual(stats["created"], 0)
+        self.assertFalse(Product.objects.get(id="u2").availability)
+        self.assertTrue(Product.objects.get(id="u1").availability)
+        self.assertTrue(Product.objects.get(id="t1").availability)
+
+    def test_skipped_categories_keep_their_availability(self):
+        processor = ProductProcessor()
+        processor.ingest_and_group([scraped("u1"), scraped("u2", name="palit geforce rtx 4070 dual 12g")])
+
+        scopes = [{"website": "ultrapc", "category": "gpu"}]
+        processor.ingest_and_group([], skipped=scopes, scopes=scopes)
+
+        self.assertEqual(Product.objects.filter(availability=True).count(), 2)
+
+    def test_unchanged_pages_mark_their_products_as_seen(self):
+        processor = ProductProcessor()
+        processor.ingest_and_group([scraped("u1"), scraped("u2", name="palit geforce rtx 4070 dual 12g")])
+
+        stats = processor.ingest_and_group([unchanged_page_marker("ultrapc", "gpu", ["u1", "u2"])])
+
+        self.assertEqual((stats["total"], stats["unchanged"]), (0, 2))
+        self.assertEqual(Product.objects.filter(availability=True, last_seen_run=stats["run"]).count(), 2)
+
+    def test_batches_of_one_run_share_it(self):
+        processor = ProductProcessor()
+        stats = processor.begin_run()
+        processor.ingest_batch([scraped("u1")], stats)
+        processor.ingest_batch([scraped("u2", name="palit geforce rtx 4070 dual 12g")], stats)
+        processor.finish_run(stats)
+
+        self.assertEqual((stats["created"], stats["groups_created"]), (2, 2))
+        self.assertEqual(Product.objects.filter(availability=True).count(), 2)
+
+    def test_concurrent_runs_share_the_groups_they_create(self):
+        first, second = ProductProcessor(), ProductProcessor()
+        first_stats, second_stats = first.begin_run(), second.begin_run()
+        # both identity maps are warmed before either run creates the group
+        first.ingest_batch([scraped("u1", name="palit geforce rtx 4070 dual 12g")], first_stats)
+        second.ingest_batch([scraped("t1", name="palit geforce rtx 4070 dual 12g", website="techspace")], second_stats)
+
+        first.ingest_batch([scraped("u2")], first_stats)
+        second.ingest_batch([scraped("t2", website="techspace")], second_stats)
+
+        self.assertEqual((first_stats["groups_created"], second_stats["groups_created"]), (2, 0))
+        self.assertEqual(second_stats["errors"], 0)
+        self.assertEqual(Product.objects.get(id="t2").canonical_group, Product.objects.get(id="u2").canonical_group)
+
+    def test_group_prices_updated_in_one_query(self):
+        processor = ProductProcessor()
+        processor.ingest_and_group([
+            scraped("u1", price=7200.0),
+            scraped("t1", website="techspace", price=6900.0),
+            scraped("u2", name="palit geforce rtx 4070 dual 12g", price=5000.0),
+        ])
+        Product.objects.filter(id="t1").update(availability=False)
+        Product.objects.filter(id="u2").update(availability=False)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(processor._update_group_pricing(), 1)
+
+        self.assertEqual(Product.objects.get(id="u1").canonical_group.starting_price, Decimal("7200.00"))
+        # a group without available products keeps its last price
+        self.assertEqual(Product.objects.get(id="u2").canonical_group.starting_price, Decimal("5000.00"))
@@ -0,0 +1,160 @@
+import asyncio
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from coreapi.constants import SCRAPING_JOBS, SCRAPING_URLS
+from coreapi.models import Product, ScrapeJob
+from coreapi.services.product_grouping.processor import ProductProcessor
+from coreapi.services.scraper.jobs import _follow_up_ranges, claim_job, complete_job, fail_job, run_worker, scrape_with_workers, seed_jobs
+from .test_sessions import session_manager
+
+CATEGORIES = sum(len(site_info["categories"]) for site_info in SCRAPING_URLS.values())
+
+
+def scraped(product_id, name="msi geforce rtx 4070 super 12g ventus 2x oc", website="ultrapc", **fields):
+    """A scraped product as the scrapers hand it to the processor"""
+    return {
+        "id": product_id,
+        "name": name,
+        "url": f"https://{website}.ma/{product_id}",
+        "short_description": "",
+        "image_url": f"https://{website}.ma/{product_id}.jpg",
+        "price": 7000.0,
+        "availability": True,
+        "category": "gpu",
+        "website": website,
+        **fields,
+    }
+
+
+class JobQueueTests(TestCase):
+    def test_seeded_once_per_run(self):
+        self.assertEqual(seed_jobs("run"), CATEGORIES)
+        self.assertEqual(seed_jobs("run"), 0)
+
+        job = ScrapeJob.objects.filter(run_id="run").first()
+        self.assertEqual((job.first_page, job.last_page, job.status), (1, SCRAPING_JOBS["pages_per_job"], ScrapeJob.PENDING))
+
+    def test_claimed_by_one_worker(self):
+        seed_jobs("run")
+
+        claimed = [claim_job(f"worker-{i}") for i in range(CATEGORIES + 1)]
+
+        self.assertIsNone(claimed[-1])
+        self.assertEqual(len({job.id for job in claimed[:-1]}), CATEGORIES)
+        self.assertTrue(all(job.status == ScrapeJob.RUNNING and job.attempts == 1 for job in claimed[:-1]))
+
+    def test_expired_lease_hands_the_job_out_again(self):
+        seed_jobs("run")
+        job = claim_job("dead")
+        ScrapeJob.objects.exclude(id=job.id).delete()
+        ScrapeJob.objects.filter(id=job.id).update(claimed_at=timezone.now() - timedelta(seconds=SCRAPING_JOBS["lease"] + 1))
+
+        again = claim_job("alive")
+
+        self.assertEqual((again.id, again.worker, again.attempts), (job.id, "alive", 2))
+        # the dead worker coming back late doesn't overwrite the new claim
+        complete_job(job, [scraped("u1")], 1, False, [])
+        self.assertEqual(ScrapeJob.objects.get(id=job.id).status, ScrapeJob.RUNNING)
+
+    def test_completed_job_queues_its_follow_ups(self):
+        seed_jobs("run")
+        job = claim_job("worker")
+
+        complete_job(job, [scraped("u1")], 12, True, _follow_up_ranges(job, 12, False))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.page_count, job.json_listing, job.results), (ScrapeJob.DONE, 12, True, [scraped("u1")]))
+        follow_ups = ScrapeJob.objects.filter(category_url=job.category_url, status=ScrapeJob.PENDING).order_by("first_page")
+        self.assertEqual([(f.first_page, f.last_page, f.json_listing) for f in follow_ups], [(6, 10, True), (11, 12, True)])
+
+    def test_the_run_deadline_goes_with_its_jobs(self):
+        deadline = timezone.now() + timedelta(hours=1)
+        seed_jobs("run", deadline)
+        job = claim_job("worker")
+
+        complete_job(job, [scraped("u1")], 12, True, _follow_up_ranges(job, 12, False))
+
+        self.assertFalse(ScrapeJob.objects.exclude(deadline=deadline).exists())
+        # a resumed run gives its unfinished jobs the deadline of the new coordinator
+        later = deadline + timedelta(hours=1)
+        seed_jobs("run", later)
+        self.assertEqual(ScrapeJob.objects.get(id=job.id).deadline, deadline)
+        self.assertFalse(ScrapeJob.objects.exclude(id=job.id).exclude(deadline=later).exists())
+
+    def test_failed_job_is_retried_then_given_up_on(self):
+        seed_jobs("run")
+        ScrapeJob.objects.exclude(id=ScrapeJob.objects.first().id).delete()
+
+        for attempt in range(1, SCRAPING_JOBS["max_attempts"] + 1):
+            job = claim_job("worker")
+            self.assertEqual(job.attempts, attempt)
+            fail_job(job, "timeout")
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (ScrapeJob.FAILED, "timeout"))
+        self.assertIsNone(claim_job("worker"))
+
+    def test_follow_up_ranges(self):
+        job = ScrapeJob(first_page=1, last_page=5)
+        self.assertEqual(_follow_up_ranges(job, 5, False), [])
+        self.assertEqual(_follow_up_ranges(job, 7, False), [(6, 7)])
+        # without pagination the ranges are chained until an empty page
+        self.assertEqual(_follow_up_ranges(job, None, False), [(6, 10)])
+        self.assertEqual(_follow_up_ranges(job, None, True), [])
+        # only the first range queues the others
+        self.assertEqual(_follow_up_ranges(ScrapeJob(first_page=6, last_page=10), 12, False), [])
+
+
+class ScrapeWithWorkersTests(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch("coreapi.services.scraper.jobs.output_path", lambda name: Path(directory.name) / f"{name}.ndjson")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ingests_the_results_of_the_workers(self):
+        seed_jobs("run")
+        jobs = list(ScrapeJob.objects.order_by("id"))
+        for job, product_id in zip(jobs, ("u1", "u2")):
+            ScrapeJob.objects.filter(id=job.id).update(status=ScrapeJob.DONE, results=[scraped(product_id, website=job.website)])
+        ScrapeJob.objects.filter(id__in=[job.id for job in jobs[2:]]).update(status=ScrapeJob.FAILED, error="blocked")
+        run_stats = {}
+
+        stats = scrape_with_workers(ProductProcessor(), "run", run_stats)
+
+        self.assertEqual(stats["created"], 2)
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual([entry["website"] for entry in run_stats["skipped"]], [job.website for job in jobs[2:]])
+        self.assertFalse(ScrapeJob.objects.filter(status=ScrapeJob.DONE, ingested=False).exists())
+        self.assertEqual(ScrapeJob.objects.filter(ingested=True).values_list("results", flat=True).distinct().get(), [])
+
+
+class ScrapeWorkerTests(TransactionTestCase):
+    def test_each_job_gets_the_time_left_to_its_run(self):
+        seed_jobs("run")
+        late, on_time = ScrapeJob.objects.order_by("id")[:2]
+        ScrapeJob.objects.exclude(id__in=[late.id, on_time.id]).delete()
+        ScrapeJob.objects.filter(id=late.id).update(deadline=timezone.now() - timedelta(seconds=1))
+        ScrapeJob.objects.filter(id=on_time.id).update(deadline=timezone.now() + timedelta(minutes=10))
+        scraped_with = []
+
+        async def scrape_job(job, sessions, parser):
+            scraped_with.append(sessions)
+            return [scraped("u1", website=job.website)], 1, False, True
+
+        with mock.patch("coreapi.services.scraper.jobs.SessionManager", lambda use_cache: session_manager(self)), \
+                mock.patch("coreapi.services.scraper.jobs.ParsePool", mock.MagicMock()), \
+                mock.patch("coreapi.services.scraper.jobs.scrape_job", scrape_job):
+            stats = asyncio.run(run_worker("worker", burst=True))
+
+        self.assertEqual(stats["done"], 1)
+        late.refresh_from_db()
+        self.assertEqual(late.status, ScrapeJob.FAILED)
+        self.assertIn("deadline", late.error)
+        self.assertAlmostEqual(scraped_with[0].deadline.remaining(), 600, delta=5)
+        self.assertEqual(scraped_with[0].skipped, [])
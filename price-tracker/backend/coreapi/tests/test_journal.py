@@ -0,0 +1,75 @@
+import asyncio
+from unittest import mock
+from django.test import SimpleTestCase
+from coreapi.services.scraper.journal import RunJournal
+from coreapi.services.scraper.main import scrape_category_async
+from .test_name_cache import TemporaryDirectoryMixin
+from .test_scrape import SITES, sample_products, serve_sample_pages
+from .test_sessions import session_manager
+
+
+class RunJournalTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def test_resumed_run_reads_the_completed_pages(self):
+        journal = RunJournal("20260101-000000", self.directory)
+        journal.complete_page("ultrapc", "/39-cartes-graphiques", "html", 1, [{"id": "u1"}], 3)
+        journal.close()
+
+        journal = RunJournal.open("20260101-000000", self.directory)
+        self.addCleanup(journal.close)
+        self.assertEqual(journal.page("ultrapc", "/39-cartes-graphiques", "html", 1)["records"], [{"id": "u1"}])
+        self.assertIsNone(journal.page("ultrapc", "/39-cartes-graphiques", "html", 2))
+        # the json listing isn't paginated like the html one
+        self.assertIsNone(journal.page("ultrapc", "/39-cartes-graphiques", "json", 1))
+
+    def test_unknown_run(self):
+        with self.assertRaises(FileNotFoundError):
+            RunJournal.open("20260101-000000", self.directory)
+
+    def test_records_are_handed_out_once(self):
+        journal = RunJournal("20260101-000000", self.directory)
+        self.addCleanup(journal.close)
+        marker = {"page_unchanged": True, "ids": ["u3"]}
+
+        self.assertEqual(journal.new_records([{"id": "u1"}, {"id": "u2"}, marker]), [{"id": "u1"}, {"id": "u2"}, marker])
+        self.assertEqual(journal.new_records([{"id": "u2"}, {"id": "u4"}, marker]), [{"id": "u4"}, marker])
+
+    def test_discarded_once_ingested(self):
+        journal = RunJournal("20260101-000000", self.directory)
+        journal.complete_page("ultrapc", "/39-cartes-graphiques", "html", 1, [], None)
+        journal.discard()
+
+        self.assertFalse((self.directory / "20260101-000000").exists())
+
+    def test_only_the_latest_unfinished_runs_are_kept(self):
+        for run_id in ("20260101-000000", "20260102-000000", "20260103-000000"):
+            (self.directory / run_id).mkdir()
+
+        RunJournal.prune(2, self.directory)
+
+        self.assertEqual(sorted(path.name for path in self.directory.iterdir()), ["20260102-000000", "20260103-000000"])
+
+
+class ResumedScrapeTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def test_completed_pages_are_not_fetched_again(self):
+        base_url, site_info = SITES["ultrapc"]
+        category = site_info["categories"][0]
+        journal = RunJournal("20260101-000000", self.directory)
+        self.addCleanup(journal.close)
+        journal.complete_page("ultrapc", category["url"], "html", 1, sample_products("ultrapc", 1), 2)
+        sessions = session_manager(self, journal=journal)
+        fetched = []
+        fetch = serve_sample_pages(fetched)
+
+        async def get_content_from_page(*args, **kwargs):
+            return fetch(*args, **kwargs)
+
+        async def run():
+            async with sessions:
+                return await scrape_category_async(base_url, category, "ultrapc", sessions)
+
+        with mock.patch("coreapi.services.scraper.main.get_content_from_page", side_effect=get_content_from_page):
+            products = asyncio.run(run())
+
+        self.assertEqual(fetched, [2])
+        self.assertEqual(products, sample_products("ultrapc", 1) + sample_products("ultrapc", 2))
+        self.assertEqual(journal.page("ultrapc", category["url"], "html", 2)["records"], sample_products("ultrapc", 2))
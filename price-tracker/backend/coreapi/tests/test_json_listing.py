@@ -0,0 +1,59 @@
+import json
+from unittest import mock
+from django.test import SimpleTestCase
+from coreapi.constants import SCRAPING_URLS
+from coreapi.services.scraper.json_listing import json_listing_url, parse_json_listing, uses_json_listing
+from .test_scrape import SITES
+
+
+class JsonListingTests(SimpleTestCase):
+    def test_opt_in_per_site(self):
+        base_url, site_info = SITES["ultrapc"]
+        scraper = site_info["scraper"]
+
+        with mock.patch.dict(SCRAPING_URLS, {base_url: {**site_info, "listing_mode": "json"}}):
+            self.assertTrue(uses_json_listing(base_url, scraper))
+        with mock.patch.dict(SCRAPING_URLS, {base_url: {key: value for key, value in site_info.items() if key != "listing_mode"}}):
+            self.assertFalse(uses_json_listing(base_url, scraper))
+
+    def test_urls(self):
+        self.assertEqual(
+            json_listing_url("https://techspace.ma", "techspace", "/collections/carte-graphique", 2),
+            "https://techspace.ma/collections/carte-graphique/products.json?limit=250&page=2",
+        )
+        self.assertEqual(
+            json_listing_url("https://www.ultrapc.ma", "ultrapc", "/39-cartes-graphiques", 2),
+            "https://www.ultrapc.ma/39-cartes-graphiques?page=2&from-xhr",
+        )
+
+    def test_shopify_payload(self):
+        payload = {"products": [
+            {"handle": "rtx-4070", "title": "MSI GeForce RTX 4070", "images": [{"src": "https://cdn/4070.jpg"}],
+             "variants": [{"available": True, "price": "7200.00"}, {"available": True, "price": "6900.00"}]},
+            {"handle": "rtx-4080", "title": "MSI GeForce RTX 4080", "variants": [{"available": False, "price": "12000.00"}]},
+        ]}
+
+        listing = parse_json_listing(json.dumps(payload), "techspace", "https://techspace.ma", "/collections/carte-graphique", "gpu")
+
+        self.assertIsNone(listing["page_count"])
+        [product] = listing["products"]
+        self.assertEqual(product["url"], "https://techspace.ma/collections/carte-graphique/products/rtx-4070")
+        self.assertEqual((product["name"], product["price"], product["image_url"]), ("msi geforce rtx 4070", 6900.0, "https://cdn/4070.jpg"))
+
+    def test_prestashop_payload(self):
+        payload = {"pagination": {"pages_count": 4}, "products": [
+            {"url": "https://www.ultrapc.ma/p1.html", "name": "MSI RTX 4070", "price_amount": 7200, "availability_message": "En stock",
+             "description_short": "<p>12 Go&nbsp;GDDR6X</p>", "cover": {"bySize": {"home_default": {"url": "https://www.ultrapc.ma/p1.jpg"}}}},
+            {"url": "https://www.ultrapc.ma/p2.html", "name": "MSI RTX 4080", "price_amount": 12000, "availability_message": "Rupture de stock"},
+        ]}
+
+        listing = parse_json_listing(json.dumps(payload), "ultrapc", "https://www.ultrapc.ma", "/39-cartes-graphiques", "gpu")
+
+        self.assertEqual(listing["page_count"], 4)
+        [product] = listing["products"]
+        self.assertEqual((product["price"], product["short_description"]), (7200.0, "12 go gddr6x"))
+
+    def test_blocked_pages_are_not_listings(self):
+        for body in ("<html>just a moment...</html>", json.dumps({"error": "forbidden"})):
+            with self.subTest(body=body), self.assertRaises(ValueError):
+                parse_json_listing(body, "ultrapc", "https://www.ultrapc.ma", "/39-cartes-graphiques", "gpu")
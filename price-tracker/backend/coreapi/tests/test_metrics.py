@@ -0,0 +1,50 @@
+import json
+from django.test import SimpleTestCase
+from coreapi.services.scraper.metrics import Histogram, MetricsCollector
+from .test_name_cache import TemporaryDirectoryMixin
+
+
+class HistogramTests(SimpleTestCase):
+    def test_buckets_and_quantiles(self):
+        histogram = Histogram([0.1, 1, 5])
+        for value in (0.05, 0.5, 0.5, 2, 10):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.cumulative(), [(0.1, 1), (1, 3), (5, 4), (float("inf"), 5)])
+        self.assertEqual((histogram.quantile(0.5), histogram.quantile(0.95)), (1, float("inf")))
+        self.assertIsNone(Histogram([1]).quantile(0.5))
+
+
+class MetricsCollectorTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def collector(self):
+        metrics = MetricsCollector()
+        metrics.request("www.ultrapc.ma", 0.2, 200, "é" * 10)
+        metrics.request("www.ultrapc.ma", 1.5, 429)
+        metrics.retry("www.ultrapc.ma")
+        metrics.wait("www.ultrapc.ma", "rate_limit", 0.25)
+        metrics.wait("www.ultrapc.ma", "slot", 0)
+        metrics.stage("parse", "ultrapc", 0.01)
+        metrics.page("ultrapc", 24)
+        return metrics
+
+    def test_report(self):
+        report = self.collector().report()
+
+        host = report["hosts"]["www.ultrapc.ma"]
+        self.assertEqual((host["bytes"], host["statuses"], host["retries"]), (20, {"200": 1, "429": 1}, 1))
+        self.assertEqual((host["rate_limit_wait"], host["slot_wait"]), (0.25, 0))
+        self.assertEqual(host["latency"]["count"], 2)
+        self.assertEqual(report["stages"]["parse"]["ultrapc"]["count"], 1)
+        self.assertEqual(report["products_per_page"]["ultrapc"]["sum"], 24)
+
+    def test_written_reports(self):
+        metrics = self.collector()
+        metrics.write_json(self.directory / "metrics.json")
+        metrics.write_prometheus(self.directory / "metrics.prom")
+
+        with open(self.directory / "metrics.json", encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["hosts"]["www.ultrapc.ma"]["retries"], 1)
+        prometheus = (self.directory / "metrics.prom").read_text(encoding="utf-8")
+        self.assertIn('scraper_responses_total{host="www.ultrapc.ma",status="429"} 1', prometheus)
+        self.assertIn('scraper_request_duration_seconds_count{host="www.ultrapc.ma"} 2', prometheus)
+        self.assertIn('scraper_wait_seconds_total{host="www.ultrapc.ma",kind="rate_limit"} 0.25', prometheus)
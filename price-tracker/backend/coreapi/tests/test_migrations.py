@@ -0,0 +1,83 @@
+from decimal import Decimal
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from coreapi.models import Product, ProductGroup, Website
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrates the database back to `migrate_from` for the test to seed it with the models of that state"""
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_from])
+        self.old_apps = executor.loader.project_state([self.migrate_from]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self):
+        MigrationExecutor(connection).migrate([self.migrate_to])
+
+
+class MergeDuplicateGroupsTests(MigrationTestCase):
+    migrate_from = ("coreapi", "0008_product_last_seen_run")
+    migrate_to = ("coreapi", "0010_productgroup_unique_per_category")
+
+    def test_duplicates_are_merged_into_the_oldest_group(self):
+        Website = self.old_apps.get_model("coreapi", "Website")
+        OldGroup = self.old_apps.get_model("coreapi", "ProductGroup")
+        OldProduct = self.old_apps.get_model("coreapi", "Product")
+        website = Website.objects.create(name="ultrapc")
+
+        def group(price, image=None, category="gpu"):
+            return OldGroup.objects.create(
+                canonical_name="RTX 4070 12 GB - palit", category=category, brand="NVIDIA",
+                starting_price=Decimal(price), representative_image_url=image,
+            )
+
+        keeper = group("7200.00")
+        duplicates = [group("6900.00", "https://shop.ma/4070.jpg"), group("7000.00", "https://shop.ma/other.jpg")]
+        other_category = group("100.00", category="cpu")
+        for i, owner in enumerate([keeper, *duplicates, other_category]):
+            OldProduct.objects.create(
+                id=f"p{i}", name="palit geforce rtx 4070 dual 12g", url=f"https://shop.ma/p{i}", image_url="",
+                price=owner.starting_price, category=owner.category, website=website, canonical_group=owner,
+            )
+
+        self.migrate()
+
+        self.assertEqual(sorted(ProductGroup.objects.values_list("id", flat=True)), [keeper.id, other_category.id])
+        merged = ProductGroup.objects.get(id=keeper.id)
+        self.assertEqual(merged.starting_price, Decimal("6900.00"))
+        self.assertEqual(merged.representative_image_url, "https://shop.ma/4070.jpg")
+        self.assertEqual(Product.objects.filter(canonical_group=merged).count(), 3)
+        self.assertEqual(Product.objects.get(id="p3").canonical_group_id, other_category.id)
+
+        with self.assertRaises(IntegrityError):
+            ProductGroup.objects.create(canonical_name="RTX 4070 12 GB - palit", category="gpu", brand="NVIDIA", starting_price=1)
+
+
+class MergeDuplicateWebsitesTests(MigrationTestCase):
+    migrate_from = ("coreapi", "0010_productgroup_unique_per_category")
+    migrate_to = ("coreapi", "0012_website_unique_name")
+
+    def test_duplicates_are_merged_into_the_oldest_website(self):
+        OldWebsite = self.old_apps.get_model("coreapi", "Website")
+        OldProduct = self.old_apps.get_model("coreapi", "Product")
+        keeper, duplicate, other = (OldWebsite.objects.create(name=name) for name in ("ultrapc", "ultrapc", "techspace"))
+        for i, website in enumerate([keeper, duplicate, other]):
+            OldProduct.objects.create(
+                id=f"p{i}", name="palit geforce rtx 4070 dual 12g", url=f"https://shop.ma/p{i}", image_url="",
+                price=Decimal("7000.00"), category="gpu", website=website,
+            )
+
+        self.migrate()
+
+        self.assertEqual(sorted(Website.objects.values_list("id", flat=True)), [keeper.id, other.id])
+        self.assertEqual(list(Product.objects.order_by("id").values_list("website_id", flat=True)), [keeper.id, keeper.id, other.id])
+        with self.assertRaises(IntegrityError):
+            Website.objects.create(name="ultrapc")
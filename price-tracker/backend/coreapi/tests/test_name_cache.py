@@ -0,0 +1,70 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import mock
+from django.test import SimpleTestCase
+from coreapi.services.scraper.name_cache import ProductNameCache
+from coreapi.services.scraper.scapers import resolve_product_names, resolve_product_names_sync
+from .test_sessions import session_manager
+
+
+class TemporaryDirectoryMixin:
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+
+class ProductNameCacheTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def test_saved_names_are_read_back(self):
+        names = ProductNameCache(self.directory / "names.json")
+        names.set("https://shop.ma/p1", "msi geforce rtx 4070 super 12g ventus 2x oc")
+        names.save()
+
+        self.assertEqual(ProductNameCache(self.directory / "names.json").get("https://shop.ma/p1"), "msi geforce rtx 4070 super 12g ventus 2x oc")
+        self.assertIsNone(ProductNameCache(self.directory / "names.json").get("https://shop.ma/p2"))
+
+    def test_nothing_written_without_new_names(self):
+        ProductNameCache(self.directory / "names.json").save()
+
+        self.assertFalse((self.directory / "names.json").exists())
+
+
+def product_page(name):
+    return f'<div class="product-block-info"><h1 class="product-title">{name}</h1></div>'
+
+
+class ResolveProductNamesTests(SimpleTestCase):
+    def setUp(self):
+        self.sessions = session_manager(self)
+        self.addCleanup(self.sessions.cloudscraper.close)
+        self.products = [
+            {"name": "msi geforce rtx 4070 super 12g...", "url": "https://www.ultrapc.ma/p1", "website": "ultrapc"},
+            {"name": "msi geforce rtx 4070 super 12g...", "url": "https://www.ultrapc.ma/p1", "website": "ultrapc"},
+            {"name": "palit rtx 4060 dual", "url": "https://www.ultrapc.ma/p2", "website": "ultrapc"},
+            {"name": "asus rtx 4080...", "url": "https://www.ultrapc.ma/p3", "website": "ultrapc"},
+        ]
+
+    def test_truncated_names_fetched_once(self):
+        pages = {"https://www.ultrapc.ma/p1": product_page("MSI GeForce RTX 4070 SUPER 12G VENTUS 2X OC"), "https://www.ultrapc.ma/p3": "<html></html>"}
+
+        async def get_content_from_page(page_url, scraper, sessions=None):
+            return pages[page_url]
+
+        with mock.patch("coreapi.services.scraper.scapers.get_content_from_page", side_effect=get_content_from_page) as get:
+            products = asyncio.run(resolve_product_names(self.products, "ultrapc", self.sessions))
+
+        self.assertEqual(get.call_count, 2)
+        # the product whose full name can't be found is dropped
+        self.assertEqual([product["name"] for product in products], ["msi geforce rtx 4070 super 12g ventus 2x oc"] * 2 + ["palit rtx 4060 dual"])
+        self.assertEqual(self.sessions.names.get("https://www.ultrapc.ma/p1"), "msi geforce rtx 4070 super 12g ventus 2x oc")
+
+    def test_cached_names_are_not_fetched(self):
+        self.sessions.names.set("https://www.ultrapc.ma/p1", "msi geforce rtx 4070 super 12g ventus 2x oc")
+        self.sessions.names.set("https://www.ultrapc.ma/p3", "asus rtx 4080 super")
+
+        with mock.patch("coreapi.services.scraper.scapers.get_content_from_page_sync") as get:
+            products = resolve_product_names_sync(self.products, "ultrapc", self.sessions)
+
+        get.assert_not_called()
+        self.assertEqual([product["name"] for product in products][-1], "asus rtx 4080 super")
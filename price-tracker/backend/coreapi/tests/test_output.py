@@ -0,0 +1,71 @@
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from django.test import SimpleTestCase
+from coreapi.services.scraper.output import NDJSONWriter, iter_batches, iter_records
+from coreapi.services.scraper.fingerprints import unchanged_page_marker
+
+
+RECORDS = [
+    {"id": "u1", "name": "carte graphique msi geforce rtx 4070 super", "price": 7200.0, "availability": True},
+    {"id": "u2", "name": "écran 27\" — 165 hz", "price": None, "availability": False},
+    unchanged_page_marker("ultrapc", "gpu", ["u3", "u4"]),
+]
+
+
+class OutputTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return Path(self.directory.name) / name
+
+    def test_round_trip(self):
+        for name in ("products.ndjson", "products.ndjson.gz"):
+            with self.subTest(name=name):
+                with NDJSONWriter(self.path(name)) as writer:
+                    writer.write_page(RECORDS[:2])
+                    writer.write_page(RECORDS[2:])
+
+                self.assertEqual(writer.records, 3)
+                self.assertEqual(list(iter_records(self.path(name))), RECORDS)
+
+    def test_gzip_output_is_compressed(self):
+        with NDJSONWriter(self.path("products.ndjson.gz")) as writer:
+            writer.write_page(RECORDS)
+
+        with gzip.open(self.path("products.ndjson.gz"), "rt", encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+    def test_append_keeps_the_records_already_written(self):
+        with NDJSONWriter(self.path("products.ndjson")) as writer:
+            writer.write_page(RECORDS[:1])
+        with NDJSONWriter(self.path("products.ndjson"), append=True) as writer:
+            writer.write_page(RECORDS[1:])
+
+        self.assertEqual(list(iter_records(self.path("products.ndjson"))), RECORDS)
+
+    def test_cut_short_last_line_is_skipped(self):
+        path = self.path("products.ndjson")
+        with NDJSONWriter(path) as writer:
+            writer.write_page(RECORDS[:2])
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"id": "u3", "na')
+
+        with self.assertLogs("backend.services", "WARNING"):
+            self.assertEqual(list(iter_records(path)), RECORDS[:2])
+
+    def test_legacy_json_array(self):
+        path = self.path("products.json")
+        path.write_text(json.dumps(RECORDS, indent=4, ensure_ascii=False), encoding="utf-8")
+
+        self.assertEqual(list(iter_records(path)), RECORDS)
+
+    def test_batches(self):
+        path = self.path("products.ndjson")
+        with NDJSONWriter(path) as writer:
+            writer.write_page(RECORDS)
+
+        self.assertEqual([len(batch) for batch in iter_batches(path, 2)], [2, 1])
@@ -0,0 +1,71 @@
+import asyncio
+from unittest import mock
+from django.test import SimpleTestCase
+from coreapi.constants import SCRAPING_PARSER
+from coreapi.services.scraper.parsing import ParsePool, parse_listing
+from coreapi.services.scraper.scapers import get_parser_backend, make_soup
+from coreapi.services.scraper.sites import Field, get_site, largest_srcset_image
+from .test_scrape import SITES, sample_page
+
+
+class ParsePoolTests(SimpleTestCase):
+    def test_workers_parse_like_the_event_loop(self):
+        pages = [(scraper, sample_page(scraper, page)) for scraper in SITES for page in (1, 2)]
+
+        async def parse_all(parser):
+            return await asyncio.gather(*[parser.listing(html, scraper, SITES[scraper][0], "gpu") for scraper, html in pages])
+
+        with ParsePool(workers=2) as parser:
+            parsed = asyncio.run(parse_all(parser))
+
+        self.assertEqual(parsed, [parse_listing(html, scraper, SITES[scraper][0], "gpu") for scraper, html in pages])
+
+
+class ParserBackendTests(SimpleTestCase):
+    def test_first_installed_backend(self):
+        # read once per process
+        get_parser_backend.cache_clear()
+        self.addCleanup(get_parser_backend.cache_clear)
+        with mock.patch.dict(SCRAPING_PARSER, {"backends": ["not-installed", "html.parser"]}):
+            self.assertEqual(get_parser_backend(), "html.parser")
+        get_parser_backend.cache_clear()
+        with mock.patch.dict(SCRAPING_PARSER, {"backends": ["not-installed"]}):
+            self.assertEqual(get_parser_backend(), "html.parser")
+
+    def test_backends_and_parse_only_give_the_same_products(self):
+        for scraper, (base_url, _) in SITES.items():
+            page = sample_page(scraper, 2)
+            expected = parse_listing(page, scraper, base_url, "gpu", backend="html.parser", parse_only=False)
+            for backend in ("lxml", "html.parser"):
+                with self.subTest(scraper=scraper, backend=backend):
+                    self.assertEqual(parse_listing(page, scraper, base_url, "gpu", backend=backend, parse_only=True), expected)
+
+
+class SiteSpecTests(SimpleTestCase):
+    def test_every_scraper_has_a_spec(self):
+        for scraper in SITES:
+            self.assertEqual(get_site(scraper).name, scraper)
+        with self.assertRaises(KeyError):
+            get_site("unknown")
+
+    def test_sample_pages(self):
+        for scraper, (base_url, _) in SITES.items():
+            with self.subTest(scraper=scraper):
+                listing = parse_listing(sample_page(scraper, 1), scraper, base_url, "gpu")
+
+                self.assertEqual(listing["page_count"], 2)
+                self.assertTrue(listing["products"])
+                for product in listing["products"]:
+                    self.assertTrue(product["url"].startswith(base_url))
+                    self.assertGreater(product["price"], 1000)
+                    self.assertTrue(product["availability"])
+                    self.assertEqual((product["website"], product["category"]), (scraper, "gpu"))
+
+    def test_fields(self):
+        item = make_soup('<div><a class="name" href="/p1" data-src="/p1.jpg">  MSI RTX 4070 </a><li>12 Go</li><li>GDDR6X</li></div>', parse_only=False)
+
+        self.assertEqual(Field("a.name").extract(item), "msi rtx 4070")
+        self.assertEqual(Field("a.name", attr=("src", "data-src")).extract(item), "/p1.jpg")
+        self.assertEqual(Field("li", many=True).extract(item), "12 go | gddr6x")
+        self.assertIsNone(Field("span.price").extract(item))
+        self.assertEqual(largest_srcset_image("//cdn/p_{width}x.jpg 200w, //cdn/p_{width}x.jpg 400w"), "https://cdn/p_800x.jpg")
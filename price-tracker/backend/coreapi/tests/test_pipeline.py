@@ -0,0 +1,66 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import mock
+from django.test import SimpleTestCase
+from coreapi.constants import SCRAPING_PIPELINE
+from coreapi.services.scraper.pipeline import scrape_and_ingest
+
+
+class RecordingProcessor:
+    """Stands in for ProductProcessor, keeps the batches it's given"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.finished = None
+        self.fail = fail
+
+    def begin_run(self):
+        return {"total": 0}
+
+    def ingest_batch(self, products, stats):
+        if self.fail:
+            raise ValueError("database down")
+        self.batches.append([product["id"] for product in products])
+        stats["total"] += len(products)
+
+    def finish_run(self, stats, skipped):
+        self.finished = skipped
+
+
+class ScrapeAndIngestTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for patcher in (
+            mock.patch("coreapi.services.scraper.pipeline.output_path", lambda name: Path(directory.name) / f"{name}.ndjson"),
+            mock.patch.dict(SCRAPING_PIPELINE, {"batch_size": 3}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_pipeline(self, processor, pages):
+        async def stream_websites_async(emit, run_stats, *args):
+            for page in pages:
+                await emit([{"id": product_id} for product_id in page])
+            run_stats["skipped"] = [{"website": "ultrapc", "category": "gpu"}]
+
+        with mock.patch("coreapi.services.scraper.pipeline.stream_websites_async", side_effect=stream_websites_async):
+            return asyncio.run(scrape_and_ingest(processor))
+
+    def test_pages_ingested_in_batches(self):
+        processor = RecordingProcessor()
+
+        stats = self.run_pipeline(processor, [["u1", "u2"], ["u3", "u4"], ["u5"]])
+
+        self.assertEqual(processor.batches, [["u1", "u2", "u3", "u4"], ["u5"]])
+        self.assertEqual(stats["total"], 5)
+        self.assertEqual(processor.finished, [{"website": "ultrapc", "category": "gpu"}])
+
+    def test_failed_ingestion_doesnt_finish_the_run(self):
+        processor = RecordingProcessor(fail=True)
+
+        with self.assertRaises(ValueError):
+            self.run_pipeline(processor, [["u1", "u2", "u3"], ["u4"]] * 10)
+
+        self.assertIsNone(processor.finished)
@@ -0,0 +1,110 @@
+import asyncio
+from unittest import mock
+from django.test import SimpleTestCase
+from coreapi.services.scraper.rate_limit import HostRateLimiter, TokenBucket
+from coreapi.services.scraper.utils import get_page_with_retry, parse_retry_after
+from .test_sessions import session_manager
+
+
+class Clock:
+    """Stands in for the time module of a scraper module, sleeping only moves the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def frozen(module):
+    clock = Clock()
+    patcher = mock.patch(f"coreapi.services.scraper.{module}.time", clock)
+    return patcher, clock
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        patcher, self.clock = frozen("rate_limit")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2, burst=2)
+
+        self.assertEqual([bucket.acquire() for _ in range(2)], [0.0, 0.0])
+        self.assertAlmostEqual(bucket.acquire(), 0.5)
+        self.assertAlmostEqual(bucket.acquire(), 0.5)
+
+    def test_waiting_callers_are_served_in_order(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.acquire()
+
+        # nobody slept yet, each reservation waits behind the previous one
+        self.assertEqual([bucket._reserve() for _ in range(3)], [1.0, 2.0, 3.0])
+
+    def test_refills_up_to_the_burst(self):
+        bucket = TokenBucket(rate=1, burst=2)
+        bucket.acquire()
+        bucket.acquire()
+        self.clock.now += 60
+
+        self.assertEqual([bucket.acquire() for _ in range(2)], [0.0, 0.0])
+        self.assertAlmostEqual(bucket.acquire(), 1.0)
+
+    def test_async_acquire(self):
+        bucket = TokenBucket(rate=1_000, burst=1)
+
+        async def take():
+            return [await bucket.acquire_async() for _ in range(2)]
+
+        with mock.patch("coreapi.services.scraper.rate_limit.asyncio.sleep", mock.AsyncMock()) as sleep:
+            waits = asyncio.run(take())
+        self.assertEqual(waits[0], 0.0)
+        sleep.assert_awaited_once_with(waits[1])
+
+    def test_hosts_have_their_own_budget(self):
+        limiter = HostRateLimiter({"slow.ma": {"requests_per_second": 0.5, "burst": 1}})
+
+        self.assertEqual(limiter.wait("slow.ma"), 0.0)
+        self.assertAlmostEqual(limiter.wait("slow.ma"), 2.0)
+        self.assertEqual(limiter.wait("other.ma"), 0.0)
+        self.assertIs(limiter.bucket("slow.ma"), limiter.bucket("slow.ma"))
+
+
+class RetryTests(SimpleTestCase):
+    def response(self, status, text="", headers=None):
+        return mock.Mock(status_code=status, text=text, headers=headers or {})
+
+    def sessions(self):
+        sessions = session_manager(self)
+        sessions.rate_limiter = HostRateLimiter({"shop.ma": {"requests_per_second": 1_000, "burst": 1_000}})
+        self.addCleanup(sessions.cloudscraper.close)
+        return sessions
+
+    def test_parse_retry_after(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertEqual(parse_retry_after("12"), 12)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+
+    def test_429_without_retry_after_backs_off_before_the_retry(self):
+        responses = [self.response(429), self.response(200, "<html></html>")]
+        with mock.patch("coreapi.services.scraper.utils.requests.get", side_effect=responses), mock.patch("time.sleep") as sleep:
+            body = get_page_with_retry("https://shop.ma/gpu", {}, sessions=self.sessions())
+
+        self.assertEqual(body, "<html></html>")
+        self.assertEqual(sleep.call_count, 1)
+        self.assertAlmostEqual(sleep.call_args.args[0], 60, delta=1)
+
+    def test_429_without_sessions_sleeps(self):
+        responses = [self.response(429, headers={"Retry-After": "5"}), self.response(200, "ok")]
+        with mock.patch("coreapi.services.scraper.utils.requests.get", side_effect=responses), mock.patch("time.sleep") as sleep:
+            body = get_page_with_retry("https://shop.ma/gpu", {})
+
+        self.assertEqual(body, "ok")
+        sleep.assert_called_once_with(5)
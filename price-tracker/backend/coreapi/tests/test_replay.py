@@ -0,0 +1,48 @@
+import asyncio
+from django.test import SimpleTestCase
+from coreapi.management.commands.benchmark_scraper import is_listing_page
+from coreapi.services.scraper.main import scrape_category_async
+from coreapi.services.scraper.replay import ReplayServer, TrafficRecorder, traffic_key
+from .test_name_cache import TemporaryDirectoryMixin
+from .test_scrape import SITES, sample_page, sample_products
+from .test_sessions import session_manager
+
+
+class ReplayTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def test_traffic_key(self):
+        self.assertEqual(traffic_key("https://WWW.UltraPC.ma/39-cartes-graphiques?page=2"), "www.ultrapc.ma/39-cartes-graphiques?page=2")
+        self.assertEqual(traffic_key("https://techspace.ma"), "techspace.ma/")
+
+    def test_replayed_run_scrapes_the_recorded_pages(self):
+        base_url, site_info = SITES["ultrapc"]
+        category = site_info["categories"][0]
+        recorder = TrafficRecorder(self.directory / "recording")
+        for page in (1, 2, 1):
+            recorder.record(f"{base_url}{category['url']}?page={page}", sample_page("ultrapc", page))
+        recorder.close()
+        self.assertEqual(recorder.pages, 2)
+
+        server = ReplayServer(self.directory / "recording")
+        sessions = session_manager(self, replay=server.start())
+        self.addCleanup(server.stop)
+
+        async def run():
+            async with sessions:
+                return await scrape_category_async(base_url, category, "ultrapc", sessions)
+
+        products = asyncio.run(run())
+
+        self.assertEqual(products, sample_products("ultrapc", 1) + sample_products("ultrapc", 2))
+        self.assertEqual((server.stats["served"], server.stats["missing"]), (2, 0))
+
+
+class ListingPageTests(SimpleTestCase):
+    def test_only_the_listing_urls_of_the_category(self):
+        category = "techspace.ma/collections/carte-graphique"
+
+        for key in (category, f"{category}?page=2", f"{category}/products.json?limit=250&page=1"):
+            with self.subTest(key=key):
+                self.assertTrue(is_listing_page(key, category))
+        for key in (f"{category}/products/rtx-4070", f"{category}/products/rtx-4070?variant=1", f"{category}-amd", "techspace.ma/collections/cpu"):
+            with self.subTest(key=key):
+                self.assertFalse(is_listing_page(key, category))
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from coreapi.constants import SCRAPING_SCHEDULE, SCRAPING_URLS
+from coreapi.models import ScrapeSchedule
+from coreapi.services.product_grouping.processor import ProductProcessor
+from coreapi.services.scraper.fingerprints import PageFingerprints
+from coreapi.services.scraper.scheduler import ScrapeScheduler, next_interval, sync_schedules
+from .test_name_cache import TemporaryDirectoryMixin
+from .test_sessions import session_manager
+
+
+class ScheduleTests(TestCase):
+    def test_next_interval(self):
+        hour = 3600
+        self.assertEqual(next_interval(6 * hour, 0.5), 3 * hour)
+        self.assertEqual(next_interval(6 * hour, 0.0), 9 * hour)
+        self.assertEqual(next_interval(6 * hour, 0.1), 6 * hour)
+        # kept within the bounds
+        self.assertEqual(next_interval(SCRAPING_SCHEDULE["min_interval"], 1.0), SCRAPING_SCHEDULE["min_interval"])
+        self.assertEqual(next_interval(SCRAPING_SCHEDULE["max_interval"], 0.0), SCRAPING_SCHEDULE["max_interval"])
+
+    def test_every_category_is_scheduled_once(self):
+        categories = {(site_info["scraper"], category["type"]) for site_info in SCRAPING_URLS.values() for category in site_info["categories"]}
+
+        self.assertEqual(sync_schedules(), len(categories))
+        self.assertEqual(sync_schedules(), 0)
+        self.assertEqual(set(ScrapeSchedule.objects.values_list("website", "category")), categories)
+
+    def test_reschedule(self):
+        scheduler = ScrapeScheduler(ProductProcessor())
+        self.addCleanup(scheduler._database.shutdown)
+        schedule = ScrapeSchedule.objects.create(website="ultrapc", category="gpu", interval=6 * 3600, next_due=timezone.now())
+
+        # a first run says nothing about the change rate
+        scheduler._reschedule(schedule, 1.0)
+        self.assertEqual((schedule.runs, schedule.change_rate, schedule.interval), (1, None, 6 * 3600))
+
+        scheduler._reschedule(schedule, 1.0)
+        self.assertEqual((schedule.change_rate, schedule.interval), (1.0, 3 * 3600))
+        scheduler._reschedule(schedule, 0.0)
+        self.assertEqual(schedule.change_rate, 0.5)
+
+        # failed runs are retried after the minimum interval
+        scheduler._reschedule(schedule, None, "blocked")
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.last_error, "blocked")
+        self.assertAlmostEqual((schedule.next_due - schedule.last_run_at).total_seconds(), SCRAPING_SCHEDULE["min_interval"], delta=1)
+
+
+class ScheduledRunTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def test_each_run_has_its_own_deadline_and_skips(self):
+        scheduler = ScrapeScheduler(mock.MagicMock(), fingerprints=PageFingerprints(self.directory / "page_fingerprints.json"))
+        self.addCleanup(scheduler._database.shutdown)
+        scheduler._sessions = session_manager(self)
+        self.addCleanup(scheduler._sessions.cloudscraper.close)
+        # the daemon has been up for longer than a run may last
+        scheduler._sessions.deadline.expires_at = time.monotonic() - 1
+        schedule = ScrapeSchedule(id=1, website="ultrapc", category="gpu")
+
+        async def scrape(base_url, category, scraper, sessions, parser, emit):
+            sessions.before_request(base_url + category["url"])
+            sessions.skip(scraper, category, "blocked")
+
+        with mock.patch("coreapi.services.scraper.scheduler.scrape_category_async", scrape), mock.patch.object(scheduler, "_reschedule") as reschedule:
+            asyncio.run(scheduler._run_category(schedule))
+            asyncio.run(scheduler._run_category(schedule))
+
+        first, second = [call.args[2] for call in reschedule.call_args_list]
+        self.assertIn("blocked", first)
+        self.assertEqual(first, second)
+        self.assertEqual(scheduler._sessions.skipped, [])
@@ -0,0 +1,112 @@
+import asyncio
+from unittest import mock
+from django.test import SimpleTestCase
+from coreapi.constants import SCRAPING_URLS
+from coreapi.management.commands.benchmark_parsers import DEFAULT_PAGES
+from coreapi.services.scraper.main import scrape_category, scrape_category_async
+from coreapi.services.scraper.parsing import parse_listing
+
+SITES = {site_info["scraper"]: (base_url, site_info) for base_url, site_info in SCRAPING_URLS.items()}
+
+
+def sample_page(scraper, page):
+    """Synthetic listing page of the benchmark_parsers pages, an empty listing past the last one"""
+    path = DEFAULT_PAGES / scraper / f"page-{page}.html"
+    return path.read_text(encoding="utf-8") if path.exists() else "<html></html>"
+
+
+def serve_sample_pages(fetched):
+    """Fetch function serving the sample pages of the `?page=` of the url, noting the pages asked for"""
+    def fetch(page_url, scraper, sessions=None, headers=None):
+        page = int(page_url.rsplit("=", 1)[1])
+        fetched.append(page)
+        return sample_page(scraper, page)
+    return fetch
+
+
+def sample_products(scraper, page):
+    base_url, site_info = SITES[scraper]
+    return parse_listing(sample_page(scraper, page), scraper, base_url, site_info["categories"][0]["type"])["products"]
+
+
+class ScrapeCategoryAsyncTests(SimpleTestCase):
+    def scrape(self, scraper, **kwargs):
+        base_url, site_info = SITES[scraper]
+        self.fetched = []
+        fetch = serve_sample_pages(self.fetched)
+
+        async def get_content_from_page(*args, **kwargs):
+            return fetch(*args, **kwargs)
+
+        with mock.patch("coreapi.services.scraper.main.get_content_from_page", side_effect=get_content_from_page):
+            return asyncio.run(scrape_category_async(base_url, site_info["categories"][0], scraper, **kwargs))
+
+    def test_page_count_read_from_the_first_page(self):
+        products = self.scrape("ultrapc")
+
+        # the pagination says 2 pages, the empty third one isn't requested
+        self.assertEqual(self.fetched, [1, 2])
+        self.assertEqual(products, sample_products("ultrapc", 1) + sample_products("ultrapc", 2))
+
+    def test_pages_walked_until_an_empty_one_without_pagination(self):
+        with mock.patch("coreapi.services.scraper.parsing.extract_page_count", return_value=None):
+            products = self.scrape("ultrapc")
+
+        self.assertEqual(self.fetched, [1, 2, 3])
+        self.assertEqual(products, sample_products("ultrapc", 1) + sample_products("ultrapc", 2))
+
+    def test_pages_emitted_as_they_are_scraped(self):
+        pages = []
+
+        async def emit(page_products):
+            pages.append(page_products)
+
+        self.assertEqual(self.scrape("ultrapc", emit=emit), [])
+        self.assertEqual(pages, [sample_products("ultrapc", 1), sample_products("ultrapc", 2)])
+
+    def test_fallback_waits_for_the_pages_in_flight_and_skips_the_emitted_ones(self):
+        base_url, site_info = SITES["ultrapc"]
+        events = []
+        pages = []
+
+        async def get_content_from_page(page_url, scraper, sessions=None, headers=None):
+            page = int(page_url.rsplit("=", 1)[1])
+            if page == 2:
+                raise Exception("Connection reset")
+            if page == 3:
+                try:
+                    await asyncio.Event().wait()
+                except asyncio.CancelledError:
+                    events.append("page 3 cancelled")
+                    raise
+            return sample_page(scraper, page)
+
+        def get_content_from_page_sync(page_url, scraper, sessions=None, headers=None):
+            events.append(f"sync page {page_url.rsplit('=', 1)[1]}")
+            return serve_sample_pages([])(page_url, scraper, sessions, headers)
+
+        async def emit(page_products):
+            pages.append(page_products)
+
+        with mock.patch("coreapi.services.scraper.parsing.extract_page_count", return_value=3), \
+                mock.patch("coreapi.services.scraper.main.get_content_from_page", side_effect=get_content_from_page), \
+                mock.patch("coreapi.services.scraper.main.get_content_from_page_sync", side_effect=get_content_from_page_sync):
+            asyncio.run(scrape_category_async(base_url, site_info["categories"][0], "ultrapc", emit=emit))
+
+        # page 1 was already emitted, the fallback only scrapes the others once page 3 is stopped
+        self.assertEqual(events, ["page 3 cancelled", "sync page 2", "sync page 3"])
+        self.assertEqual(pages, [sample_products("ultrapc", 1), sample_products("ultrapc", 2)])
+
+
+class ScrapeCategoryTests(SimpleTestCase):
+    def test_pages_emitted_as_they_are_scraped(self):
+        base_url, site_info = SITES["ultrapc"]
+        fetched = []
+        pages = []
+
+        with mock.patch("coreapi.services.scraper.main.get_content_from_page_sync", side_effect=serve_sample_pages(fetched)):
+            products = scrape_category(base_url, site_info["categories"][:1], "ultrapc", emit=pages.append)
+
+        self.assertEqual(fetched, [1, 2])
+        self.assertEqual(pages, [sample_products("ultrapc", 1), sample_products("ultrapc", 2)])
+        self.assertEqual([product for page in pages for product in page], products)
@@ -0,0 +1,114 @@
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+from django.test import SimpleTestCase
+from coreapi.constants import SCRAPING_CONNECTIONS
+from coreapi.services.scraper.name_cache import ProductNameCache
+from coreapi.services.scraper.sessions import CloudscraperPool, SessionManager, get_host
+
+
+def session_manager(test, **kwargs):
+    """SessionManager of a test, its name cache in a temporary directory"""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    return SessionManager(names=ProductNameCache(Path(directory.name) / "names.json"), use_cache=False, **kwargs)
+
+
+class SessionManagerTests(SimpleTestCase):
+    def test_get_host(self):
+        self.assertEqual(get_host("https://WWW.UltraPC.ma/39-cartes-graphiques?page=2"), "www.ultrapc.ma")
+
+    def test_one_pooled_session_per_host(self):
+        async def run():
+            async with session_manager(self) as sessions:
+                first = await sessions.get_session("https://www.ultrapc.ma/39-cartes-graphiques")
+                again = await sessions.get_session("https://www.ultrapc.ma/40-processeurs?page=2")
+                other = await sessions.get_session("https://techspace.ma/collections/cpu")
+                limit_per_host = first.connector.limit_per_host
+            return first, again, other, limit_per_host
+
+        first, again, other, limit_per_host = asyncio.run(run())
+
+        self.assertIs(first, again)
+        self.assertIsNot(first, other)
+        self.assertTrue(first.closed and other.closed)
+        self.assertEqual(limit_per_host, SCRAPING_CONNECTIONS["limit_per_host"])
+
+    def test_closed_session_is_opened_again(self):
+        async def run():
+            async with session_manager(self) as sessions:
+                first = await sessions.get_session("https://techspace.ma/collections/cpu")
+                await first.close()
+                return first, await sessions.get_session("https://techspace.ma/collections/cpu")
+
+        first, second = asyncio.run(run())
+
+        self.assertIsNot(first, second)
+
+    def test_runs_have_their_own_deadline_and_skips(self):
+        sessions = session_manager(self)
+        self.addCleanup(sessions.cloudscraper.close)
+        sessions.skip("ultrapc", {"url": "/39-cartes-graphiques", "type": "gpu"}, "blocked")
+
+        run = sessions.for_run(30)
+
+        self.assertEqual(run.skipped, [])
+        self.assertEqual(run.deadline.seconds, 30)
+        self.assertIsNone(sessions.deadline.seconds)
+        self.assertIs(run.rate_limiter, sessions.rate_limiter)
+        self.assertIs(run.breakers, sessions.breakers)
+        self.assertIs(run._sessions, sessions._sessions)
+
+
+class CloudscraperPoolTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("coreapi.services.scraper.sessions.cloudscraper.create_scraper", side_effect=lambda: mock.Mock())
+        self.create_scraper = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = CloudscraperPool(sessions_per_host=2, max_workers=2)
+        self.addCleanup(self.pool.close)
+
+    def test_sessions_are_reused(self):
+        with self.pool.session("https://www.ultrapc.ma/p1") as first:
+            pass
+        with self.pool.session("https://www.ultrapc.ma/p2") as again:
+            pass
+
+        self.assertIs(first, again)
+        self.assertEqual(self.create_scraper.call_count, 1)
+
+    def test_at_most_sessions_per_host(self):
+        both_borrowed = threading.Barrier(3)
+        borrowed = []
+
+        def borrow():
+            with self.pool.session("https://www.ultrapc.ma/p1") as scraper:
+                borrowed.append(scraper)
+                both_borrowed.wait(5)
+
+        threads = [threading.Thread(target=borrow) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        both_borrowed.wait(5)
+        with self.pool.session("https://techspace.ma/p1"):
+            pass # other hosts have their own sessions
+        for thread in threads:
+            thread.join()
+        with self.pool.session("https://www.ultrapc.ma/p3") as third:
+            pass
+
+        self.assertEqual(self.create_scraper.call_count, 3)
+        self.assertIn(third, borrowed)
+
+    def test_failed_creation_frees_the_slot(self):
+        self.create_scraper.side_effect = [RuntimeError("challenge"), mock.Mock(), mock.Mock()]
+
+        with self.assertRaises(RuntimeError):
+            with self.pool.session("https://www.ultrapc.ma/p1"):
+                pass
+        with self.pool.session("https://www.ultrapc.ma/p1"), self.pool.session("https://www.ultrapc.ma/p2"):
+            pass
+
+        self.assertEqual(self.create_scraper.call_count, 3)
@@ -0,0 +1,147 @@
+import csv
+import io
+from decimal import Decimal
+from unittest import mock, skipUnless
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from coreapi.models import Product, ProductGroup
+from coreapi.services.product_grouping.processor import ProductProcessor
+from coreapi.services.product_grouping.staging import STAGING_COLUMNS, StagingIngestion, _CsvStream, _csv_field
+from coreapi.services.scraper.fingerprints import unchanged_page_marker
+from .test_jobs import scraped
+
+
+class CsvStreamTests(SimpleTestCase):
+    def test_none_is_an_unquoted_empty_field(self):
+        # COPY csv only reads an unquoted empty field as NULL, "" is an empty string
+        self.assertEqual(_csv_field(None), "")
+        self.assertEqual(_csv_field(""), '""')
+
+    def test_fields(self):
+        self.assertEqual(_csv_field(True), "true")
+        self.assertEqual(_csv_field(False), "false")
+        self.assertEqual(_csv_field(7000.5), "7000.5")
+        self.assertEqual(_csv_field('rtx "4070", 12g'), '"rtx ""4070"", 12g"')
+
+    def test_rows_read_back_as_csv(self):
+        rows = [["a", None, 1.5, True], ['b "quoted"', "line\nbreak", 2, False]]
+        data = _CsvStream(iter(rows)).read()
+
+        self.assertEqual(data.splitlines()[0], '"a",,1.5,true')
+        self.assertEqual(list(csv.reader(io.StringIO(data))), [
+            ["a", "", "1.5", "true"],
+            ['b "quoted"', "line\nbreak", "2", "false"],
+        ])
+
+    def test_reads_in_chunks(self):
+        rows = [[f"product {i}", i] for i in range(100)]
+        whole = _CsvStream(iter(rows)).read()
+
+        stream = _CsvStream(iter(rows))
+        chunks = []
+        while True:
+            chunk = stream.read(64)
+            if not chunk:
+                break
+            self.assertLessEqual(len(chunk), 64)
+            chunks.append(chunk)
+        self.assertEqual("".join(chunks), whole)
+
+
+class StagingRowsTests(SimpleTestCase):
+    def stats(self):
+        return {"covered": set(), "total": 0, "errors": 0}
+
+    def test_invalid_records_are_errors(self):
+        stats = self.stats()
+        rows = list(StagingIngestion(ProductProcessor())._rows([scraped("u1"), scraped("u2", price=None), scraped("u3", name="")], stats))
+
+        self.assertEqual([row[0] for row in rows], ["u1"])
+        self.assertEqual((stats["total"], stats["errors"]), (3, 2))
+
+    def test_rows_follow_the_staging_columns(self):
+        row = next(StagingIngestion(ProductProcessor())._rows([scraped("u1", image_url=None)], self.stats()))
+        row = dict(zip(STAGING_COLUMNS, row))
+
+        self.assertEqual(row["image_url"], "")
+        self.assertEqual(row["canonical_name"], "RTX 4070 SUPER 12 GB - msi")
+        self.assertFalse(row["unchanged"])
+
+    def test_unchanged_pages_give_an_id_only_row_per_product(self):
+        stats = self.stats()
+        rows = list(StagingIngestion(ProductProcessor())._rows([unchanged_page_marker("ultrapc", "gpu", ["u1", "u2"])], stats))
+
+        self.assertEqual([(row[0], row[-1]) for row in rows], [("u1", True), ("u2", True)])
+        self.assertTrue(all(value is None for row in rows for value in row[1:-1]))
+        self.assertEqual(stats["total"], 0)
+        self.assertEqual(stats["covered"], {("ultrapc", "gpu")})
+
+
+class OtherDatabaseTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch("coreapi.services.product_grouping.staging.connection", mock.Mock(vendor="sqlite"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refused(self):
+        with self.assertRaisesMessage(RuntimeError, "needs PostgreSQL, not sqlite"):
+            StagingIngestion(ProductProcessor()).load([scraped("u1")])
+        self.assertFalse(Product.objects.exists())
+
+    def test_commands_fail(self):
+        with self.assertRaisesMessage(CommandError, "needs PostgreSQL"):
+            call_command("regroup_products", engine="copy", stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, "needs PostgreSQL"):
+            call_command("scrape", file=__file__, engine="copy", stdout=io.StringIO())
+
+
+@skipUnless(connection.vendor == "postgresql", "the copy ingestion engine needs PostgreSQL")
+class StagingIngestionTests(TransactionTestCase):
+    def test_load(self):
+        stats = StagingIngestion(ProductProcessor()).load([
+            scraped("u1", price=7200.0),
+            scraped("t1", website="techspace", price=6900.0),
+            scraped("u2", price=None),
+            scraped("c1", name="amd ryzen 7 7800x3d", category="cpu"), # no normalizer, no group
+        ])
+
+        self.assertEqual((stats["total"], stats["created"], stats["errors"]), (4, 3, 1))
+        self.assertEqual((stats["groups_created"], stats["grouped"]), (1, 2))
+        self.assertEqual(set(stats["timings"]), {"copy", "websites", "groups", "products", "availability", "prices"})
+        # the canonical name of c1 was staged as NULL, an empty string would have made a group of it
+        self.assertEqual(ProductGroup.objects.get().starting_price, Decimal("6900.00"))
+        self.assertIsNone(Product.objects.get(id="c1").canonical_group)
+
+    def test_unchanged_pages_keep_their_products_available(self):
+        StagingIngestion(ProductProcessor()).load([scraped("u1"), scraped("u2", name="palit geforce rtx 4070 dual 12g")])
+
+        stats = StagingIngestion(ProductProcessor()).load([unchanged_page_marker("ultrapc", "gpu", ["u1"])])
+
+        self.assertEqual(stats["unchanged"], 1)
+        self.assertTrue(Product.objects.get(id="u1").availability)
+        self.assertFalse(Product.objects.get(id="u2").availability)
+
+    def test_same_rows_as_the_processor(self):
+        products = [
+            scraped("u1", price=7200.0),
+            scraped("t1", website="techspace", price=6900.0),
+            scraped("u2", name="palit geforce rtx 4070 dual 12g"),
+            scraped("c1", name="amd ryzen 7 7800x3d", category="cpu"),
+        ]
+
+        def snapshot():
+            rows = {
+                product.id: (product.price, product.availability, product.website.name, product.canonical_group and (product.canonical_group.canonical_name, product.canonical_group.starting_price))
+                for product in Product.objects.select_related("website", "canonical_group")
+            }
+            Product.objects.all().delete()
+            ProductGroup.objects.all().delete()
+            return rows
+
+        ProductProcessor().ingest_and_group(products)
+        expected = snapshot()
+        StagingIngestion(ProductProcessor()).load(products)
+
+        self.assertEqual(snapshot(), expected)